@@ -0,0 +1,118 @@
+"""
+Cache Hit Rate - Aciertos de cache con claves anteriores vs canonicas
+Reproduce una secuencia de preguntas sobre caches LRU simuladas con las claves
+que usaba cada cache antes de query_normalizer y con la clave canonica compartida
+
+Uso:
+    python backend/benchmarks/cache_hit_rate.py                      # muestra sintetica
+    python backend/benchmarks/cache_hit_rate.py --questions preguntas.txt
+    python backend/benchmarks/cache_hit_rate.py --from-history       # historial Q&A local (BD del usuario)
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import BACKEND_ROOT, write_results
+from synthetic_data import generate_question_stream
+
+for sub in ("", "core", "utils"):
+    path = str(BACKEND_ROOT / sub) if sub else str(BACKEND_ROOT)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from query_normalizer import canonical_query
+
+# Clave de cada cache antes de la canonicalizacion compartida
+LEGACY_KEYS: Dict[str, Callable[[str], str]] = {
+    'answer_cache': lambda q: q.lower().strip(),    # AlfredCore._query_cache
+    'retrieval_cache': lambda q: q,                 # RetrievalCache (query cruda + kwargs)
+    'embedding_cache': lambda q: q,                 # EmbeddingCache (md5 de la query cruda)
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Tasa de aciertos de cache con claves canonicas")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--questions", default=None, help="Archivo con preguntas (una por linea o lista JSON)")
+    source.add_argument("--from-history", action="store_true", help="Usar las preguntas del historial Q&A local")
+    parser.add_argument("--count", type=int, default=500, help="Preguntas de la muestra sintetica")
+    parser.add_argument("--cache-size", type=int, default=50, help="Tamano de las caches LRU simuladas")
+    parser.add_argument("--seed", type=int, default=23, help="Semilla de la muestra sintetica")
+    parser.add_argument("--output", default=None, help="Directorio de resultados (default: benchmarks/results)")
+    return parser.parse_args(argv)
+
+
+def load_questions(args) -> List[str]:
+    """Preguntas a reproducir, en orden cronologico"""
+    if args.questions:
+        text = Path(args.questions).read_text(encoding="utf-8")
+        if text.lstrip().startswith('['):
+            return [str(q) for q in json.loads(text)]
+        return [line.strip() for line in text.splitlines() if line.strip()]
+    if args.from_history:
+        from db_manager import get_qa_history
+        entries = get_qa_history(decrypt_sensitive=False)
+        return [entry['question'] for entry in sorted(entries, key=lambda e: e.get('timestamp', ''))]
+    return generate_question_stream(args.count, seed=args.seed)
+
+
+def replay(questions: List[str], key_fn: Callable[[str], str], cache_size: int) -> Dict[str, float]:
+    """Reproducir las preguntas sobre una cache LRU y contar aciertos"""
+    cache: "OrderedDict[str, bool]" = OrderedDict()
+    hits = 0
+    for question in questions:
+        key = key_fn(question)
+        if key in cache:
+            hits += 1
+            cache.move_to_end(key)
+            continue
+        cache[key] = True
+        if len(cache) > cache_size:
+            cache.popitem(last=False)
+    return {
+        'hits': hits,
+        'hit_rate_percent': round(hits / len(questions) * 100, 2) if questions else 0.0,
+        'distinct_keys': len({key_fn(q) for q in questions})
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    questions = load_questions(args)
+    if not questions:
+        print("No hay preguntas que reproducir")
+        return 1
+
+    canonical = replay(questions, canonical_query, args.cache_size)
+    caches = {}
+    for name, legacy_key in LEGACY_KEYS.items():
+        legacy = replay(questions, legacy_key, args.cache_size)
+        caches[name] = {
+            'legacy': legacy,
+            'canonical': canonical,
+            'gain_points': round(canonical['hit_rate_percent'] - legacy['hit_rate_percent'], 2)
+        }
+
+    print(f"\nPreguntas reproducidas: {len(questions)} (cache LRU de {args.cache_size})")
+    print(f"{'cache':<18} {'antes %':>9} {'canonica %':>11} {'ganancia':>9} {'claves antes':>13} {'claves ahora':>13}")
+    for name, data in caches.items():
+        print(f"{name:<18} {data['legacy']['hit_rate_percent']:>9} {data['canonical']['hit_rate_percent']:>11} "
+              f"{data['gain_points']:>+9} {data['legacy']['distinct_keys']:>13} {data['canonical']['distinct_keys']:>13}")
+
+    source = 'file' if args.questions else 'history' if args.from_history else 'synthetic'
+    config = {'source': source, 'questions': len(questions), 'cache_size': args.cache_size}
+    if source == 'synthetic':
+        config.update({'count': args.count, 'seed': args.seed})
+    target = write_results('cache_hit_rate', config, {'caches': caches}, args.output)
+    print(f"Resultados guardados en: {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
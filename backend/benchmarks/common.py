@@ -0,0 +1,231 @@
+"""
+Benchmark Common - Entorno aislado y utilidades compartidas por los benchmarks
+Redirige datos, BD y ChromaDB a un directorio temporal, levanta el Ollama
+falso y resume latencias. Debe usarse ANTES de importar modulos del backend.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+REPO_ROOT = BACKEND_ROOT.parent
+DEFAULT_RESULTS_DIR = BACKEND_ROOT / "benchmarks" / "results"
+
+
+class BenchmarkEnvironment:
+    """Directorio de trabajo aislado + servidor Ollama falso"""
+
+    def __init__(self, workdir: Path, server, ollama_url: str, keep: bool = False):
+        self.workdir = workdir
+        self.server = server
+        self.ollama_url = ollama_url
+        self.keep = keep
+
+    @property
+    def state(self):
+        """Estado del servidor falso (contadores de peticiones, modelos cargados)"""
+        return self.server.RequestHandlerClass.state
+
+    def run(self, coro):
+        """
+        Ejecutar la parte async del benchmark en un event loop nuevo
+
+        El cliente async de Ollama de ese loop se cierra antes de que el
+        loop termine (ver ollama_client.run_sync).
+        """
+        from ollama_client import run_sync
+
+        return run_sync(coro)
+
+    def close(self):
+        """Cerrar el cliente de Ollama, detener servidor y borrar el directorio temporal"""
+        ollama_client = sys.modules.get('ollama_client')
+        if ollama_client is not None and hasattr(ollama_client.get_ollama_client, '_instance'):
+            ollama_client.get_ollama_client().close()
+        self.server.shutdown()
+        self.server.server_close()
+        if not self.keep:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def assert_isolated(workdir: Path):
+    """
+    Abortar si las rutas del backend no quedan dentro del directorio de trabajo
+
+    Se comprueba antes de importar el backend: un benchmark no debe escribir
+    historial, rutas ni chunks sinteticos en la BD o ChromaDB del usuario.
+
+    Raises:
+        RuntimeError: Si alguna ruta resuelve fuera de workdir
+    """
+    from utils import paths
+
+    root = Path(workdir).resolve()
+    resolved = {
+        'data': paths.get_data_path(),
+        'logs': paths.get_log_path(),
+        'db': paths.get_db_path(),
+        'chroma': paths.get_chroma_path(),
+    }
+    outside = {
+        name: str(path) for name, path in resolved.items()
+        if root not in Path(path).resolve().parents
+    }
+    if outside:
+        raise RuntimeError(f"Entorno de benchmark no aislado, rutas fuera de {root}: {outside}")
+
+
+def setup_environment(
+    workdir: Optional[str] = None,
+    generate_latency: float = 0.05,
+    embed_latency: float = 0.0,
+    keep: bool = False
+) -> BenchmarkEnvironment:
+    """
+    Preparar entorno aislado para un benchmark
+
+    Args:
+        workdir: Directorio de trabajo (None = temporal)
+        generate_latency: Latencia fija de /api/generate en el Ollama falso
+        embed_latency: Latencia fija de /api/embed en el Ollama falso
+        keep: Conservar el directorio de trabajo al cerrar
+
+    Returns:
+        BenchmarkEnvironment con la URL del Ollama falso
+    """
+    base = Path(workdir) if workdir else Path(tempfile.mkdtemp(prefix="alfred_bench_"))
+    base.mkdir(parents=True, exist_ok=True)
+    for name in ("DATA", "LOG", "DB", "CHROMA"):
+        os.environ[f"ALFRED_{name}_PATH"] = str(base / name.lower())
+    # En modo desarrollo (ALFRED_DEV_MODE en .env o <repo>/chroma_db) paths
+    # ignora ALFRED_*_PATH y usaria la BD y el indice reales del checkout
+    os.environ["ALFRED_DEV_MODE"] = "0"
+    # Medir con el backend ya inicializado (el arranque se mide en startup_time.py)
+    os.environ.setdefault("ALFRED_STARTUP_MODE", "blocking")
+
+    # Mismo orden de sys.path que alfred_backend.py
+    for sub in ("", "core", "gpu", "utils"):
+        path = str(BACKEND_ROOT / sub) if sub else str(BACKEND_ROOT)
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    assert_isolated(base)
+
+    from utils.fake_ollama import FakeOllamaState, start_fake_ollama
+
+    state = FakeOllamaState(generate_latency=generate_latency, embed_latency=embed_latency)
+    server, url = start_fake_ollama(state=state)
+    os.environ["ALFRED_OLLAMA_URL"] = url
+    return BenchmarkEnvironment(base, server, url, keep=keep)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Percentil con interpolacion lineal (q entre 0 y 100)"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize_latencies(samples: List[float]) -> Dict[str, float]:
+    """
+    Resumir latencias medidas en segundos
+
+    Returns:
+        Dict con count, mean_ms, p50_ms, p95_ms, p99_ms y max_ms
+    """
+    if not samples:
+        return {'count': 0, 'mean_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+    return {
+        'count': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 3),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3)
+    }
+
+
+class Timer:
+    """Context manager que mide segundos transcurridos"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def git_commit() -> str:
+    """Commit actual (corto) o 'unknown' fuera de un repositorio git"""
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+        )
+        commit = result.stdout.strip()
+        if commit:
+            dirty = subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                cwd=REPO_ROOT, capture_output=True, text=True, timeout=10
+            ).stdout.strip()
+            return f"{commit}-dirty" if dirty else commit
+    except Exception:
+        pass
+    return "unknown"
+
+
+def write_results(
+    name: str,
+    config: Dict[str, Any],
+    results: Dict[str, Any],
+    output_dir: Optional[str] = None
+) -> Path:
+    """
+    Guardar resultados en JSON etiquetados con commit y entorno
+
+    Args:
+        name: Nombre del benchmark (prefijo del archivo)
+        config: Parametros usados
+        results: Metricas medidas
+        output_dir: Directorio destino (default: benchmarks/results)
+
+    Returns:
+        Ruta del archivo escrito
+    """
+    commit = git_commit()
+    now = datetime.now()
+    target_dir = Path(output_dir) if output_dir else DEFAULT_RESULTS_DIR
+    target_dir.mkdir(parents=True, exist_ok=True)
+    target = target_dir / f"{name}_{commit}_{now.strftime('%Y%m%d-%H%M%S')}.json"
+
+    payload = {
+        'benchmark': name,
+        'commit': commit,
+        'timestamp': now.isoformat(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': config,
+        'results': results
+    }
+    target.write_text(json.dumps(payload, indent=2, ensure_ascii=False), encoding='utf-8')
+    return target
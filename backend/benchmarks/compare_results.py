@@ -0,0 +1,63 @@
+"""
+Compare Results - Comparar dos archivos JSON de benchmarks
+Muestra cada metrica numerica de 'results' con su variacion porcentual
+
+Uso:
+    python backend/benchmarks/compare_results.py base.json nuevo.json
+"""
+
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import Dict, Any
+
+
+def flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, float]:
+    """Aplanar dicts anidados a claves con puntos (solo valores numericos)"""
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Comparar resultados de benchmarks")
+    parser.add_argument("base", help="JSON de referencia")
+    parser.add_argument("new", help="JSON a comparar")
+    parser.add_argument("--filter", default=None, help="Mostrar solo metricas que contengan este texto")
+    args = parser.parse_args(argv)
+
+    base = json.loads(Path(args.base).read_text(encoding='utf-8'))
+    new = json.loads(Path(args.new).read_text(encoding='utf-8'))
+
+    if base.get('config') != new.get('config'):
+        print("AVISO: las configuraciones difieren, la comparacion puede no ser valida")
+
+    base_flat = flatten(base.get('results', {}))
+    new_flat = flatten(new.get('results', {}))
+
+    print(f"{'metrica':<48} {base.get('commit', '?'):>14} {new.get('commit', '?'):>14} {'cambio':>9}")
+    for name in sorted(set(base_flat) | set(new_flat)):
+        if args.filter and args.filter not in name:
+            continue
+        before = base_flat.get(name)
+        after = new_flat.get(name)
+        if before is None or after is None:
+            change = 'n/a'
+        elif before == 0:
+            change = '0.0%' if after == 0 else 'n/a'
+        else:
+            change = f"{(after - before) / before * 100:+.1f}%"
+        before_text = '-' if before is None else f"{before:.3f}"
+        after_text = '-' if after is None else f"{after:.3f}"
+        print(f"{name:<48} {before_text:>14} {after_text:>14} {change:>9}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
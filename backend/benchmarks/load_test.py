@@ -0,0 +1,315 @@
+"""
+Load Test - Generador de carga concurrente en proceso (ASGI, sin red)
+Simula varias ventanas de chat contra /query, /query/conversation,
+/conversations/* y /history; reporta throughput, latencia de cola, errores
+y el retraso del event loop (bloqueos) durante la ejecucion
+
+Uso:
+    python backend/benchmarks/load_test.py --concurrency 20 --duration 30
+    python backend/benchmarks/load_test.py --mix query=1,conversations=3,history=1 --requests 500
+"""
+
+import sys
+import time
+import random
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import assert_isolated, setup_environment, summarize_latencies, write_results
+from synthetic_data import generate_corpus, generate_questions, generate_qa_history
+
+DEFAULT_MIX = "query=30,query_conversation=30,conversations=25,history=15"
+OPERATIONS = ('query', 'query_conversation', 'conversations', 'history')
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Parsear mezcla de operaciones 'op=peso,op=peso'
+
+    Raises:
+        ValueError: Operacion desconocida o pesos no positivos
+    """
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Operacion desconocida '{name}'. Validas: {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("La mezcla debe tener al menos un peso positivo")
+    return mix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga en proceso del backend de Alfred")
+    parser.add_argument("--concurrency", type=int, default=10, help="Clientes simultaneos (ventanas de chat)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Duracion en segundos (si no se usa --requests)")
+    parser.add_argument("--requests", type=int, default=None, help="Total de peticiones (en lugar de --duration)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Pesos por operacion (default: {DEFAULT_MIX})")
+    parser.add_argument("--documents", type=int, default=30, help="Archivos del corpus indexado antes de la carga")
+    parser.add_argument("--history", type=int, default=300, help="Entradas del historial Q&A")
+    parser.add_argument("--messages", type=int, default=20, help="Mensajes iniciales por conversacion")
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Latencia fija de generate (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Latencia fija de embed (s)")
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="Periodo del monitor de event loop (s)")
+    parser.add_argument("--stall-threshold", type=float, default=0.1, help="Retraso considerado bloqueo (s)")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla")
+    parser.add_argument("--output", default=None, help="Directorio de resultados (default: benchmarks/results)")
+    parser.add_argument("--workdir", default=None, help="Directorio de trabajo (default: temporal)")
+    parser.add_argument("--keep", action="store_true", help="Conservar el directorio de trabajo")
+    return parser.parse_args(argv)
+
+
+class LoopLagMonitor:
+    """
+    Mide el retraso del event loop
+
+    Duerme 'interval' segundos en bucle y registra cuanto tarda de mas en
+    despertar. Con handlers bien escritos el retraso es ~0; un retraso alto
+    indica trabajo sincrono bloqueando el loop (BD, descifrado, CPU).
+    """
+
+    def __init__(self, interval: float = 0.01, stall_threshold: float = 0.1):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.samples: List[float] = []
+        self.stalls = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self.samples.append(lag)
+            if lag >= self.stall_threshold:
+                self.stalls += 1
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def report(self) -> Dict[str, float]:
+        summary = summarize_latencies(self.samples)
+        summary['stalls'] = self.stalls
+        summary['stall_threshold_ms'] = self.stall_threshold * 1000
+        summary['blocked_seconds'] = round(sum(s for s in self.samples if s >= self.stall_threshold), 3)
+        return summary
+
+
+class LoadRunner:
+    """Ejecuta clientes concurrentes y acumula latencias por operacion"""
+
+    def __init__(self, client, mix: Dict[str, float], conversation_ids: List[str], seed: int = 42):
+        self.client = client
+        self.operations = list(mix)
+        self.weights = [mix[name] for name in self.operations]
+        self.conversation_ids = conversation_ids
+        self.seed = seed
+        self.latencies: Dict[str, List[float]] = {name: [] for name in OPERATIONS}
+        self.statuses: Dict[str, Dict[str, int]] = {name: {} for name in OPERATIONS}
+        self.errors: Dict[str, int] = {name: 0 for name in OPERATIONS}
+        self._issued = 0
+
+    def _record(self, operation: str, elapsed: float, status):
+        self.latencies[operation].append(elapsed)
+        key = str(status)
+        self.statuses[operation][key] = self.statuses[operation].get(key, 0) + 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors[operation] += 1
+
+    async def _request(self, operation: str, rng: random.Random, worker: int, sequence: int):
+        """Una peticion de la operacion indicada"""
+        question = f"{generate_questions(1, seed=rng.randint(0, 10 ** 6))[0][:-1]} w{worker}-{sequence}?"
+        conversation_id = self.conversation_ids[worker % len(self.conversation_ids)]
+
+        if operation == 'query':
+            return await self.client.post("/query", json={"question": question, "use_history": False})
+        if operation == 'query_conversation':
+            return await self.client.post("/query/conversation", json={
+                "question": question,
+                "conversation_id": conversation_id,
+                "use_history": True
+            })
+        if operation == 'conversations':
+            action = rng.random()
+            if action < 0.4:
+                return await self.client.get(f"/conversations/{conversation_id}")
+            if action < 0.7:
+                return await self.client.get("/conversations")
+            return await self.client.post(f"/conversations/{conversation_id}/messages", json={
+                "conversation_id": conversation_id,
+                "role": "user",
+                "content": question
+            })
+        # history
+        if rng.random() < 0.5:
+            return await self.client.get("/history", params={"limit": 20})
+        return await self.client.post("/history/search", json={"search_term": question})
+
+    async def _worker(self, worker: int, deadline: Optional[float], budget: Optional[int]):
+        rng = random.Random(self.seed * 1000 + worker)
+        sequence = 0
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                return
+            if budget is not None:
+                if self._issued >= budget:
+                    return
+                self._issued += 1
+
+            operation = rng.choices(self.operations, weights=self.weights)[0]
+            sequence += 1
+            start = time.perf_counter()
+            try:
+                response = await self._request(operation, rng, worker, sequence)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            self._record(operation, time.perf_counter() - start, status)
+
+    async def run(self, concurrency: int, duration: Optional[float], total_requests: Optional[int]) -> float:
+        """
+        Ejecutar la carga
+
+        Returns:
+            Segundos de reloj transcurridos
+        """
+        start = time.perf_counter()
+        deadline = None if total_requests else start + duration
+        await asyncio.gather(*(self._worker(i, deadline, total_requests) for i in range(concurrency)))
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        total = len(all_latencies)
+        total_errors = sum(self.errors.values())
+        operations = {}
+        for name in OPERATIONS:
+            count = len(self.latencies[name])
+            if not count:
+                continue
+            operations[name] = {
+                'latency': summarize_latencies(self.latencies[name]),
+                'throughput_rps': round(count / elapsed, 2),
+                'error_rate': round(self.errors[name] / count, 4),
+                'status_counts': self.statuses[name]
+            }
+        return {
+            'elapsed_seconds': round(elapsed, 3),
+            'total_requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'error_rate': round(total_errors / total, 4) if total else 0.0,
+            'latency': summarize_latencies(all_latencies),
+            'operations': operations
+        }
+
+
+async def run_load(args, env) -> dict:
+    """Preparar datos, levantar la app (lifespan incluido) y ejecutar la carga"""
+    import httpx
+    import db_manager
+
+    # La carga escribe historial, rutas, chunks y conversaciones: comprobar
+    # de nuevo (ya con el backend importado) que nada apunta a la BD real
+    assert_isolated(env.workdir)
+    if env.workdir.resolve() not in Path(db_manager.DB_FILE).resolve().parents:
+        raise RuntimeError(f"load_test: la BD {db_manager.DB_FILE} esta fuera de {env.workdir}")
+
+    import alfred_backend
+    import functionsToHistory
+
+    app = alfred_backend.app
+    corpus_dir = env.workdir / "corpus"
+    generate_corpus(corpus_dir, args.documents, seed=args.seed)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://alfred", timeout=600) as client:
+            for question, answer in generate_qa_history(args.history, seed=args.seed):
+                functionsToHistory.save_qa_to_history(question, answer)
+
+            response = await client.post("/documents/paths", json={"path": str(corpus_dir)})
+            response.raise_for_status()
+            response = await client.post("/documents/reindex")
+            response.raise_for_status()
+
+            # Una conversacion por cliente (ventana de chat)
+            conversation_ids = []
+            for index in range(args.concurrency):
+                response = await client.post("/conversations", json={"title": f"Carga {index}"})
+                response.raise_for_status()
+                conversation_id = response.json()["id"]
+                for turn in range(args.messages):
+                    response = await client.post(f"/conversations/{conversation_id}/messages", json={
+                        "conversation_id": conversation_id,
+                        "role": "user" if turn % 2 == 0 else "assistant",
+                        "content": f"Mensaje inicial {turn}"
+                    })
+                    response.raise_for_status()
+                conversation_ids.append(conversation_id)
+
+            runner = LoadRunner(client, parse_mix(args.mix), conversation_ids, seed=args.seed)
+            monitor = LoopLagMonitor(args.lag_interval, args.stall_threshold)
+            monitor.start()
+            try:
+                elapsed = await runner.run(args.concurrency, args.duration, args.requests)
+            finally:
+                await monitor.stop()
+
+            results = runner.report(elapsed)
+            results['loop_lag'] = monitor.report()
+            return results
+
+
+def print_report(results: dict):
+    print()
+    print(f"{'operacion':<20} {'peticiones':>10} {'rps':>8} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errores':>8}")
+    for name, data in results['operations'].items():
+        latency = data['latency']
+        print(f"{name:<20} {latency['count']:>10} {data['throughput_rps']:>8} {latency['p50_ms']:>10} "
+              f"{latency['p95_ms']:>10} {latency['p99_ms']:>10} {data['error_rate'] * 100:>7.1f}%")
+    latency = results['latency']
+    print(f"{'TOTAL':<20} {results['total_requests']:>10} {results['throughput_rps']:>8} {latency['p50_ms']:>10} "
+          f"{latency['p95_ms']:>10} {latency['p99_ms']:>10} {results['error_rate'] * 100:>7.1f}%")
+    lag = results['loop_lag']
+    print()
+    print(f"Retraso del event loop: p50={lag['p50_ms']}ms p99={lag['p99_ms']}ms max={lag['max_ms']}ms "
+          f"bloqueos>={lag['stall_threshold_ms']:.0f}ms: {lag['stalls']} ({lag['blocked_seconds']}s)")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    parse_mix(args.mix)  # Validar antes de preparar el entorno
+    env = setup_environment(
+        workdir=args.workdir,
+        generate_latency=args.generate_latency,
+        embed_latency=args.embed_latency,
+        keep=args.keep
+    )
+    try:
+        results = env.run(run_load(args, env))
+        print_report(results)
+        config = {key: value for key, value in vars(args).items() if key not in ('output', 'workdir', 'keep')}
+        target = write_results('load', config, results, args.output)
+        print(f"Resultados guardados en: {target}")
+        return 0
+    finally:
+        env.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
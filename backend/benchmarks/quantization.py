@@ -0,0 +1,102 @@
+"""
+Quantization - Recall, latencia y memoria del indice local segun el dtype
+Indexa el mismo corpus sintetico en float32, float16 e int8 (indice flat) y,
+para int8, barre el numero de candidatos que se reordenan a precision
+completa (rescore_factor). Dimension por defecto 1024 (mxbai-embed-large,
+bge-large)
+
+Uso:
+    python backend/benchmarks/quantization.py
+    python backend/benchmarks/quantization.py --chunks 100000 --dim 768
+    python backend/benchmarks/quantization.py --rescore 1 2 4 8 16
+"""
+
+import sys
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import summarize_latencies, write_results, Timer
+from vector_backends import generate_dataset, exact_neighbors, recall
+
+from vector_index import LocalVectorStore
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cuantizacion int8 del indice vectorial local")
+    parser.add_argument("--chunks", type=int, default=20000, help="Chunks (vectores) a indexar")
+    parser.add_argument("--dim", type=int, default=1024, help="Dimension de los embeddings")
+    parser.add_argument("--sources", type=int, default=500, help="Documentos fuente (grupos de chunks)")
+    parser.add_argument("--queries", type=int, default=100, help="Consultas a medir")
+    parser.add_argument("--k", type=int, default=8, help="Resultados por consulta")
+    parser.add_argument("--rescore", type=int, nargs="+", default=[1, 2, 4, 8], help="Factores de reordenado int8")
+    parser.add_argument("--seed", type=int, default=7, help="Semilla de los datos sinteticos")
+    parser.add_argument("--output", default=None, help="Directorio de resultados (default: benchmarks/results)")
+    return parser.parse_args(argv)
+
+
+def measure(store: LocalVectorStore, queries, truth, k: int) -> Dict:
+    """Latencia y recall@k de las consultas sobre una coleccion"""
+    store.search_rows(queries[0], k)
+    latencies, found = [], []
+    for query in queries:
+        with Timer() as t:
+            rows = store.search_rows(query, k)
+        latencies.append(t.elapsed)
+        found.append([int(store._ids[row]) for row, _ in rows])
+    return {'search': summarize_latencies(latencies), 'recall_at_k': recall(found, truth, k)}
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    print(f"Generando {args.chunks} vectores de dimension {args.dim}...")
+    vectors, metadatas, queries = generate_dataset(args)
+    truth = exact_neighbors(vectors, queries, args.k)
+    ids = [str(i) for i in range(len(vectors))]
+    texts = [f"chunk {i}" for i in ids]
+
+    workdir = Path(tempfile.mkdtemp(prefix="alfred_quant_"))
+    variants = {}
+    try:
+        for dtype in ('float32', 'float16', 'int8'):
+            print(f"Midiendo {dtype}...")
+            store = LocalVectorStore(str(workdir / dtype), collection_name="benchmark", index_type='flat', dtype=dtype)
+            with Timer() as t:
+                store.add_embeddings(texts, vectors, metadatas, ids)
+            stats = store.storage_stats()
+            base = {
+                'build_seconds': round(t.elapsed, 3),
+                'memory_bytes': stats['memory_bytes'],
+                'disk_bytes': stats['disk_bytes']
+            }
+            if dtype != 'int8':
+                variants[dtype] = {**base, **measure(store, queries, truth, args.k)}
+                continue
+            for factor in args.rescore:
+                store.rescore_factor = factor
+                variants[f"int8-rescore{factor}"] = {**base, 'rescore_factor': factor, **measure(store, queries, truth, args.k)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    reference = variants['float32']['memory_bytes'] or 1
+    print(f"\n{'variante':<18} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'RAM MB':>8} {'RAM %':>6} {'disco MB':>9}")
+    for name, data in variants.items():
+        print(f"{name:<18} {data['recall_at_k']:>7} {data['search']['p50_ms']:>8} {data['search']['p95_ms']:>8} "
+              f"{data['memory_bytes'] / 1024 / 1024:>8.1f} {data['memory_bytes'] / reference * 100:>6.1f} "
+              f"{data['disk_bytes'] / 1024 / 1024:>9.1f}")
+
+    config = {
+        'chunks': args.chunks, 'dim': args.dim, 'sources': args.sources, 'queries': args.queries,
+        'k': args.k, 'rescore': args.rescore, 'seed': args.seed, 'index_type': 'flat'
+    }
+    target = write_results('quantization', config, {'variants': variants}, args.output)
+    print(f"Resultados guardados en: {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
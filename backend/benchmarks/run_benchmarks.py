@@ -0,0 +1,193 @@
+"""
+Run Benchmarks - Suite reproducible del backend contra un Ollama falso
+Mide throughput de reindexacion, latencia de consultas (p50/p95), busqueda
+en historial y carga de conversaciones; guarda JSON etiquetado con el commit
+
+Uso:
+    python backend/benchmarks/run_benchmarks.py
+    python backend/benchmarks/run_benchmarks.py --documents 500 --history 2000 --queries 100
+    python backend/benchmarks/compare_results.py results/a.json results/b.json
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import setup_environment, summarize_latencies, write_results, Timer
+from synthetic_data import generate_corpus, generate_questions, generate_qa_history
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de Alfred con Ollama falso")
+    parser.add_argument("--documents", type=int, default=100, help="Archivos del corpus sintetico")
+    parser.add_argument("--paragraphs", type=int, default=8, help="Parrafos por archivo")
+    parser.add_argument("--history", type=int, default=500, help="Entradas del historial Q&A")
+    parser.add_argument("--queries", type=int, default=30, help="Consultas a medir")
+    parser.add_argument("--history-searches", type=int, default=30, help="Busquedas en historial a medir")
+    parser.add_argument("--conversations", type=int, default=20, help="Conversaciones a crear")
+    parser.add_argument("--messages", type=int, default=40, help="Mensajes por conversacion")
+    parser.add_argument("--generate-latency", type=float, default=0.05, help="Latencia fija de generate (s)")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Latencia fija de embed (s)")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de los datos sinteticos")
+    parser.add_argument("--output", default=None, help="Directorio de resultados (default: benchmarks/results)")
+    parser.add_argument("--workdir", default=None, help="Directorio de trabajo (default: temporal)")
+    parser.add_argument("--keep", action="store_true", help="Conservar el directorio de trabajo")
+    return parser.parse_args(argv)
+
+
+def bench_reindex(client, corpus_dir: Path) -> dict:
+    """Indexar el corpus completo via /documents/reindex"""
+    response = client.post("/documents/paths", json={"path": str(corpus_dir)})
+    response.raise_for_status()
+
+    with Timer() as timer:
+        response = client.post("/documents/reindex")
+    response.raise_for_status()
+    stats = response.json()["stats"]
+
+    seconds = timer.elapsed
+    return {
+        'seconds': round(seconds, 3),
+        'documents': stats['total_documents'],
+        'chunks': stats['total_chunks'],
+        'documents_per_second': round(stats['total_documents'] / seconds, 2) if seconds else 0.0,
+        'chunks_per_second': round(stats['total_chunks'] / seconds, 2) if seconds else 0.0,
+        'errors': len(stats.get('errors', []))
+    }
+
+
+def bench_queries(client, questions) -> dict:
+    """Consultas con busqueda en documentos (sin historial ni cache)"""
+    latencies = []
+    stage_totals = {}
+    errors = 0
+
+    for question in questions:
+        with Timer() as timer:
+            response = client.post("/query", json={
+                "question": question,
+                "use_history": False,
+                "search_documents": True,
+                "include_timings": True
+            })
+        if response.status_code != 200:
+            errors += 1
+            continue
+        latencies.append(timer.elapsed)
+        for stage, ms in (response.json().get('timings') or {}).items():
+            stage_totals[stage] = stage_totals.get(stage, 0.0) + ms
+
+    ok = len(latencies) or 1
+    return {
+        'latency': summarize_latencies(latencies),
+        'stage_mean_ms': {stage: round(total / ok, 3) for stage, total in sorted(stage_totals.items())},
+        'errors': errors
+    }
+
+
+def bench_history_search(questions) -> dict:
+    """search_in_qa_history tal como lo usa el pipeline (carga + descifrado + scoring)"""
+    import functionsToHistory
+
+    latencies = []
+    for question in questions:
+        with Timer() as timer:
+            functionsToHistory.search_in_qa_history(question)
+        latencies.append(timer.elapsed)
+    return {'latency': summarize_latencies(latencies)}
+
+
+def bench_conversations(client, conversations: int, messages: int) -> dict:
+    """Crear conversaciones y medir su carga via API"""
+    from conversation_manager import get_conversation_manager
+
+    conv_mgr = get_conversation_manager()
+    conversation_ids = []
+    with Timer() as populate:
+        for index in range(conversations):
+            conversation = conv_mgr.create_conversation(title=f"Benchmark {index}")
+            for turn in range(messages):
+                role = 'user' if turn % 2 == 0 else 'assistant'
+                conv_mgr.add_message(conversation['id'], role, f"Mensaje {turn} de la conversacion {index}")
+            conversation_ids.append(conversation['id'])
+
+    load_latencies = []
+    for conversation_id in conversation_ids:
+        with Timer() as timer:
+            response = client.get(f"/conversations/{conversation_id}")
+        response.raise_for_status()
+        load_latencies.append(timer.elapsed)
+
+    list_latencies = []
+    for _ in range(10):
+        with Timer() as timer:
+            response = client.get("/conversations")
+        response.raise_for_status()
+        list_latencies.append(timer.elapsed)
+
+    return {
+        'populate_seconds': round(populate.elapsed, 3),
+        'load': summarize_latencies(load_latencies),
+        'list': summarize_latencies(list_latencies)
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    env = setup_environment(
+        workdir=args.workdir,
+        generate_latency=args.generate_latency,
+        embed_latency=args.embed_latency,
+        keep=args.keep
+    )
+
+    try:
+        corpus_dir = env.workdir / "corpus"
+        generate_corpus(corpus_dir, args.documents, args.paragraphs, seed=args.seed)
+
+        # Importar el backend despues de configurar el entorno
+        import alfred_backend
+        import functionsToHistory
+        from fastapi.testclient import TestClient
+
+        with TestClient(alfred_backend.app) as client:
+            for question, answer in generate_qa_history(args.history, seed=args.seed):
+                functionsToHistory.save_qa_to_history(question, answer)
+
+            results = {}
+            print(f"[1/4] Reindexando {args.documents} documentos...")
+            results['reindex'] = bench_reindex(client, corpus_dir)
+
+            print(f"[2/4] {args.queries} consultas con documentos...")
+            results['query'] = bench_queries(client, generate_questions(args.queries, seed=args.seed + 1))
+
+            print(f"[3/4] {args.history_searches} busquedas en historial ({args.history} entradas)...")
+            results['history_search'] = bench_history_search(generate_questions(args.history_searches, seed=args.seed + 2))
+
+            print(f"[4/4] Carga de {args.conversations} conversaciones x {args.messages} mensajes...")
+            results['conversations'] = bench_conversations(client, args.conversations, args.messages)
+
+        results['ollama_requests'] = dict(env.state.requests)
+
+        config = {key: value for key, value in vars(args).items() if key not in ('output', 'workdir', 'keep')}
+        target = write_results('backend', config, results, args.output)
+
+        print()
+        print(f"Reindexacion: {results['reindex']['chunks_per_second']} chunks/s "
+              f"({results['reindex']['chunks']} chunks en {results['reindex']['seconds']}s)")
+        print(f"Consultas:    p50={results['query']['latency']['p50_ms']}ms "
+              f"p95={results['query']['latency']['p95_ms']}ms")
+        print(f"Historial:    p50={results['history_search']['latency']['p50_ms']}ms "
+              f"p95={results['history_search']['latency']['p95_ms']}ms")
+        print(f"Conversacion: p50={results['conversations']['load']['p50_ms']}ms "
+              f"p95={results['conversations']['load']['p95_ms']}ms")
+        print(f"Resultados guardados en: {target}")
+        return 0
+    finally:
+        env.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
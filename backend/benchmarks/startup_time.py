@@ -0,0 +1,184 @@
+"""
+Startup Time - Perfil de imports y tiempo de arranque en frio del backend
+1) python -X importtime sobre 'import alfred_backend': modulos mas costosos
+2) Lanza el servidor real y mide tiempo hasta puerto abierto y hasta
+   is_fully_initialized en /health
+
+Uso:
+    python backend/benchmarks/startup_time.py
+    python backend/benchmarks/startup_time.py --runs 5 --top 30
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import statistics
+import urllib.request
+from pathlib import Path
+from typing import Dict, Any, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import BACKEND_ROOT, setup_environment, write_results
+
+CORE_DIR = BACKEND_ROOT / "core"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Perfil de arranque del backend de Alfred")
+    parser.add_argument("--runs", type=int, default=3, help="Arranques completos a medir")
+    parser.add_argument("--top", type=int, default=20, help="Modulos a mostrar en el perfil de imports")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Espera maxima por arranque (s)")
+    parser.add_argument("--startup-mode", default="background", help="ALFRED_STARTUP_MODE (background | blocking)")
+    parser.add_argument("--output", default=None, help="Directorio de resultados (default: benchmarks/results)")
+    return parser.parse_args(argv)
+
+
+def profile_imports(top: int) -> Dict[str, Any]:
+    """Ejecutar 'import alfred_backend' con -X importtime y agregar resultados"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import alfred_backend"],
+        cwd=CORE_DIR, env=os.environ.copy(), capture_output=True, text=True
+    )
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line.split("|")
+        self_us = int(parts[0].split(":")[1])
+        cumulative_us = int(parts[1])
+        name = parts[2]
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules.append({'module': name.strip(), 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000, 'depth': depth})
+
+    if not modules:
+        raise RuntimeError(f"No se pudo perfilar el import:\n{result.stderr[-2000:]}")
+
+    total_ms = sum(m['self_ms'] for m in modules)
+    direct = [m for m in modules if m['depth'] == 1]
+    packages: Dict[str, float] = {}
+    for m in modules:
+        package = m['module'].split('.')[0]
+        packages[package] = packages.get(package, 0.0) + m['self_ms']
+
+    def rounded(items):
+        return [{k: round(v, 2) if isinstance(v, float) else v for k, v in item.items() if k != 'depth'} for item in items]
+
+    return {
+        'total_ms': round(total_ms, 1),
+        'top_direct_imports': rounded(sorted(direct, key=lambda m: m['cumulative_ms'], reverse=True)[:top]),
+        'top_packages': [{'package': p, 'self_ms': round(ms, 2)} for p, ms in sorted(packages.items(), key=lambda i: i[1], reverse=True)[:top]],
+        'top_self': rounded(sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:top])
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_startup(timeout: float, startup_mode: str) -> Dict[str, Any]:
+    """Arrancar el servidor y medir puerto abierto / backend listo"""
+    port = _free_port()
+    env = os.environ.copy()
+    env.update({"ALFRED_HOST": "127.0.0.1", "ALFRED_PORT": str(port), "ALFRED_STARTUP_MODE": startup_mode})
+
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "alfred_backend.py"], cwd=CORE_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    port_open = None
+    ready = None
+    first_health = None
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline and process.poll() is None:
+            if port_open is None:
+                try:
+                    with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                        port_open = time.perf_counter() - start
+                except OSError:
+                    time.sleep(0.02)
+                    continue
+
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=5) as response:
+                    health = json.loads(response.read())
+                if first_health is None:
+                    first_health = time.perf_counter() - start
+                if health.get("is_fully_initialized"):
+                    ready = time.perf_counter() - start
+                    break
+            except Exception:
+                pass
+            time.sleep(0.05)
+
+        timeline = {}
+        if port_open is not None:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/startup", timeout=5) as response:
+                    timeline = json.loads(response.read()).get("timeline", {})
+            except Exception:
+                pass
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+    return {
+        'port_open_seconds': round(port_open, 3) if port_open is not None else None,
+        'first_health_seconds': round(first_health, 3) if first_health is not None else None,
+        'ready_seconds': round(ready, 3) if ready is not None else None,
+        'server_timeline': timeline
+    }
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    env = setup_environment()
+    try:
+        print("Perfilando imports de alfred_backend...")
+        imports = profile_imports(args.top)
+        print(f"\nImport total: {imports['total_ms']:.0f}ms")
+        print(f"{'import directo':<40} {'acumulado ms':>14}")
+        for item in imports['top_direct_imports']:
+            print(f"{item['module']:<40} {item['cumulative_ms']:>14.1f}")
+
+        runs: List[Dict[str, Any]] = []
+        for run in range(args.runs):
+            print(f"\nArranque {run + 1}/{args.runs} (modo {args.startup_mode})...")
+            runs.append(measure_startup(args.timeout, args.startup_mode))
+            print(f"  puerto abierto: {runs[-1]['port_open_seconds']}s  listo: {runs[-1]['ready_seconds']}s")
+
+        def median(key):
+            values = [r[key] for r in runs if r[key] is not None]
+            return round(statistics.median(values), 3) if values else None
+
+        results = {
+            'imports': imports,
+            'startup': {
+                'port_open_median_seconds': median('port_open_seconds'),
+                'ready_median_seconds': median('ready_seconds'),
+                'runs': runs
+            }
+        }
+        target = write_results('startup', {'runs': args.runs, 'startup_mode': args.startup_mode}, results, args.output)
+        print(f"\nPuerto abierto (mediana): {results['startup']['port_open_median_seconds']}s")
+        print(f"Backend listo (mediana):  {results['startup']['ready_median_seconds']}s")
+        print(f"Resultados guardados en: {target}")
+        return 0
+    finally:
+        env.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
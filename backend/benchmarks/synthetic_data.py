@@ -0,0 +1,184 @@
+"""
+Synthetic Data - Corpus de documentos e historial Q&A sinteticos y deterministas
+Misma semilla = mismos archivos, preguntas y respuestas en cada ejecucion
+"""
+
+import random
+from pathlib import Path
+from typing import List, Tuple
+
+TOPICS = {
+    'finanzas': ['presupuesto', 'factura', 'impuestos', 'nomina', 'ahorro', 'credito', 'banco', 'gastos', 'ingresos', 'declaracion'],
+    'salud': ['consulta', 'receta', 'vacuna', 'analisis', 'seguro', 'hospital', 'medico', 'tratamiento', 'cita', 'dieta'],
+    'trabajo': ['proyecto', 'reunion', 'contrato', 'entrega', 'cliente', 'informe', 'equipo', 'objetivo', 'horario', 'evaluacion'],
+    'hogar': ['renta', 'mantenimiento', 'mudanza', 'garantia', 'electricidad', 'agua', 'internet', 'muebles', 'vecinos', 'reparacion'],
+    'viajes': ['vuelo', 'hotel', 'pasaporte', 'itinerario', 'reserva', 'equipaje', 'visa', 'aeropuerto', 'tren', 'museo'],
+    'estudios': ['curso', 'examen', 'titulo', 'certificado', 'tarea', 'beca', 'universidad', 'calificacion', 'tesis', 'inscripcion'],
+}
+
+FILLER = [
+    'el', 'la', 'de', 'para', 'con', 'segun', 'durante', 'mes', 'semana', 'documento', 'registro',
+    'pendiente', 'revisado', 'importante', 'anterior', 'siguiente', 'total', 'fecha', 'nota', 'resumen'
+]
+
+QUESTION_TEMPLATES = [
+    'Cual es el {a} del {b}?',
+    'Cuando vence la {a} de {b}?',
+    'Donde guarde el {a} sobre {b}?',
+    'Que dice el {a} acerca de {b}?',
+    'Cuanto fue el {a} en {b}?',
+]
+
+
+def _sentence(rng: random.Random, words: List[str], length: int) -> str:
+    tokens = [rng.choice(words) if rng.random() < 0.6 else rng.choice(FILLER) for _ in range(length)]
+    return ' '.join(tokens).capitalize() + '.'
+
+
+def generate_corpus(target_dir: Path, num_documents: int = 100, paragraphs: int = 8, seed: int = 42) -> List[Path]:
+    """
+    Escribir un corpus sintetico de archivos .txt y .md
+
+    Args:
+        target_dir: Directorio destino (se crea si no existe)
+        num_documents: Numero de archivos
+        paragraphs: Parrafos por archivo (cada uno ~5 oraciones)
+        seed: Semilla del generador
+
+    Returns:
+        Rutas de los archivos generados
+    """
+    rng = random.Random(seed)
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    topic_names = sorted(TOPICS)
+    files = []
+
+    for index in range(num_documents):
+        topic = topic_names[index % len(topic_names)]
+        words = TOPICS[topic]
+        subdir = target_dir / topic
+        subdir.mkdir(exist_ok=True)
+        extension = '.md' if index % 3 == 0 else '.txt'
+        path = subdir / f"{topic}_{index:05d}{extension}"
+
+        lines = [f"# {topic.capitalize()} {index}" if extension == '.md' else f"{topic.upper()} {index}", '']
+        for _ in range(paragraphs):
+            lines.append(' '.join(_sentence(rng, words, rng.randint(8, 18)) for _ in range(5)))
+            lines.append('')
+        path.write_text('\n'.join(lines), encoding='utf-8')
+        files.append(path)
+
+    return files
+
+
+def generate_questions(count: int, seed: int = 7) -> List[str]:
+    """
+    Preguntas sinteticas sobre los temas del corpus (todas distintas)
+
+    Args:
+        count: Numero de preguntas
+        seed: Semilla del generador
+    """
+    rng = random.Random(seed)
+    topic_names = sorted(TOPICS)
+    questions = []
+    for index in range(count):
+        words = TOPICS[topic_names[index % len(topic_names)]]
+        a, b = rng.sample(words, 2)
+        # El sufijo numerico evita aciertos de cache entre preguntas
+        questions.append(rng.choice(QUESTION_TEMPLATES).format(a=a, b=b)[:-1] + f" {index}?")
+    return questions
+
+
+def generate_qa_history(count: int, seed: int = 11) -> List[Tuple[str, str]]:
+    """
+    Pares (pregunta, respuesta) para poblar el historial Q&A
+
+    Args:
+        count: Numero de entradas
+        seed: Semilla del generador
+    """
+    rng = random.Random(seed)
+    topic_names = sorted(TOPICS)
+    entries = []
+    for question in generate_questions(count, seed=seed):
+        words = TOPICS[rng.choice(topic_names)]
+        entries.append((question, _sentence(rng, words, rng.randint(15, 40))))
+    return entries
+
+
+# Preguntas frecuentes sobre datos personales y documentos, con una variante
+# gramatical equivalente (plural/singular, numero con letra o digito)
+FREQUENT_QUESTIONS = [
+    ('¿Cuál es mi RFC?', '¿Cuál es mi RFC?'),
+    ('¿Cuál es mi CURP?', '¿Cuál es mi CURP?'),
+    ('¿Cuál es mi número de seguro social?', '¿Cuál es mi número de seguro social?'),
+    ('¿Cuál es mi dirección?', '¿Cuáles son mis direcciones?'),
+    ('¿Cuál es mi cuenta CLABE?', '¿Cuáles son mis cuentas CLABE?'),
+    ('¿Cuándo vence mi pasaporte?', '¿Cuándo vence el pasaporte?'),
+    ('¿Cuál es el teléfono del médico?', '¿Cuáles son los teléfonos del médico?'),
+    ('¿Cuánto pagué de renta en marzo?', '¿Cuánto pagué de renta en marzo?'),
+    ('¿Dónde está el contrato de trabajo?', '¿Dónde están los contratos de trabajo?'),
+    ('¿Qué dice la factura de internet?', '¿Qué dicen las facturas de internet?'),
+    ('¿Cuándo es mi cita con el dentista?', '¿Cuándo son mis citas con el dentista?'),
+    ('¿Cuál fue mi calificación del examen 3?', '¿Cuál fue mi calificación del examen tres?'),
+    ('¿Qué vacunas tengo?', '¿Qué vacuna tengo?'),
+    ('¿Cuál es el número de mi póliza de seguro?', '¿Cuál es el número de mi póliza del seguro?'),
+    ('¿Cuál es mi salario?', '¿Cuál es mi sueldo?'),
+]
+
+_PREFIXES = ['', '', '', 'oye alfred, ', 'Alfred, ', 'me puedes decir ', 'quiero saber ', 'hola, ']
+_SUFFIXES = ['', '', '', ' por favor', ', porfa', ' gracias']
+
+
+def _strip_accents(text: str) -> str:
+    import unicodedata
+    return ''.join(ch for ch in unicodedata.normalize('NFKD', text) if not unicodedata.combining(ch))
+
+
+def _surface_variant(rng: random.Random, question: str) -> str:
+    """Variante de escritura: mayusculas, acentos, signos, espacios y cortesia"""
+    text = question
+    if rng.random() < 0.4:
+        text = _strip_accents(text)
+    if rng.random() < 0.5:
+        text = text.strip('¿?')
+    if rng.random() < 0.3:
+        text = text.lower()
+    elif rng.random() < 0.1:
+        text = text.upper()
+    if rng.random() < 0.2:
+        text = text.replace(' ', '  ', 1)
+    prefix = rng.choice(_PREFIXES)
+    suffix = rng.choice(_SUFFIXES)
+    if prefix:
+        text = prefix + (text[0].lower() + text[1:] if text[:1].isupper() and not text.isupper() else text)
+    if suffix:
+        text = text.rstrip('?') + suffix + ('?' if text.endswith('?') else '')
+    return text
+
+
+def generate_question_stream(count: int, unique_ratio: float = 0.2, seed: int = 23) -> List[str]:
+    """
+    Secuencia de preguntas como las escribe un usuario real: las frecuentes se
+    repiten con otra redaccion (acentos, signos, cortesia, plural) y se mezclan
+    con preguntas unicas
+
+    Args:
+        count: Numero de preguntas
+        unique_ratio: Fraccion de preguntas que no se repiten
+        seed: Semilla del generador
+    """
+    rng = random.Random(seed)
+    unique = iter(generate_questions(count, seed=seed))
+    stream = []
+    for _ in range(count):
+        if rng.random() < unique_ratio:
+            stream.append(next(unique))
+            continue
+        # Distribucion sesgada: pocas preguntas concentran la mayoria de repeticiones
+        index = min(int(rng.expovariate(1 / 4)), len(FREQUENT_QUESTIONS) - 1)
+        base = FREQUENT_QUESTIONS[index][rng.random() < 0.3]
+        stream.append(_surface_variant(rng, base))
+    return stream
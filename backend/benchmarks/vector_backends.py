@@ -0,0 +1,262 @@
+"""
+Vector Backends - ChromaDB vs indice vectorial local (flat / HNSW)
+Construye cada backend con los mismos embeddings sinteticos (agrupados por
+"documento") y mide tiempo de carga, latencia de busqueda con y sin filtro,
+recall@k contra la busqueda exacta, borrado por fuente y espacio en disco
+
+Uso:
+    python backend/benchmarks/vector_backends.py
+    python backend/benchmarks/vector_backends.py --chunks 200000 --dim 768 --queries 200
+    python backend/benchmarks/vector_backends.py --backends local-flat-float16 local-hnsw-float32
+"""
+
+import sys
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from common import BACKEND_ROOT, summarize_latencies, write_results, Timer
+
+for sub in ("", "core", "utils"):
+    path = str(BACKEND_ROOT / sub) if sub else str(BACKEND_ROOT)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+BACKENDS = [
+    'chroma',
+    'local-flat-float32',
+    'local-flat-float16',
+    'local-flat-int8',
+    'local-hnsw-float32',
+    'local-hnsw-float16',
+    'local-hnsw-int8',
+]
+
+ADD_BATCH = 5000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Comparacion de backends vectoriales")
+    parser.add_argument("--chunks", type=int, default=20000, help="Chunks (vectores) a indexar")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension de los embeddings")
+    parser.add_argument("--sources", type=int, default=500, help="Documentos fuente (grupos de chunks)")
+    parser.add_argument("--queries", type=int, default=100, help="Consultas a medir")
+    parser.add_argument("--k", type=int, default=8, help="Resultados por consulta")
+    parser.add_argument("--deletes", type=int, default=20, help="Documentos a borrar por fuente")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS, help="Backends a medir")
+    parser.add_argument("--seed", type=int, default=7, help="Semilla de los datos sinteticos")
+    parser.add_argument("--output", default=None, help="Directorio de resultados (default: benchmarks/results)")
+    return parser.parse_args(argv)
+
+
+def generate_dataset(args) -> Tuple[np.ndarray, List[Dict], np.ndarray]:
+    """
+    Embeddings agrupados por documento (centro + ruido) y consultas cercanas
+
+    Returns:
+        Tupla (vectores, metadatas, consultas)
+    """
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((args.sources, args.dim)).astype(np.float32)
+    owners = rng.integers(0, args.sources, size=args.chunks)
+    vectors = centers[owners] + 0.6 * rng.standard_normal((args.chunks, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    metadatas = [
+        {'source': f"/docs/doc_{owner:05d}.txt", 'path_id': int(owner % 4) + 1, 'chunk': i}
+        for i, owner in enumerate(owners)
+    ]
+
+    picked = rng.integers(0, args.sources, size=args.queries)
+    queries = centers[picked] + 0.8 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, metadatas, queries
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int, mask: np.ndarray = None) -> List[set]:
+    """Top-k exacto (L2) por consulta, opcionalmente restringido a una mascara"""
+    rows = np.flatnonzero(mask) if mask is not None else np.arange(len(vectors))
+    subset = vectors[rows].astype(np.float64)
+    norms = (subset * subset).sum(axis=1)
+    truth = []
+    for query in queries.astype(np.float64):
+        distances = norms - 2 * subset @ query
+        top = np.argpartition(distances, k - 1)[:k]
+        truth.append({int(rows[i]) for i in top})
+    return truth
+
+
+def directory_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class ChromaAdapter:
+    """Coleccion de Chroma en un directorio temporal"""
+
+    def __init__(self, directory: Path):
+        import chromadb
+        from chromadb.config import Settings
+        self.client = chromadb.PersistentClient(path=str(directory), settings=Settings(anonymized_telemetry=False))
+        self.collection = self.client.get_or_create_collection("benchmark")
+
+    def add(self, ids, vectors, metadatas):
+        for start in range(0, len(ids), ADD_BATCH):
+            end = start + ADD_BATCH
+            self.collection.add(
+                ids=ids[start:end],
+                embeddings=vectors[start:end].tolist(),
+                documents=[f"chunk {i}" for i in ids[start:end]],
+                metadatas=metadatas[start:end]
+            )
+
+    def search(self, query, k, where=None) -> List[int]:
+        result = self.collection.query(query_embeddings=[query.tolist()], n_results=k, where=where, include=[])
+        return [int(i) for i in result['ids'][0]]
+
+    def delete_source(self, source: str):
+        self.collection.delete(where={'source': source})
+
+    def close(self):
+        self.client = None
+
+
+class LocalAdapter:
+    """LocalVectorStore con el tipo de indice y almacenamiento indicados"""
+
+    def __init__(self, directory: Path, index_type: str, dtype: str):
+        from vector_index import LocalVectorStore
+        self.store = LocalVectorStore(str(directory), collection_name="benchmark", index_type=index_type, dtype=dtype)
+        self.effective_index = self.store.index_type
+
+    def add(self, ids, vectors, metadatas):
+        for start in range(0, len(ids), ADD_BATCH):
+            end = start + ADD_BATCH
+            self.store.add_embeddings(
+                texts=[f"chunk {i}" for i in ids[start:end]],
+                embeddings=vectors[start:end],
+                metadatas=metadatas[start:end],
+                ids=ids[start:end]
+            )
+
+    def search(self, query, k, where=None) -> List[int]:
+        return [int(self.store._ids[row]) for row, _ in self.store.search_rows(query, k, where)]
+
+    def delete_source(self, source: str):
+        self.store.delete_where({'source': source})
+
+    def close(self):
+        self.store = None
+
+
+def open_backend(name: str, directory: Path):
+    if name == 'chroma':
+        return ChromaAdapter(directory)
+    _, index_type, dtype = name.split('-')
+    return LocalAdapter(directory, index_type, dtype)
+
+
+def recall(results: List[List[int]], truth: List[set], k: int) -> float:
+    if not truth:
+        return 0.0
+    hits = sum(len(set(found) & expected) for found, expected in zip(results, truth))
+    return round(hits / (len(truth) * k), 4)
+
+
+def bench_backend(name: str, workdir: Path, args, vectors, metadatas, queries, truth, filtered_truth) -> Dict:
+    """Construir un backend y medir carga, busquedas, recall, borrado y disco"""
+    directory = workdir / name
+    ids = [str(i) for i in range(len(vectors))]
+    backend = open_backend(name, directory)
+    result = {}
+    if getattr(backend, 'effective_index', None) == 'flat' and '-hnsw-' in name:
+        result['note'] = 'hnswlib no instalado: se midio el indice flat'
+
+    with Timer() as t:
+        backend.add(ids, vectors, metadatas)
+    result['build_seconds'] = round(t.elapsed, 3)
+    result['vectors_per_second'] = round(len(ids) / t.elapsed, 1) if t.elapsed else 0.0
+    result['disk_bytes'] = directory_size(directory)
+    if isinstance(backend, LocalAdapter):
+        result['memory_bytes'] = backend.store.storage_stats()['memory_bytes']
+
+    # Calentamiento (cache del sistema de archivos / carga del indice)
+    backend.search(queries[0], args.k)
+
+    latencies, found = [], []
+    for query in queries:
+        with Timer() as t:
+            rows = backend.search(query, args.k)
+        latencies.append(t.elapsed)
+        found.append(rows)
+    result['search'] = summarize_latencies(latencies)
+    result['recall_at_k'] = recall(found, truth, args.k)
+
+    where = {'path_id': 1}
+    latencies, found = [], []
+    for query in queries:
+        with Timer() as t:
+            rows = backend.search(query, args.k, where)
+        latencies.append(t.elapsed)
+        found.append(rows)
+    result['filtered_search'] = summarize_latencies(latencies)
+    result['filtered_recall_at_k'] = recall(found, filtered_truth, args.k)
+
+    sources = sorted({m['source'] for m in metadatas})[:args.deletes]
+    latencies = []
+    for source in sources:
+        with Timer() as t:
+            backend.delete_source(source)
+        latencies.append(t.elapsed)
+    result['delete_by_source'] = summarize_latencies(latencies)
+
+    backend.close()
+    return result
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    print(f"Generando {args.chunks} vectores de dimension {args.dim}...")
+    vectors, metadatas, queries = generate_dataset(args)
+    truth = exact_neighbors(vectors, queries, args.k)
+    path_mask = np.array([m['path_id'] == 1 for m in metadatas])
+    filtered_truth = exact_neighbors(vectors, queries, args.k, path_mask)
+
+    workdir = Path(tempfile.mkdtemp(prefix="alfred_vectors_"))
+    backends = {}
+    try:
+        for name in args.backends:
+            print(f"Midiendo {name}...")
+            try:
+                backends[name] = bench_backend(name, workdir, args, vectors, metadatas, queries, truth, filtered_truth)
+            except ImportError as e:
+                print(f"  Saltado: {e}")
+                backends[name] = {'skipped': str(e)}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'backend':<20} {'carga s':>8} {'p50 ms':>8} {'p95 ms':>8} {'filtro p95':>11} {'recall':>7} {'borrar ms':>10} {'disco MB':>9} {'RAM MB':>7}")
+    for name, data in backends.items():
+        if 'skipped' in data:
+            print(f"{name:<20} saltado")
+            continue
+        print(f"{name:<20} {data['build_seconds']:>8} {data['search']['p50_ms']:>8} {data['search']['p95_ms']:>8} "
+              f"{data['filtered_search']['p95_ms']:>11} {data['recall_at_k']:>7} {data['delete_by_source']['mean_ms']:>10} "
+              f"{data['disk_bytes'] / 1024 / 1024:>9.1f} {data.get('memory_bytes', 0) / 1024 / 1024:>7.1f}")
+
+    config = {
+        'chunks': args.chunks, 'dim': args.dim, 'sources': args.sources, 'queries': args.queries,
+        'k': args.k, 'deletes': args.deletes, 'seed': args.seed
+    }
+    target = write_results('vector_backends', config, {'backends': backends}, args.output)
+    print(f"Resultados guardados en: {target}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
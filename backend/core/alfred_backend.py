@@ -17,6 +17,7 @@ sys.path.insert(0, str(backend_root / "gpu"))
 sys.path.insert(0, str(backend_root / "utils"))
 
 from utils.logger import get_logger
+from utils import startup
 
 # ============================================
 # AUTO-REPARACION DE DEPENDENCIAS
@@ -28,7 +29,8 @@ try:
     logger_temp.info("[STARTUP] Verificando integridad del sistema...")
     
     # Verificar estado antes de continuar
-    repair_status = get_repair_status()
+    # chromadb no se importa aqui: se carga en segundo plano junto con el vectorstore
+    repair_status = get_repair_status(check_chromadb=False)
     
     if repair_status['overall'] == 'needs_repair':
         logger_temp.warning("[STARTUP] Detectados problemas - Aplicando correcciones automaticas...")
@@ -60,23 +62,29 @@ if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 from contextlib import asynccontextmanager
 import asyncio
 import json
+import time
 
 # Importar módulos locales
 import functionsToHistory
 from alfred_core import AlfredCore
+from ollama_client import get_ollama_client, OllamaClientError
+from llm_scheduler import SchedulerSaturatedError
 from conversation_manager import get_conversation_manager
+from utils import metrics
 from utils.security import encrypt_data, decrypt_data, encrypt_for_transport, is_encryption_enabled
 from functionsToHistory import encrypt_personal_data, decrypt_personal_data
 
+startup.mark('imports')
+
 # --- Utilidades para procesamiento de archivos ---
 
 def extract_text_from_pdf(content: str, file_name: str) -> str:
@@ -332,6 +340,28 @@ def extract_text_from_pptx(content: str, file_name: str) -> str:
 
 # --- Modelos de datos para la API ---
 
+class SearchFilters(BaseModel):
+    """Alcance de la busqueda en documentos (se aplica como filtro de ChromaDB)"""
+    path_ids: Optional[List[int]] = Field(None, description="IDs de rutas de documentos (GET /documents/paths)")
+    extensions: Optional[List[str]] = Field(None, description="Extensiones de archivo, ej: ['.pdf', 'docx']")
+    modified_after: Optional[datetime] = Field(None, description="Solo archivos modificados despues de esta fecha (ISO 8601)")
+    
+    @field_validator('extensions')
+    @classmethod
+    def validate_extensions(cls, v: Optional[List[str]]) -> Optional[List[str]]:
+        """Normalizar extensiones a '.ext' en minusculas"""
+        if v is None:
+            return v
+        normalized = ['.' + ext.strip().lower().lstrip('.') for ext in v if ext.strip().lstrip('.')]
+        if not normalized:
+            raise ValueError('extensions no puede estar vacio')
+        return normalized
+    
+    def to_where(self) -> Optional[Dict[str, Any]]:
+        """Filtro 'where' de ChromaDB (None si no hay alcance)"""
+        from retriever import build_scope_filter
+        return build_scope_filter(self.path_ids, self.extensions, self.modified_after)
+
 class QueryRequest(BaseModel):
     """Solicitud de consulta al asistente con validacion mejorada"""
     question: str = Field(
@@ -343,10 +373,12 @@ class QueryRequest(BaseModel):
     use_history: bool = Field(True, description="Buscar primero en el historial")
     save_response: bool = Field(False, description="Guardar respuesta automaticamente")
     search_documents: bool = Field(True, description="Buscar en documentos o solo usar el prompt")
+    include_timings: bool = Field(False, description="Incluir desglose de latencia por etapa en la respuesta")
     search_kwargs: Optional[Dict[str, Any]] = Field(
         None, 
-        description="Parametros adicionales de busqueda (k, fetch_k, search_type)"
+        description="Parametros adicionales de busqueda (k, fetch_k, search_type, fusion: rrf/weighted/semantic/keyword)"
     )
+    filters: Optional[SearchFilters] = Field(None, description="Limitar la busqueda por ruta, tipo de archivo o fecha")
     
     @field_validator('question')
     @classmethod
@@ -361,13 +393,16 @@ class QueryRequest(BaseModel):
     def validate_search_kwargs(cls, v: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
         """Validar que search_kwargs solo contenga claves permitidas"""
         if v is not None:
-            allowed_keys = {'k', 'fetch_k', 'search_type', 'score_threshold'}
+            allowed_keys = {'k', 'fetch_k', 'search_type', 'score_threshold', 'fusion'}
             invalid_keys = set(v.keys()) - allowed_keys
             if invalid_keys:
                 raise ValueError(
                     f'Claves no permitidas en search_kwargs: {invalid_keys}. '
                     f'Claves permitidas: {allowed_keys}'
                 )
+            from retriever import FUSION_MODES
+            if 'fusion' in v and v['fusion'] not in FUSION_MODES:
+                raise ValueError(f"fusion no valida: {v['fusion']}. Opciones: {list(FUSION_MODES)}")
         return v
 
 class QueryResponse(BaseModel):
@@ -381,6 +416,7 @@ class QueryResponse(BaseModel):
     context_count: int = Field(0, description="Número de fragmentos recuperados")
     from_cache: Optional[bool] = Field(None, description="Si la respuesta proviene del cache en memoria")
     cache_age_seconds: Optional[float] = Field(None, description="Edad del cache en segundos")
+    timings: Optional[Dict[str, float]] = Field(None, description="Latencia por etapa en milisegundos (si include_timings)")
     
     class Config:
         extra = "allow"  # Permitir campos adicionales para compatibilidad futura
@@ -524,6 +560,8 @@ class QueryWithConversationRequest(BaseModel):
     save_response: bool = Field(False, description="Guardar respuesta en historial Q&A")
     search_documents: bool = Field(True, description="Buscar en documentos o solo usar el prompt")
     search_kwargs: Optional[Dict[str, Any]] = Field(None, description="Parametros adicionales de busqueda")
+    filters: Optional[SearchFilters] = Field(None, description="Limitar la busqueda por ruta, tipo de archivo o fecha")
+    include_timings: bool = Field(False, description="Incluir desglose de latencia por etapa en la respuesta")
     max_context_messages: int = Field(50, description="Numero maximo de mensajes de contexto", ge=1, le=50)
     temp_document: Optional[Dict[str, str]] = Field(None, description="Documento temporal adjunto (name, content)")
 
@@ -576,15 +614,101 @@ class ThemeResponse(BaseModel):
     theme: str = Field(..., description="Tema actual")
     updated_at: Optional[str] = Field(None, description="Fecha de ultima actualizacion")
 
+class ProfileRequest(BaseModel):
+    """Solicitud de perfilado bajo demanda"""
+    mode: str = Field("sampling", description="Perfilador: 'sampling' (pilas colapsadas) o 'cprofile' (pstats)")
+    target: str = Field("duration", description="'duration' (N segundos) o 'next_query' (siguiente consulta)")
+    seconds: float = Field(10.0, description="Duracion del perfilado o espera maxima de la consulta", gt=0, le=600)
+    interval_ms: float = Field(5.0, description="Periodo de muestreo (solo sampling)", ge=1, le=1000)
+    all_threads: bool = Field(False, description="Muestrear todos los hilos, no solo el event loop (solo sampling)")
+    sort: str = Field("cumulative", description="Orden de pstats (solo cprofile)")
+    limit: int = Field(50, description="Entradas maximas del reporte", ge=1, le=5000)
+
+    @field_validator('mode')
+    @classmethod
+    def validate_mode(cls, v):
+        if v not in ('sampling', 'cprofile'):
+            raise ValueError("mode debe ser 'sampling' o 'cprofile'")
+        return v
+
+    @field_validator('target')
+    @classmethod
+    def validate_target(cls, v):
+        if v not in ('duration', 'next_query'):
+            raise ValueError("target debe ser 'duration' o 'next_query'")
+        return v
+
 # --- Inicialización del núcleo de Alfred ---
 alfred_core: Optional[AlfredCore] = None
 _initialization_complete: bool = False  # Flag para indicar cuando initialize_async() ha terminado
+_initialization_error: Optional[str] = None  # Error de la inicializacion en segundo plano
+_initialization_task: Optional[asyncio.Task] = None
+
+# 'background' (default): el puerto se abre de inmediato y AlfredCore se inicializa
+# en segundo plano (readiness via is_fully_initialized). 'blocking': comportamiento anterior
+STARTUP_MODE = os.getenv('ALFRED_STARTUP_MODE', 'background').lower()
+
+async def initialize_core():
+    """Inicializar AlfredCore (GPU, vectorstore, retriever) y marcar el backend como listo"""
+    global _initialization_complete
+    
+    print("Inicializando componentes async (lazy loading)...", flush=True)
+    await alfred_core.initialize_async()
+    
+    print("\n" + "="*60, flush=True)
+    print("Alfred Core Refactored inicializado correctamente", flush=True)
+    print(f"  - Embedding Model: {alfred_core.embedding_model}", flush=True)
+    print(f"  - Vector Store: {alfred_core.chroma_db_path}", flush=True)
+    print(f"  - Optimizations: Incremental indexing + LRU cache + Adaptive chunking", flush=True)
+    print("="*60 + "\n", flush=True)
+    
+    # MARCAR COMO COMPLETAMENTE LISTO SOLO DESPUES DE initialize_async()
+    _initialization_complete = True
+    startup.get_readiness().set_ready()
+    elapsed = startup.mark('core_ready')
+    print(f"INITIALIZATION COMPLETE: Backend completamente listo para procesar consultas ({elapsed:.2f}s)", flush=True)
+    sys.stdout.flush()
+
+async def warm_up_llm():
+    """Etapa final 'llm_warm': precargar el modelo (ALFRED_WARMUP_LLM=false para omitirla)"""
+    if os.getenv('ALFRED_WARMUP_LLM', 'true').lower() != 'true':
+        startup.get_readiness().skip('llm_warm', 'ALFRED_WARMUP_LLM=false')
+        return
+    await alfred_core.warm_up_llm_async()
+
+async def initialize_core_background():
+    """Inicializacion en segundo plano: los errores se reportan en /health/startup y /health/ready"""
+    global _initialization_error
+    
+    try:
+        await initialize_core()
+        await warm_up_llm()
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        _initialization_error = str(e)
+        startup.get_readiness().fail(str(e))
+        print(f"\nError al inicializar Alfred Core: {e}", flush=True)
+        import traceback
+        traceback.print_exc()
+        sys.stdout.flush()
+
+def invalidate_search_caches():
+    """Invalidar las caches que dependen del indice (respuestas y retrieval) tras modificarlo"""
+    from retrieval_cache import get_retrieval_cache
+    
+    if hasattr(get_retrieval_cache, '_instance'):
+        get_retrieval_cache().invalidate()
+    if alfred_core:
+        alfred_core.clear_query_cache()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manejo del ciclo de vida de la aplicación"""
     global alfred_core
     global _initialization_complete
+    global _initialization_error
+    global _initialization_task
     
     # IMPORTANTE: Usar sys.stdout.flush() para forzar salida inmediata en Windows
     import sys
@@ -595,28 +719,27 @@ async def lifespan(app: FastAPI):
     sys.stdout.flush()
     
     _initialization_complete = False  # Marcar como no listo
+    _initialization_error = None
+    startup.get_readiness().reset()
+    
+    # Monitor de bloqueos del event loop (ver /diagnostics/event-loop)
+    from utils.loop_monitor import get_loop_monitor
+    if os.getenv('ALFRED_LOOP_MONITOR', 'true').lower() == 'true':
+        get_loop_monitor().start()
     
     try:
         # Inicializar el núcleo de Alfred con version refactorizada (async + optimizaciones)
         print("Creando instancia de AlfredCore...", flush=True)
         alfred_core = AlfredCore()
         
-        print("Inicializando componentes async (lazy loading)...", flush=True)
-        await alfred_core.initialize_async()
-        
-        print("\n" + "="*60, flush=True)
-        print("Alfred Core Refactored inicializado correctamente", flush=True)
-        print(f"  - Embedding Model: {alfred_core.embedding_model}", flush=True)
-        print(f"  - Vector Store: {alfred_core.chroma_db_path}", flush=True)
-        print(f"  - Optimizations: Incremental indexing + LRU cache + Adaptive chunking", flush=True)
-        print("="*60 + "\n", flush=True)
-        sys.stdout.flush()
-        
-        # MARCAR COMO COMPLETAMENTE LISTO SOLO DESPUES DE initialize_async()
-        _initialization_complete = True
-        print("INITIALIZATION COMPLETE: Backend completamente listo para procesar consultas", flush=True)
-        sys.stdout.flush()
+        if STARTUP_MODE == 'blocking':
+            await initialize_core()
+            _initialization_task = asyncio.create_task(warm_up_llm())
+        else:
+            print("Arranque rapido: AlfredCore se inicializa en segundo plano", flush=True)
+            _initialization_task = asyncio.create_task(initialize_core_background())
         
+        startup.mark('serving')
         yield
     except Exception as e:
         print(f"\nError al inicializar Alfred Core: {e}", flush=True)
@@ -624,13 +747,21 @@ async def lifespan(app: FastAPI):
         traceback.print_exc()
         sys.stdout.flush()
         _initialization_complete = False  # Marcar como fallido
+        startup.get_readiness().fail(str(e))
         raise
     finally:
         print("\n" + "="*60, flush=True)
         print("Cerrando Alfred Backend API...", flush=True)
         print("="*60 + "\n", flush=True)
         sys.stdout.flush()
-        # Aquí podrías agregar limpieza si es necesaria
+        if _initialization_task and not _initialization_task.done():
+            _initialization_task.cancel()
+            try:
+                await _initialization_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        await get_loop_monitor().stop()
+        await get_ollama_client().aclose()
 
 
 backend_logger = get_logger("server")
@@ -645,6 +776,115 @@ security_logger.info(f"Iniciando seguridad en {os.getenv('ALFRED_SECURITY_IP', '
 # Inicio de la base de datos
 init_db()
 
+def scheduler_http_error(error: SchedulerSaturatedError) -> HTTPException:
+    """
+    Convertir saturacion de la cola del LLM en 429/503 con cabecera Retry-After
+    
+    Args:
+        error: Error lanzado por el scheduler
+    
+    Returns:
+        HTTPException lista para lanzar
+    """
+    import math
+    
+    return HTTPException(
+        status_code=error.status_code,
+        detail=str(error),
+        headers={"Retry-After": str(math.ceil(error.retry_after))}
+    )
+
+def require_diagnostics_access(request: Request, token: Optional[str]):
+    """
+    Proteger endpoints de perfilado (habilitados por config, solo localhost, token opcional)
+    
+    Raises:
+        HTTPException: 403 si el acceso no esta permitido
+    """
+    from utils.profiler import check_access
+    
+    try:
+        check_access(request.client.host if request.client else None, token)
+    except PermissionError as e:
+        security_logger.warning(f"Acceso a diagnostico denegado: {e}")
+        raise HTTPException(status_code=403, detail=str(e))
+
+# --- Metricas Prometheus ---
+
+REINDEX_DOCUMENTS = metrics.counter('alfred_reindex_documents_total', 'Documentos indexados por reindexacion')
+REINDEX_CHUNKS = metrics.counter('alfred_reindex_chunks_total', 'Chunks indexados por reindexacion')
+REINDEX_SECONDS = metrics.counter('alfred_reindex_seconds_total', 'Segundos dedicados a reindexar')
+
+def collect_core_metrics():
+    """
+    Colector evaluado en cada scrape de /metrics
+    
+    Lee contadores que ya mantienen los componentes (caches, cola del LLM,
+    histogramas por etapa, tamano de la coleccion) sin instrumentar la ruta
+    caliente. No fuerza la inicializacion lazy de ningun componente.
+    """
+    from utils.tracing import get_stage_histograms
+    from retrieval_cache import get_retrieval_cache
+    from embedding_cache import get_embedding_cache
+    from reranker import get_reranker
+    
+    families = [(
+        'alfred_query_stage_duration_seconds', 'histogram',
+        'Duracion de las etapas del pipeline de consultas',
+        [({'stage': stage}, hist) for stage, hist in sorted(get_stage_histograms().items())]
+    )]
+    
+    # Caches: (nombre, hits, misses, entradas)
+    caches = []
+    if alfred_core:
+        caches.append(('answer', alfred_core._cache_hits, alfred_core._cache_misses, len(alfred_core._query_cache)))
+    if hasattr(get_retrieval_cache, '_instance'):
+        stats = get_retrieval_cache().get_stats()
+        caches.append(('retrieval', stats['hits'], stats['misses'], stats['cache_size']))
+    if hasattr(get_embedding_cache, '_instance'):
+        stats = get_embedding_cache().get_stats()
+        caches.append(('embedding', stats['hits'], stats['misses'], stats['cache_size']))
+    if hasattr(get_reranker, '_instance'):
+        stats = get_reranker._instance.get_stats()
+        caches.append(('rerank', stats['hits'], stats['misses'], stats['cache_size']))
+    
+    families.extend([
+        ('alfred_cache_hits_total', 'counter', 'Aciertos de cache',
+         [({'cache': name}, hits) for name, hits, _, _ in caches]),
+        ('alfred_cache_misses_total', 'counter', 'Fallos de cache',
+         [({'cache': name}, misses) for name, _, misses, _ in caches]),
+        ('alfred_cache_hit_ratio', 'gauge', 'Proporcion de aciertos desde el arranque',
+         [({'cache': name}, hits / (hits + misses) if hits + misses else 0.0) for name, hits, misses, _ in caches]),
+        ('alfred_cache_entries', 'gauge', 'Entradas actuales en cache',
+         [({'cache': name}, size) for name, _, _, size in caches]),
+    ])
+    
+    if alfred_core:
+        stats = alfred_core.llm_scheduler.get_stats()
+        priorities = stats['priorities']
+        families.extend([
+            ('alfred_llm_queue_depth', 'gauge', 'Llamadas al LLM esperando turno',
+             [({'priority': p}, data['queued']) for p, data in priorities.items()]),
+            ('alfred_llm_active', 'gauge', 'Generaciones en curso', [({}, stats['active'])]),
+            ('alfred_llm_admitted_total', 'counter', 'Llamadas al LLM admitidas',
+             [({'priority': p}, data['admitted']) for p, data in priorities.items()]),
+            ('alfred_llm_rejected_total', 'counter', 'Llamadas al LLM rechazadas por cola llena',
+             [({'priority': p}, data['rejected']) for p, data in priorities.items()]),
+            ('alfred_llm_queue_timeouts_total', 'counter', 'Llamadas al LLM expiradas en cola',
+             [({'priority': p}, data['timeouts']) for p, data in priorities.items()]),
+        ])
+        
+        vector_manager = alfred_core._vector_manager
+        if vector_manager and vector_manager._vectorstore is not None:
+            families.append((
+                'alfred_chroma_collection_size', 'gauge', 'Chunks en la coleccion de ChromaDB',
+                [({}, vector_manager.count_chunks())]
+            ))
+    
+    return families
+
+metrics.register_collector(collect_core_metrics)
+
 # --- Funciones auxiliares de cifrado ---
 
 def ensure_personal_data_decrypted(data: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
@@ -714,6 +954,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Latencia por ruta (middleware ASGI, ver /metrics) ---
+app.add_middleware(metrics.MetricsMiddleware)
+
 # --- Sistema de Progreso para Reindexacion ---
 # Cola para eventos de progreso (SSE)
 progress_queues: Dict[str, asyncio.Queue] = {}
@@ -753,11 +996,15 @@ async def health_check():
         health_status = "unhealthy"
         components["alfred_core"] = "not_initialized"
     
-    # Check ChromaDB
+    # Check ChromaDB (sin forzar la carga lazy: durante el arranque aun no existe)
     try:
-        if alfred_core and alfred_core.vector_manager and alfred_core.vector_manager.vectorstore:
-            count = alfred_core.vector_manager.vectorstore._collection.count()
+        vector_manager = alfred_core._vector_manager if alfred_core else None
+        if vector_manager and vector_manager._vectorstore is not None:
+            count = vector_manager.count_chunks()
             components["chroma_db"] = f"healthy ({count} docs)"
+        elif alfred_core and not _initialization_complete and not _initialization_error:
+            health_status = "degraded"
+            components["chroma_db"] = "initializing"
         else:
             health_status = "degraded"
             components["chroma_db"] = "not_available"
@@ -765,9 +1012,9 @@ async def health_check():
         health_status = "degraded"
         components["chroma_db"] = f"error: {str(e)[:50]}"
     
-    # Check Ollama LLM
+    # Check Ollama LLM (ping HTTP al servidor, sin construir el LLM)
     try:
-        if alfred_core and alfred_core.llm:
+        if alfred_core and await get_ollama_client().is_available(timeout=1.0):
             components["ollama_llm"] = f"healthy (model: {alfred_core.model_name})"
         else:
             health_status = "degraded"
@@ -776,9 +1023,9 @@ async def health_check():
         health_status = "degraded"
         components["ollama_llm"] = f"error: {str(e)[:50]}"
     
-    # Check GPU
-    if alfred_core:
-        gpu_mgr = alfred_core.gpu_manager
+    # Check GPU (solo si ya se cargo: importar torch aqui bloquearia /health durante el arranque)
+    gpu_mgr = alfred_core._gpu_manager if alfred_core else None
+    if gpu_mgr:
         gpu_status_data = GPUStatus(
             gpu_available=gpu_mgr.has_gpu,
             device_type=gpu_mgr.device_type,
@@ -791,6 +1038,8 @@ async def health_check():
             components["gpu"] = f"available ({gpu_mgr.device_type})"
         else:
             components["gpu"] = "cpu_fallback"
+    elif alfred_core and not _initialization_complete:
+        components["gpu"] = "initializing"
     else:
         components["gpu"] = "unknown"
     
@@ -804,6 +1053,63 @@ async def health_check():
         is_fully_initialized=_initialization_complete
     )
 
+@app.get("/health/startup", tags=["General"])
+async def startup_status():
+    """
+    Linea de tiempo del arranque
+    
+    Hitos en segundos desde el inicio del proceso: imports (modulos cargados),
+    serving (puerto listo para aceptar conexiones) y core_ready (AlfredCore inicializado).
+    """
+    return {
+        "mode": STARTUP_MODE,
+        "is_fully_initialized": _initialization_complete,
+        "initialization_error": _initialization_error,
+        "timeline": startup.get_timeline(),
+        "readiness": startup.get_readiness().snapshot(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/health/ready", tags=["General"])
+async def readiness_stream():
+    """
+    Stream de readiness por etapas (Server-Sent Events)
+    
+    Emite el estado completo al conectar y en cada cambio de etapa
+    (db, embeddings, vectorstore, retriever, llm_warm). `ready=true` indica
+    que ya se aceptan consultas; el stream termina con un evento 'done'
+    cuando todas las etapas finalizan (o la inicializacion falla).
+    Reemplaza el sondeo periodico de /health desde Electron.
+    """
+    readiness = startup.get_readiness()
+    queue = readiness.subscribe()
+    
+    async def event_generator():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15.0)
+                    yield f"data: {json.dumps(event)}\n\n"
+                    if event.get('type') == 'done':
+                        break
+                except asyncio.TimeoutError:
+                    # Keep-alive: enviar comentario cada 15 segundos
+                    yield f": keep-alive\n\n"
+        except asyncio.CancelledError:
+            backend_logger.info("Cliente SSE de readiness desconectado")
+        finally:
+            readiness.unsubscribe(queue)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @app.post("/query", response_model=QueryResponse, tags=["Consultas"])
 async def query_alfred(request: QueryRequest):
     """
@@ -820,6 +1126,7 @@ async def query_alfred(request: QueryRequest):
     - **save_response**: Guardar automáticamente la respuesta en el historial (con cifrado)
     - **search_documents**: Buscar en documentos o solo usar el prompt
     - **search_kwargs**: Parámetros adicionales para la búsqueda (k, fetch_k, etc.)
+    - **filters**: Alcance de la búsqueda (path_ids, extensions, modified_after)
     """
     if not alfred_core or not alfred_core.is_initialized():
         raise HTTPException(status_code=503, detail="Alfred Core no está inicializado")
@@ -850,7 +1157,8 @@ async def query_alfred(request: QueryRequest):
             question=question,  # Usar pregunta descifrada
             use_history=request.use_history,
             search_documents=request.search_documents,
-            search_kwargs=request.search_kwargs
+            search_kwargs=request.search_kwargs,
+            filter_metadata=request.filters.to_where() if request.filters else None
         )
         
         print(f"Consulta procesada exitosamente")
@@ -890,7 +1198,8 @@ async def query_alfred(request: QueryRequest):
             sources=result.get('sources', []),
             from_history=result.get('from_history', False),
             history_score=result.get('history_score'),
-            context_count=result.get('context_count', 0)
+            context_count=result.get('context_count', 0),
+            timings=result.get('timings') if request.include_timings else None
         )
         
         # CIFRAR DATOS SENSIBLES PARA VIAJE POR LA RED
@@ -901,6 +1210,8 @@ async def query_alfred(request: QueryRequest):
         
         return response_data
     
+    except SchedulerSaturatedError as e:
+        raise scheduler_http_error(e)
     except Exception as e:
         # Sanitizar el mensaje de error para evitar problemas de encoding
         error_msg = str(e).encode('ascii', 'ignore').decode('ascii')
@@ -1071,10 +1382,10 @@ async def get_optimization_stats():
         # Info del vector manager
         vector_manager = alfred_core.vector_manager
         total_docs = 0
-        if vector_manager and vector_manager._vectorstore:
+        if vector_manager and vector_manager._vectorstore is not None:
             try:
                 # Intentar obtener conteo de documentos
-                total_docs = vector_manager._vectorstore._collection.count()
+                total_docs = vector_manager.count_chunks()
             except:
                 total_docs = 0
         
@@ -1175,10 +1486,10 @@ async def get_current_model():
 @app.post("/model", tags=["Configuración"])
 async def change_model(request: ChangeModelRequest):
     """
-    Cambiar el modelo LLM actual (lazy loading)
+    Cambiar el modelo LLM actual sin reiniciar Ollama
     
-    El modelo se configura pero NO se carga hasta la proxima consulta.
-    Esto permite cambiar entre modelos instantaneamente sin esperas.
+    El modelo anterior se descarga de memoria (keep_alive=0) y el nuevo se
+    precarga en segundo plano. El estado de carga se consulta en /model/status.
     
     - **model_name**: Nombre del nuevo modelo a utilizar
     """
@@ -1186,15 +1497,16 @@ async def change_model(request: ChangeModelRequest):
         raise HTTPException(status_code=503, detail="Alfred Core no está inicializado")
     
     try:
-        print(f"[BACKEND] Configurando modelo: {request.model_name}")
-        success = alfred_core.change_model(request.model_name)
+        backend_logger.info(f"Configurando modelo: {request.model_name}")
+        success = await alfred_core.change_model_async(request.model_name)
         
         if success:
-            print(f"[BACKEND] Modelo configurado: {request.model_name}")
+            backend_logger.info(f"Modelo configurado: {request.model_name}")
             return {
                 "status": "success",
-                "message": f"Modelo configurado como {request.model_name}. Se cargará en la próxima consulta.",
-                "model_name": request.model_name
+                "message": f"Modelo configurado como {request.model_name}. Cargando en segundo plano.",
+                "model_name": request.model_name,
+                "model_state": alfred_core.get_model_state()
             }
         else:
             error_msg = f"No se pudo configurar el modelo {request.model_name}"
@@ -1235,8 +1547,9 @@ async def get_current_model():
         # Modelo guardado en BD (puede ser diferente si acaba de iniciar)
         db_model = get_model_setting('last_used_model')
         
-        # Verificar si LLM esta cargado en memoria
-        is_loaded = alfred_core._llm is not None
+        # Verificar si el modelo esta cargado en Ollama
+        model_state = alfred_core.get_model_state()
+        is_loaded = model_state.get('status') == 'ready'
         
         # Determinar fuente del modelo
         if db_model and db_model == current_model:
@@ -1250,6 +1563,7 @@ async def get_current_model():
             "model_name": current_model,
             "source": source,
             "is_loaded": is_loaded,
+            "load_status": model_state.get('status'),
             "db_model": db_model,
             "env_model": os.getenv('ALFRED_MODEL', 'gemma2:9b')
         }
@@ -1257,6 +1571,200 @@ async def get_current_model():
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al obtener modelo actual: {str(e)}")
 
+@app.post("/diagnostics/profile", tags=["Sistema"])
+async def profile_backend(
+    request: Request,
+    profile: ProfileRequest,
+    x_alfred_diagnostics_token: Optional[str] = Header(None)
+):
+    """
+    Perfilar el backend en ejecucion sin reiniciarlo
+    
+    Requiere ALFRED_PROFILING_ENABLED=true, peticion desde localhost y, si
+    ALFRED_PROFILING_TOKEN esta definido, la cabecera X-Alfred-Diagnostics-Token.
+    
+    - **mode=sampling**: pilas colapsadas del hilo del event loop (flamegraph.pl / speedscope)
+    - **mode=cprofile**: reporte pstats de todo lo ejecutado en el loop
+    - **target=next_query**: perfila solo la siguiente consulta (seconds = espera maxima)
+    """
+    from utils.profiler import create_profiler, get_profiler_manager, ProfilerBusyError
+    
+    require_diagnostics_access(request, x_alfred_diagnostics_token)
+    
+    manager = get_profiler_manager()
+    profiler = create_profiler(
+        profile.mode,
+        interval=profile.interval_ms / 1000,
+        sort=profile.sort,
+        all_threads=profile.all_threads
+    )
+    
+    try:
+        if profile.target == 'next_query':
+            await manager.profile_next_query(profiler, timeout=profile.seconds)
+        else:
+            await manager.profile_for(profiler, profile.seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=408, detail=f"No se recibio ninguna consulta en {profile.seconds:.0f}s")
+    
+    backend_logger.info(f"Perfilado completado (mode={profile.mode}, target={profile.target})")
+    return PlainTextResponse(profiler.report(profile.limit))
+
+@app.post("/diagnostics/memory/snapshot", tags=["Sistema"])
+async def start_memory_tracking(
+    request: Request,
+    frames: int = 10,
+    x_alfred_diagnostics_token: Optional[str] = Header(None)
+):
+    """
+    Activar tracemalloc y tomar la instantanea base para diffs
+    
+    - **frames**: Profundidad de traceback guardada por asignacion (mas = mas overhead)
+    
+    Mientras tracemalloc esta activo todas las asignaciones son mas lentas;
+    detenerlo con DELETE /diagnostics/memory al terminar.
+    """
+    from utils.profiler import get_memory_tracker
+    
+    require_diagnostics_access(request, x_alfred_diagnostics_token)
+    return await asyncio.to_thread(get_memory_tracker().start, max(1, min(frames, 50)))
+
+@app.get("/diagnostics/memory/diff", tags=["Sistema"])
+async def get_memory_diff(
+    request: Request,
+    limit: int = 25,
+    group_by: str = "lineno",
+    x_alfred_diagnostics_token: Optional[str] = Header(None)
+):
+    """
+    Crecimiento de memoria desde la instantanea base (tracemalloc)
+    
+    - **limit**: Numero de ubicaciones
+    - **group_by**: 'lineno', 'filename' o 'traceback'
+    """
+    from utils.profiler import get_memory_tracker
+    
+    require_diagnostics_access(request, x_alfred_diagnostics_token)
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        raise HTTPException(status_code=400, detail="group_by debe ser 'lineno', 'filename' o 'traceback'")
+    
+    try:
+        return await asyncio.to_thread(get_memory_tracker().diff, limit, group_by)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/diagnostics/memory", tags=["Sistema"])
+async def stop_memory_tracking(
+    request: Request,
+    x_alfred_diagnostics_token: Optional[str] = Header(None)
+):
+    """Descartar la instantanea base y detener tracemalloc"""
+    from utils.profiler import get_memory_tracker
+    
+    require_diagnostics_access(request, x_alfred_diagnostics_token)
+    get_memory_tracker().stop()
+    return {"success": True, "tracing": get_memory_tracker().tracing}
+
+@app.get("/diagnostics/event-loop", tags=["Sistema"])
+async def get_event_loop_diagnostics(
+    request: Request,
+    limit: int = 10,
+    stacks: bool = True,
+    reset: bool = False,
+    x_alfred_diagnostics_token: Optional[str] = Header(None)
+):
+    """
+    Retraso del event loop y peores llamadas bloqueantes
+    
+    - **limit**: Numero de ubicaciones a devolver (ordenadas por tiempo total bloqueado)
+    - **stacks**: Incluir la ultima pila capturada de cada ubicacion
+    - **reset**: Reiniciar estadisticas despues de leerlas
+    
+    Cada bloqueo mayor a ALFRED_LOOP_LAG_THRESHOLD (default 100ms) se atribuye al
+    frame mas profundo del backend en la pila del hilo del loop. Las pilas exponen
+    rutas y codigo interno: mismo control de acceso que el resto de /diagnostics.
+    """
+    from utils.loop_monitor import get_loop_monitor
+    
+    require_diagnostics_access(request, x_alfred_diagnostics_token)
+    monitor = get_loop_monitor()
+    stats = monitor.get_stats(limit=limit, include_stacks=stacks)
+    if reset:
+        monitor.reset()
+    stats["timestamp"] = datetime.now().isoformat()
+    return stats
+
+@app.get("/stats/latency", tags=["Sistema"])
+async def get_latency_stats():
+    """
+    Histogramas de latencia por etapa del pipeline de consultas
+    
+    Etapas: history_search, query_expansion, embedding, vector_search, retrieval,
+    prompt_build, llm_queue_wait, llm_interactive, llm_expansion, query_total...
+    Cada etapa reporta count, avg_ms, p50_ms, p95_ms y max_ms (cuantiles por bucket).
+    """
+    from utils.tracing import get_stage_stats
+    
+    return {
+        "stages": get_stage_stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+@app.get("/metrics", tags=["Sistema"])
+async def get_metrics():
+    """
+    Metricas en formato de exposicion Prometheus
+    
+    Incluye latencia HTTP por ruta, latencia por etapa del pipeline, aciertos
+    de cache (answer, retrieval, embedding), cola del LLM, tokens generados,
+    reindexacion, tiempo de SQLite y tamano de la coleccion de ChromaDB.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/llm/queue", tags=["Configuración"])
+async def get_llm_queue_stats():
+    """
+    Estado de la cola del LLM (control de admision)
+    
+    Retorna concurrencia maxima, generaciones activas, profundidad de cola
+    y contadores de admitidas/rechazadas/expiradas por prioridad.
+    """
+    if not alfred_core:
+        raise HTTPException(status_code=503, detail="Alfred Core no está inicializado")
+    
+    return alfred_core.llm_scheduler.get_stats()
+
+@app.get("/model/status", tags=["Configuración"])
+async def get_model_status(refresh: bool = False):
+    """
+    Estado de carga del modelo actual en Ollama
+    
+    - **refresh**: Consultar /api/ps para confirmar si el modelo sigue en memoria
+      (puede haberse descargado al expirar keep_alive)
+    
+    Returns:
+        {
+            "model_name": "gemma2:9b",
+            "status": "idle" | "loading" | "ready" | "error",
+            "load_seconds": 3.2,
+            "error": null,
+            "updated_at": "..."
+        }
+    """
+    if not alfred_core:
+        raise HTTPException(status_code=503, detail="Alfred Core no está inicializado")
+    
+    state = alfred_core.get_model_state()
+    if refresh and state.get('status') in ('ready', 'idle'):
+        try:
+            loaded = {m.get('name') for m in await get_ollama_client().ps()}
+            state['status'] = 'ready' if state['model_name'] in loaded else 'idle'
+        except OllamaClientError as e:
+            state['error'] = str(e)
+    return state
+
 # ====================================
 # ENDPOINTS DE MODO DE APLICACION
 # ====================================
@@ -1432,11 +1940,9 @@ async def stop_ollama(background_tasks: BackgroundTasks):
     """
     Detener el servicio de Ollama manualmente para liberar recursos
     
-    Ejecuta el comando 'ollama stop <modelo>' para descargar el modelo de la memoria
+    Descarga el modelo de la memoria via API (generate con keep_alive=0)
     Se ejecuta en segundo plano para no bloquear la respuesta
     """
-    import subprocess
-    
     if not alfred_core or not alfred_core.is_initialized():
         raise HTTPException(status_code=503, detail="Alfred Core no está inicializado")
     
@@ -1444,29 +1950,13 @@ async def stop_ollama(background_tasks: BackgroundTasks):
     current_model = alfred_core.get_current_model()
     
     # Función para ejecutar en segundo plano
-    def stop_ollama_background():
+    async def stop_ollama_background():
         try:
-            print(f"[Background] Intentando detener modelo: {current_model}")
-            
-            # Ejecutar comando ollama stop con el nombre del modelo
-            result = subprocess.run(
-                ["ollama", "stop", current_model],
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            print(f"[Background] Resultado del comando: returncode={result.returncode}")
-            print(f"[Background] stdout: {result.stdout}")
-            print(f"[Background] stderr: {result.stderr}")
-            
-            if result.returncode == 0:
-                print(f"[Background] Modelo {current_model} detenido exitosamente")
-            else:
-                print(f"[Background] Error al detener modelo: {result.stderr}")
-                
+            backend_logger.info(f"Descargando modelo de memoria: {current_model}")
+            await get_ollama_client().generate(current_model, "", keep_alive=0, timeout=30.0)
+            backend_logger.info(f"Modelo {current_model} detenido exitosamente")
         except Exception as e:
-            print(f"[Background] Excepción al detener Ollama: {str(e)}")
+            backend_logger.error(f"Error al detener modelo {current_model}: {str(e)}")
     
     # Agregar tarea en segundo plano
     background_tasks.add_task(stop_ollama_background)
@@ -1549,72 +2039,69 @@ async def set_ollama_keep_alive(request: OllamaKeepAliveRequest):
 # ENDPOINTS DE GESTION DE MODELOS OLLAMA
 # ====================================
 
+def format_model_size(size_bytes: int) -> str:
+    """
+    Formatear tamano en bytes con las mismas unidades que 'ollama list'
+    
+    Args:
+        size_bytes: Tamano exacto en bytes
+    
+    Returns:
+        String legible (ej: '669 MB', '5.4 GB')
+    """
+    size = float(size_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1000:
+            return f"{size:.0f} {unit}" if unit in ("B", "KB", "MB") else f"{size:.1f} {unit}"
+        size /= 1000
+    return f"{size:.1f} TB"
+
 @app.get("/ollama/models/list", tags=["Modelos"])
-async def list_ollama_models():
+async def list_ollama_models(refresh: bool = False):
     """
     Listar todos los modelos instalados en Ollama
     
-    Ejecuta 'ollama list' y retorna la lista de modelos disponibles
-    con sus detalles (nombre, tamaño, fecha de modificacion)
-    """
-    import subprocess
-    import json
+    Consulta la API /api/tags (con cache corto invalidado por descargas y
+    eliminaciones) y retorna los modelos con tamano exacto, digest y familia.
     
+    - **refresh**: Ignorar la cache y consultar Ollama directamente
+    """
     try:
-        # Ejecutar comando ollama list
-        result = subprocess.run(
-            ["ollama", "list"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        
-        if result.returncode != 0:
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Error al ejecutar ollama list: {result.stderr}"
-            )
+        tags = await get_ollama_client().tags(use_cache=not refresh)
         
-        # Parsear la salida
-        lines = result.stdout.strip().split('\n')
-        
-        if len(lines) < 1:  # Al menos un modelo
+        models = []
+        for tag in tags:
+            details = tag.get("details") or {}
+            digest = tag.get("digest", "")
+            size_bytes = int(tag.get("size") or 0)
+            modified_at = tag.get("modified_at", "")
+            try:
+                modified = datetime.fromisoformat(modified_at.replace("Z", "+00:00")).strftime("%Y-%m-%d %H:%M")
+            except ValueError:
+                modified = modified_at
+            
+            models.append({
+                "name": tag.get("name") or tag.get("model"),
+                "id": digest[:12],
+                "size": format_model_size(size_bytes),
+                "modified": modified,
+                "size_bytes": size_bytes,
+                "digest": digest,
+                "modified_at": modified_at,
+                "format": details.get("format"),
+                "family": details.get("family"),
+                "families": details.get("families") or [],
+                "parameter_size": details.get("parameter_size"),
+                "quantization_level": details.get("quantization_level")
+            })
+        
+        if not models:
             return {
                 "models": [],
                 "count": 0,
                 "message": "No hay modelos instalados"
             }
         
-        # Procesar todas las lineas (saltar header si existe)
-        models = []
-        for line in lines:
-            # Limpiar la linea y dividir por multiples espacios
-            line = line.strip()
-            if not line:
-                continue
-            
-            # Separar por espacios multiples (usa split sin argumentos)
-            parts = line.split()
-            
-            # Saltar el header (primera linea con NAME, ID, SIZE, MODIFIED)
-            if parts[0] == 'NAME' or parts[0] == 'name':
-                continue
-            
-            if len(parts) >= 4:
-                model_name = parts[0]
-                model_id = parts[1]
-                # El tamano son 2 partes: numero + unidad (ej: 669 MB)
-                size = f"{parts[2]} {parts[3]}" if len(parts) > 3 else parts[2]
-                # Los ultimos elementos son la fecha/tiempo (despues del tamano)
-                modified = ' '.join(parts[4:]) if len(parts) > 4 else ""
-                
-                models.append({
-                    "name": model_name,
-                    "id": model_id,
-                    "size": size,
-                    "modified": modified
-                })
-        
         backend_logger.info(f"Modelos Ollama encontrados: {len(models)}")
         
         return {
@@ -1623,171 +2110,115 @@ async def list_ollama_models():
             "timestamp": datetime.now().isoformat()
         }
         
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Timeout al listar modelos de Ollama")
+    except OllamaClientError as e:
+        backend_logger.error(f"Error al listar modelos: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Ollama no disponible: {str(e)}")
     except Exception as e:
         backend_logger.error(f"Error al listar modelos: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al listar modelos: {str(e)}")
 
 @app.post("/ollama/models/download", tags=["Modelos"])
-async def download_ollama_model(background_tasks: BackgroundTasks, model_name: str):
+async def download_ollama_model(model_name: str):
     """
     Descargar un modelo de Ollama
     
-    Ejecuta 'ollama pull <model_name>' en segundo plano.
+    Consume el stream de progreso de /api/pull en segundo plano.
     El proceso puede tardar varios minutos dependiendo del tamaño del modelo.
     
     - **model_name**: Nombre del modelo a descargar (ej: llama2, mistral, gemma2:9b)
     
     La descarga se ejecuta en segundo plano y el endpoint retorna inmediatamente.
+    El progreso se puede seguir en /ollama/models/download/{model_name}/stream (SSE).
     """
-    import subprocess
-    import re
-    from db_manager import save_model_download_history, update_model_download_progress
+    from model_downloads import get_download_manager
     
     if not model_name or model_name.strip() == "":
         raise HTTPException(status_code=400, detail="El nombre del modelo es requerido")
     
-    # Función para ejecutar en segundo plano
-    def download_model_background():
-        import traceback
-        try:
-            print(f"[DEBUG] Iniciando descarga del modelo: {model_name}")
-            backend_logger.info(f"Iniciando descarga del modelo: {model_name}")
-            
-            # Guardar inicio de descarga en BD
-            try:
-                print(f"[DEBUG] Guardando en BD: {model_name}")
-                save_model_download_history(model_name, 'downloading', 'Descarga iniciada', 0)
-                print(f"[DEBUG] Guardado exitoso en BD")
-            except Exception as e:
-                print(f"[DEBUG ERROR] Error al guardar historial: {str(e)}")
-                print(f"[DEBUG ERROR] Traceback: {traceback.format_exc()}")
-                backend_logger.error(f"Error al guardar historial: {str(e)}")
-            except Exception as e:
-                backend_logger.error(f"Error al guardar historial: {str(e)}")
-            
-            # Ejecutar comando ollama pull con captura de output en tiempo real
-            process = subprocess.Popen(
-                ["ollama", "pull", model_name],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                encoding='utf-8',
-                errors='replace'  # Manejar caracteres especiales de Windows
-            )
-            
-            # Leer output linea por linea para capturar progreso
-            last_progress = 0
-            last_clean_message = ""
-            
-            for line in process.stdout:
-                # Limpieza simple de caracteres de control
-                # Remover códigos ANSI comunes: [K, [A, [1G, [?25h, etc
-                clean_line = line
-                for code in ['[K', '[A', '[1G', '[?25h', '[?25l', '[?2026l', '[?2026h']:
-                    clean_line = clean_line.replace(code, '')
-                
-                # Remover otros caracteres de control
-                clean_line = ''.join(char for char in clean_line if char.isprintable() or char in '\n\r\t')
-                clean_line = clean_line.strip()
-                
-                if not clean_line or clean_line == 'pulling manifest':
-                    continue
-                
-                # Intentar extraer porcentaje de progreso
-                if '%' in clean_line:
-                    try:
-                        # Buscar el porcentaje (patrón simple)
-                        percent_pos = clean_line.find('%')
-                        if percent_pos > 0:
-                            # Buscar hacia atrás hasta encontrar el número
-                            start = percent_pos - 1
-                            while start >= 0 and (clean_line[start].isdigit() or clean_line[start] == ' '):
-                                start -= 1
-                            progress_str = clean_line[start+1:percent_pos].strip()
-                            
-                            if progress_str.isdigit():
-                                progress = int(progress_str)
-                                
-                                # Crear mensaje simple sin caracteres especiales
-                                # Remover bloques visuales █ ▕ ▏
-                                simple_message = clean_line.replace('█', '').replace('▕', '').replace('▏', '')
-                                simple_message = ' '.join(simple_message.split())  # Normalizar espacios
-                                
-                                # Limitar longitud del mensaje
-                                if len(simple_message) > 100:
-                                    simple_message = simple_message[:97] + '...'
-                                
-                                if progress != last_progress:
-                                    last_progress = progress
-                                    last_clean_message = simple_message
-                                    update_model_download_progress(model_name, progress, simple_message)
-                                    print(f"[DEBUG] Progreso: {progress}%")
-                                    backend_logger.info(f"Progreso: {progress}%")
-                    except Exception as e:
-                        print(f"[DEBUG] Error parseando: {str(e)}")
-                        pass
-            
-            # Esperar a que termine el proceso
-            return_code = process.wait()
-            
-            print(f"[DEBUG] Proceso terminado con código: {return_code}")
-            
-            if return_code == 0:
-                print(f"[DEBUG] Descarga exitosa, guardando en BD como completed...")
-                backend_logger.info(f"Modelo {model_name} descargado exitosamente")
-                
-                # Actualizar BD con exito
-                try:
-                    save_model_download_history(model_name, 'completed', 'Descarga completada', 100)
-                    print(f"[DEBUG] Estado 'completed' guardado exitosamente")
-                except Exception as e:
-                    print(f"[DEBUG ERROR] Error al guardar completed: {str(e)}")
-                    backend_logger.error(f"Error al actualizar historial: {str(e)}")
-                    import traceback
-                    print(f"[DEBUG ERROR] Traceback: {traceback.format_exc()}")
-            else:
-                error_msg = f"Error al descargar modelo (return code: {return_code})"
-                print(f"[DEBUG] Error en descarga: {error_msg}")
-                backend_logger.error(f"Error al descargar modelo {model_name}: {error_msg}")
-                
-                # Guardar error en BD
-                try:
-                    save_model_download_history(model_name, 'failed', error_msg, last_progress)
-                except Exception as e:
-                    backend_logger.error(f"Error al guardar error en historial: {str(e)}")
-                
-        except Exception as e:
-            backend_logger.error(f"Excepcion al descargar modelo {model_name}: {str(e)}")
-            try:
-                save_model_download_history(model_name, 'failed', str(e), 0)
-            except:
-                pass
-    
-    # Agregar tarea en segundo plano
-    background_tasks.add_task(download_model_background)
+    manager = get_download_manager()
+    if manager.is_active(model_name):
+        message = f"La descarga de {model_name} ya esta en curso."
+    else:
+        manager.start(model_name)
+        message = f"Descarga de {model_name} iniciada en segundo plano. Esto puede tardar varios minutos."
     
     # Responder inmediatamente
     return {
         "status": "downloading",
-        "message": f"Descarga de {model_name} iniciada en segundo plano. Esto puede tardar varios minutos.",
+        "message": message,
         "model_name": model_name,
         "timestamp": datetime.now().isoformat()
     }
 
+@app.get("/ollama/models/download/{model_name:path}/stream", tags=["Modelos"])
+async def download_progress_stream(model_name: str):
+    """
+    Stream de progreso de una descarga de modelo (Server-Sent Events)
+    
+    Emite un evento JSON por cada actualizacion (bytes completados/totales por capa
+    agregados, porcentaje y mensaje) y termina cuando la descarga finaliza.
+    Si no hay descarga registrada para el modelo emite status 'not_found' y termina.
+    """
+    from model_downloads import get_download_manager, FINAL_STATUSES, NOT_FOUND_STATUS
+    
+    manager = get_download_manager()
+    queue = manager.subscribe(model_name)
+    
+    async def event_generator():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=15.0)
+                    yield f"data: {json.dumps(event)}\n\n"
+                    if event.get('status') in FINAL_STATUSES or event.get('status') == NOT_FOUND_STATUS:
+                        yield f"data: {json.dumps({'type': 'done', 'status': event.get('status')})}\n\n"
+                        break
+                except asyncio.TimeoutError:
+                    # Keep-alive: enviar comentario cada 15 segundos
+                    yield f": keep-alive\n\n"
+        except asyncio.CancelledError:
+            backend_logger.info(f"Cliente SSE de descarga desconectado: {model_name}")
+        finally:
+            manager.unsubscribe(model_name, queue)
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@app.post("/ollama/models/download/{model_name:path}/cancel", tags=["Modelos"])
+async def cancel_model_download(model_name: str):
+    """
+    Cancelar una descarga de modelo en curso
+    
+    Cierra la conexion de /api/pull; Ollama conserva las capas ya descargadas
+    y una nueva descarga del mismo modelo continua desde ahi.
+    """
+    from model_downloads import get_download_manager
+    
+    if not get_download_manager().cancel(model_name):
+        raise HTTPException(status_code=404, detail=f"No hay una descarga activa de {model_name}")
+    
+    return {
+        "status": "cancelling",
+        "message": f"Cancelando descarga de {model_name}",
+        "model_name": model_name
+    }
+
 @app.delete("/ollama/models/{model_name}", tags=["Modelos"])
 async def delete_ollama_model(model_name: str):
     """
     Eliminar un modelo de Ollama
     
-    Ejecuta 'ollama rm <model_name>' para eliminar el modelo del sistema.
+    Usa la API de Ollama (DELETE /api/delete) para eliminar el modelo del sistema.
     
     - **model_name**: Nombre del modelo a eliminar (debe estar instalado)
     """
-    import subprocess
     from db_manager import save_model_download_history
     
     if not model_name or model_name.strip() == "":
@@ -1796,37 +2227,25 @@ async def delete_ollama_model(model_name: str):
     try:
         backend_logger.info(f"Eliminando modelo: {model_name}")
         
-        # Ejecutar comando ollama rm
-        result = subprocess.run(
-            ["ollama", "rm", model_name],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
+        await get_ollama_client().delete(model_name)
+        backend_logger.info(f"Modelo {model_name} eliminado exitosamente")
         
-        if result.returncode == 0:
-            backend_logger.info(f"Modelo {model_name} eliminado exitosamente")
-            
-            # Guardar en historial
-            try:
-                save_model_download_history(model_name, 'deleted', 'Modelo eliminado')
-            except Exception as e:
-                backend_logger.error(f"Error al guardar en historial: {str(e)}")
-            
-            return {
-                "status": "success",
-                "message": f"Modelo {model_name} eliminado exitosamente",
-                "model_name": model_name
-            }
-        else:
-            error_msg = result.stderr or "Error desconocido"
-            backend_logger.error(f"Error al eliminar modelo: {error_msg}")
-            raise HTTPException(status_code=500, detail=error_msg)
+        # Guardar en historial
+        try:
+            save_model_download_history(model_name, 'deleted', 'Modelo eliminado')
+        except Exception as e:
+            backend_logger.error(f"Error al guardar en historial: {str(e)}")
+        
+        return {
+            "status": "success",
+            "message": f"Modelo {model_name} eliminado exitosamente",
+            "model_name": model_name
+        }
             
-    except subprocess.TimeoutExpired:
-        raise HTTPException(status_code=504, detail="Timeout al eliminar modelo")
-    except HTTPException:
-        raise
+    except OllamaClientError as e:
+        backend_logger.error(f"Error al eliminar modelo: {str(e)}")
+        status_code = 404 if e.status_code == 404 else 502
+        raise HTTPException(status_code=status_code, detail=str(e))
     except Exception as e:
         backend_logger.error(f"Error al eliminar modelo: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error al eliminar modelo: {str(e)}")
@@ -1867,6 +2286,22 @@ async def get_model_download_status_endpoint(model_name: str):
     """
     try:
         from db_manager import get_model_download_status
+        from model_downloads import get_download_manager
+        
+        # Progreso en memoria (la BD solo se actualiza a intervalos)
+        live = get_download_manager().get(model_name)
+        if live and live.status != 'pending':
+            live_status = live.to_dict()
+            return {
+                "found": True,
+                "model_name": model_name,
+                "status": live_status['status'],
+                "progress": live_status['progress'],
+                "message": live_status['message'],
+                "updated_at": live_status['updated_at'],
+                "completed_bytes": live_status['completed_bytes'],
+                "total_bytes": live_status['total_bytes']
+            }
         
         status = get_model_download_status(model_name)
         
@@ -2193,7 +2628,8 @@ async def query_with_conversation(request: QueryWithConversationRequest):
             use_history=request.use_history,
             search_documents=request.search_documents if not force_prompt_only else False,
             search_kwargs=request.search_kwargs,
-            conversation_history=conversation_history
+            conversation_history=conversation_history,
+            filter_metadata=request.filters.to_where() if request.filters else None
         )
         
         print(f"Consulta procesada exitosamente")
@@ -2263,9 +2699,12 @@ async def query_with_conversation(request: QueryWithConversationRequest):
             sources=result.get('sources', []),
             from_history=result.get('from_history', False),
             history_score=result.get('history_score'),
-            context_count=result.get('context_count', 0)
+            context_count=result.get('context_count', 0),
+            timings=result.get('timings') if request.include_timings else None
         )
     
+    except SchedulerSaturatedError as e:
+        raise scheduler_http_error(e)
     except Exception as e:
         # Sanitizar el mensaje de error
         error_msg = str(e).encode('ascii', 'ignore').decode('ascii')
@@ -2802,7 +3241,7 @@ async def update_document_path_endpoint(
     """
     try:
         from db_manager import update_document_path, get_document_paths
-        from vector_manager import VectorManager
+        from vector_manager import get_vector_manager
         import os
         
         # Si se proporciona nueva ruta, validarla
@@ -2824,9 +3263,14 @@ async def update_document_path_endpoint(
             
             if current_path_data:
                 try:
-                    vector_manager = VectorManager()
-                    deleted_chunks = vector_manager.delete_documents_by_path_sync(current_path_data['path'])
+                    vector_manager = get_vector_manager()
+                    deleted_chunks = await asyncio.to_thread(
+                        vector_manager.delete_documents_by_path_sync,
+                        current_path_data['path'],
+                        path_id=path_id
+                    )
                     backend_logger.info(f"Eliminados {deleted_chunks} chunks de ChromaDB")
+                    invalidate_search_caches()
                 except Exception as e:
                     backend_logger.error(f"Error eliminando documentos de ChromaDB: {e}")
                     # Continuar con la actualización aunque falle la eliminación
@@ -2870,14 +3314,28 @@ async def delete_document_path_endpoint(path_id: int):
         Confirmacion de eliminacion
     """
     try:
-        from db_manager import delete_document_path
+        from db_manager import delete_document_path, get_document_paths
+        from vector_manager import get_vector_manager
+        
+        # Eliminar sus chunks del indice antes de olvidar la ruta
+        path_data = next((p for p in get_document_paths(enabled_only=False) if p['id'] == path_id), None)
+        deleted_chunks = 0
+        if path_data:
+            deleted_chunks = await asyncio.to_thread(
+                get_vector_manager().delete_documents_by_path_sync,
+                path_data['path'],
+                path_id=path_id
+            )
+            if deleted_chunks:
+                invalidate_search_caches()
         
         success = delete_document_path(path_id)
         
         if success:
             return {
                 "success": True,
-                "message": "Ruta eliminada exitosamente"
+                "message": "Ruta eliminada exitosamente",
+                "deleted_chunks": deleted_chunks
             }
         else:
             raise HTTPException(status_code=404, detail="Ruta no encontrada")
@@ -2969,7 +3427,7 @@ async def reindex_documents_endpoint(background_tasks: BackgroundTasks):
     try:
         from db_manager import get_document_paths, update_document_path, update_path_scan_time
         from document_loader import DocumentLoader
-        from vector_manager import VectorManager
+        from vector_manager import get_vector_manager
         from chunking_manager import ChunkingManager
         from pathlib import Path
         
@@ -3029,9 +3487,10 @@ async def reindex_documents_endpoint(background_tasks: BackgroundTasks):
         })
         
         loader = DocumentLoader()
-        vector_manager = VectorManager()
+        vector_manager = get_vector_manager()
         chunking_manager = ChunkingManager()
         
+        reindex_start = time.perf_counter()
         total_docs = 0
         total_chunks = 0
         processed_paths = 0
@@ -3132,6 +3591,7 @@ async def reindex_documents_endpoint(background_tasks: BackgroundTasks):
                 })
                 
                 chunks = chunking_manager.split_documents_adaptive(docs)
+                vector_manager.tag_chunks(chunks, path_str, path_data['id'])
                 backend_logger.info(f"Chunks generados: {len(chunks)}")
                 
                 await send_progress_event({
@@ -3141,10 +3601,6 @@ async def reindex_documents_endpoint(background_tasks: BackgroundTasks):
                     'chunks_generated': len(chunks)
                 })
                 
-                # Inicializar vectorstore si no existe
-                backend_logger.info(f"Inicializando vectorstore...")
-                vectorstore = vector_manager.initialize_vectorstore()
-                
                 # Agregar a ChromaDB
                 backend_logger.info(f"Agregando {len(chunks)} chunks a ChromaDB...")
                 
@@ -3154,7 +3610,17 @@ async def reindex_documents_endpoint(background_tasks: BackgroundTasks):
                     'progress': int(base_progress + 30)
                 })
                 
-                vectorstore.add_documents(chunks)
+                # Reemplazar los chunks previos de la ruta (en per_path se
+                # elimina su coleccion completa) para no duplicarlos
+                replaced = await asyncio.to_thread(
+                    vector_manager.delete_documents_by_path_sync,
+                    path_str,
+                    path_id=path_data['id']
+                )
+                if replaced:
+                    backend_logger.info(f"Reemplazados {replaced} chunks previos de la ruta")
+                
+                await asyncio.to_thread(vector_manager.add_documents, chunks)
                 backend_logger.info(f"Chunks agregados exitosamente")
                 
                 await send_progress_event({
@@ -3194,6 +3660,11 @@ async def reindex_documents_endpoint(background_tasks: BackgroundTasks):
         
         all_issues = errors + warnings
         
+        REINDEX_DOCUMENTS.inc(total_docs)
+        REINDEX_CHUNKS.inc(total_chunks)
+        REINDEX_SECONDS.inc(time.perf_counter() - reindex_start)
+        invalidate_search_caches()
+        
         # Enviar evento final
         await send_progress_event({
             'type': 'complete',
@@ -3248,145 +3719,29 @@ async def clear_index_endpoint():
     """
     Limpiar el indice completo de documentos
     
-    ESTRATEGIA: En lugar de eliminar el directorio ChromaDB (que causa problemas
-    en Windows por archivos bloqueados), simplemente VACIAMOS la coleccion.
-    Esto es mas rapido, seguro y funciona perfectamente.
+    ESTRATEGIA: Eliminar y recrear la coleccion de ChromaDB sobre el vectorstore
+    que ya usa alfred_core (tiempo constante, sin leer ids ni embeddings, y sin
+    borrar el directorio, que en Windows falla por archivos bloqueados).
+    Despues se limpian las caches de consultas y se resetean los contadores.
     
     Returns:
         Confirmacion de limpieza
     """
     try:
-        from vector_manager import VectorManager
+        from vector_manager import get_vector_manager
         from db_manager import get_document_paths, update_document_path
-        import shutil
-        import time
         
         backend_logger.info("Iniciando limpieza completa del indice...")
-        backend_logger.info("Estrategia: Vaciar coleccion de ChromaDB (sin eliminar directorio)")
-        
-        deleted_count = 0
-        
-        # PASO 1: Limpiar coleccion de ChromaDB directamente
-        try:
-            backend_logger.info("Limpiando coleccion de ChromaDB...")
-            
-            # Importar ChromaDB directamente para acceder a la coleccion
-            import chromadb
-            from pathlib import Path
-            
-            # Calcular ruta de ChromaDB
-            backend_dir = Path(__file__).parent.parent  # backend/
-            project_root = backend_dir.parent  # Alfred/
-            chroma_db_path = str(project_root / 'chroma_db')
-            
-            backend_logger.info(f"Conectando a ChromaDB en: {chroma_db_path}")
-            
-            # Conectar a ChromaDB
-            client = chromadb.PersistentClient(path=chroma_db_path)
-            
-            # Obtener o crear la coleccion (nombre: "langchain" - usado por LangChain)
-            try:
-                collection = client.get_collection("langchain")
-                backend_logger.info(f"Coleccion encontrada: langchain")
-                
-                # Obtener todos los IDs
-                all_data = collection.get()
-                if all_data and 'ids' in all_data and all_data['ids']:
-                    deleted_count = len(all_data['ids'])
-                    backend_logger.info(f"Encontrados {deleted_count} documentos en la coleccion")
-                    
-                    # Eliminar todos los documentos
-                    collection.delete(ids=all_data['ids'])
-                    backend_logger.info(f"✅ {deleted_count} documentos eliminados exitosamente")
-                    
-                    # Verificar que se eliminaron
-                    verification = collection.get()
-                    remaining = len(verification['ids']) if verification and 'ids' in verification else 0
-                    backend_logger.info(f"Verificacion: {remaining} documentos restantes")
-                else:
-                    backend_logger.info("La coleccion ya estaba vacia")
-                    
-            except Exception as col_err:
-                backend_logger.warning(f"No se pudo acceder a la coleccion: {col_err}")
-                backend_logger.info("La coleccion podria no existir aun o esta vacia")
-            
-            # Cerrar cliente
-            del client
-            backend_logger.info("Cliente de ChromaDB cerrado")
-            
-        except Exception as e:
-            backend_logger.warning(f"Error al limpiar ChromaDB directamente: {e}")
-            # No fallar, intentar con VectorManager como fallback
-            
-            try:
-                backend_logger.info("Intentando fallback via VectorManager...")
-                vector_manager = VectorManager()
-                
-                # Forzar inicializacion del vectorstore
-                _ = vector_manager.vectorstore  # Esto inicializa _vectorstore
-                
-                if vector_manager._vectorstore and hasattr(vector_manager._vectorstore, '_collection'):
-                    collection = vector_manager._vectorstore._collection
-                    
-                    all_data = collection.get()
-                    if all_data and 'ids' in all_data and all_data['ids']:
-                        deleted_count = len(all_data['ids'])
-                        backend_logger.info(f"Eliminando {deleted_count} documentos via VectorManager...")
-                        collection.delete(ids=all_data['ids'])
-                        backend_logger.info(f"✅ {deleted_count} documentos eliminados exitosamente")
-                
-                # Limpiar referencias
-                vector_manager._vectorstore = None
-                vector_manager._client = None
-                del vector_manager
-                backend_logger.info("Referencias de VectorManager limpiadas")
-                
-            except Exception as vm_err:
-                backend_logger.error(f"Fallback via VectorManager tambien fallo: {vm_err}")
         
-        # PASO 2: Resetear completamente alfred_core global
-        global alfred_core
-        try:
-            if alfred_core:
-                backend_logger.info("Reseteando alfred_core completo...")
-                
-                # Cerrar y limpiar vector_manager
-                if hasattr(alfred_core, 'vector_manager') and alfred_core.vector_manager:
-                    try:
-                        if hasattr(alfred_core.vector_manager, '_vectorstore'):
-                            alfred_core.vector_manager._vectorstore = None
-                        if hasattr(alfred_core.vector_manager, '_client'):
-                            alfred_core.vector_manager._client = None
-                    except Exception as vm_err:
-                        backend_logger.warning(f"Error al limpiar vector_manager: {vm_err}")
-                
-                # Cerrar y limpiar retriever
-                if hasattr(alfred_core, 'retriever') and alfred_core.retriever:
-                    try:
-                        alfred_core.retriever = None
-                    except Exception as ret_err:
-                        backend_logger.warning(f"Error al limpiar retriever: {ret_err}")
-                
-                # Cerrar y limpiar retrieval_chain
-                if hasattr(alfred_core, 'retrieval_chain') and alfred_core.retrieval_chain:
-                    try:
-                        alfred_core.retrieval_chain = None
-                    except Exception as chain_err:
-                        backend_logger.warning(f"Error al limpiar retrieval_chain: {chain_err}")
-                
-                # Resetear alfred_core a None para forzar reinicializacion
-                alfred_core = None
-                backend_logger.info("✅ alfred_core reseteado completamente")
-                
-        except Exception as e:
-            backend_logger.warning(f"Error al resetear alfred_core: {e}")
+        # PASO 1: Recrear la coleccion en el vectorstore compartido (el retriever
+        # conserva su referencia al mismo objeto Chroma)
+        deleted_count = await asyncio.to_thread(get_vector_manager().clear_collection)
+        backend_logger.info(f"Coleccion recreada: {deleted_count} chunks eliminados")
         
-        # PASO 3: Forzar liberacion de recursos
-        import gc
-        gc.collect()
-        backend_logger.info("Garbage collection ejecutado")
+        # PASO 2: Caches que dependen del indice
+        invalidate_search_caches()
         
-        # PASO 4: Resetear contadores en todas las rutas
+        # PASO 3: Resetear contadores en todas las rutas
         paths = get_document_paths(enabled_only=False)
         backend_logger.info(f"Reseteando contadores de {len(paths)} rutas...")
         
@@ -3395,14 +3750,14 @@ async def clear_index_endpoint():
                 path_id=path_data['id'],
                 documents_count=0
             )
-            backend_logger.info(f"Reseteado: {path_data['path']}")
         
-        backend_logger.info("Limpieza completa exitosa")
+        backend_logger.info("Indice limpiado completamente")
         
         return {
             "success": True,
             "message": f"Indice limpiado completamente. {len(paths)} rutas reseteadas.",
-            "cleared_paths": len(paths)
+            "cleared_paths": len(paths),
+            "deleted_chunks": deleted_count
         }
         
     except Exception as e:
@@ -3420,7 +3775,7 @@ async def get_documents_stats_endpoint():
     """
     try:
         from db_manager import get_document_paths
-        from vector_manager import VectorManager
+        from vector_manager import get_vector_manager, get_chroma_client_stats
         
         # Obtener rutas configuradas
         all_paths = get_document_paths(enabled_only=False)
@@ -3429,35 +3784,23 @@ async def get_documents_stats_endpoint():
         # Contar documentos totales
         total_docs = sum(p.get('documents_count', 0) for p in all_paths)
         
-        # Obtener info de ChromaDB
+        # Obtener info de ChromaDB (vectorstore compartido con alfred_core)
         try:
-            # Acceder directamente a ChromaDB para obtener conteo real
-            import chromadb
-            from pathlib import Path
-            
-            backend_dir = Path(__file__).parent.parent
-            project_root = backend_dir.parent
-            chroma_db_path = str(project_root / 'chroma_db')
-            
-            client = chromadb.PersistentClient(path=chroma_db_path)
-            
-            try:
-                collection = client.get_collection("langchain")
-                total_chunks = collection.count()
-                total_vectors = total_chunks
-                backend_logger.info(f"Stats: {total_chunks} chunks en ChromaDB")
-            except Exception as col_err:
-                # Coleccion no existe o esta vacia
-                total_chunks = 0
-                total_vectors = 0
-                backend_logger.info(f"Stats: ChromaDB vacio o coleccion no existe")
+            vector_manager = get_vector_manager()
+            vectorstore = vector_manager.get_vectorstore()
+            if vectorstore is None:
+                vectorstore = await asyncio.to_thread(vector_manager.initialize_vectorstore)
             
-            del client
+            total_chunks = vector_manager.count_chunks() if vectorstore is not None else 0
+            total_vectors = total_chunks
+            vector_storage = vector_manager.get_storage_stats()
+            backend_logger.info(f"Stats: {total_chunks} chunks en ChromaDB")
             
         except Exception as e:
             backend_logger.warning(f"Error obteniendo stats de ChromaDB: {e}")
             total_chunks = 0
             total_vectors = 0
+            vector_storage = {}
         
         # Calcular ultima actualizacion
         last_scan_times = [
@@ -3475,7 +3818,9 @@ async def get_documents_stats_endpoint():
                 "total_chunks": total_chunks,
                 "total_vectors": total_vectors,
                 "last_update": last_update,
-                "paths_details": all_paths
+                "paths_details": all_paths,
+                "chroma_clients": get_chroma_client_stats(),
+                "vector_storage": vector_storage
             }
         }
         
@@ -3862,8 +4207,10 @@ if __name__ == "__main__":
     ============================================================
     """)
     
+    # Pasar la app ya importada: con "alfred_backend:app" uvicorn volveria a
+    # ejecutar este modulo completo (auto-reparacion, init_db, creacion de la app)
     uvicorn.run(
-        "alfred_backend:app",
+        app,
         host=host,
         port=port,
         reload=reload,
@@ -5,24 +5,41 @@ Implementa lazy loading y procesamiento asincrono
 """
 
 import os
+import re
+import time
 import asyncio
 from pathlib import Path
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, TYPE_CHECKING
 from dotenv import load_dotenv
 from datetime import datetime
 
-from langchain_ollama import OllamaLLM
-from langchain_core.prompts import ChatPromptTemplate
-
 import config
 import functionsToHistory
-# gpu_manager se importara de forma lazy para evitar errores con PyTorch en Windows
-from vector_manager import VectorManager
-from retriever import SemanticRetriever
+from query_normalizer import canonical_query, fold
+# gpu_manager (PyTorch), vector_manager (Chroma) y retriever (LangChain) se importan
+# de forma lazy para que el servidor abra el puerto sin esperar estas dependencias
+from ollama_client import PooledOllamaLLM, get_ollama_client, run_sync
+from llm_scheduler import LLMScheduler, Priority, SchedulerSaturatedError
 from utils.logger import get_logger
+from utils.tracing import span, start_trace
+from utils.profiler import get_profiler_manager
+from utils.startup import get_readiness
+
+if TYPE_CHECKING:
+    from vector_manager import VectorManager
+    from retriever import SemanticRetriever, HybridRetriever
 
 logger = get_logger("alfred_core")
 
+# Terminos de la pregunta que piden un identificador concreto: se consultan
+# directamente en el indice de identificadores (keyword_index) antes de generar
+IDENTIFIER_QUESTION_KEYWORDS = {
+    'CURP': ('curp', 'clave unica'),
+    'RFC': ('rfc', 'registro federal'),
+    'NSS': ('nss', 'seguro social'),
+}
+IDENTIFIER_LOOKUP_LIMIT = 4
+
 
 def get_current_datetime_spanish() -> str:
     """
@@ -138,6 +155,7 @@ class AlfredCore:
         self._llm = None
         self._vector_manager = None
         self._retriever = None
+        self._hybrid_retriever = None
         self._gpu_manager = None
         
         # Cache LRU simple para queries frecuentes
@@ -145,10 +163,20 @@ class AlfredCore:
         self._cache_max_size = int(os.getenv('ALFRED_CACHE_MAX_SIZE', '50'))
         self._cache_ttl_seconds = int(os.getenv('ALFRED_CACHE_TTL', '300'))  # 5 minutos
         self._cache_enabled = os.getenv('ALFRED_CACHE_ENABLED', 'true').lower() == 'true'
+        self._cache_hits = 0
+        self._cache_misses = 0
         
         # Estado interno
         self._initialized = False
         
+        # Control de admision para llamadas al LLM (respuesta > expansion > fondo)
+        self.llm_scheduler = LLMScheduler()
+        
+        # Estado de carga del modelo en Ollama (idle, loading, ready, error)
+        self._model_state: Dict[str, Any] = {}
+        self._preload_task: Optional[asyncio.Task] = None
+        self._set_model_state(self.model_name, 'idle')
+        
         logger.info("Alfred Core creado (lazy loading habilitado)")
         if self._cache_enabled:
             logger.info(f"Cache LRU habilitado: max_size={self._cache_max_size}, ttl={self._cache_ttl_seconds}s")
@@ -173,7 +201,7 @@ class AlfredCore:
         return self._gpu_manager
     
     @property
-    def llm(self) -> OllamaLLM:
+    def llm(self) -> PooledOllamaLLM:
         """Lazy loading del modelo LLM"""
         if self._llm is None:
             logger.info(f"Cargando modelo LLM: {self.model_name}")
@@ -185,7 +213,7 @@ class AlfredCore:
                 except:
                     logger.info("GPU no disponible, LLM usara CPU")
             
-            self._llm = OllamaLLM(
+            self._llm = PooledOllamaLLM(
                 model=self.model_name,
                 keep_alive=self.ollama_keep_alive
             )
@@ -194,24 +222,25 @@ class AlfredCore:
         return self._llm
     
     @property
-    def vector_manager(self) -> VectorManager:
+    def vector_manager(self) -> 'VectorManager':
         """Lazy loading del vector manager"""
         if self._vector_manager is None:
             logger.info("Inicializando Vector Manager...")
-            # Pasar None para chroma_db_path para que VectorManager use su lógica automática
-            # que calcula la ruta correcta: Alfred/chroma_db
-            self._vector_manager = VectorManager(
-                chroma_db_path=None,  # CORREGIDO: Usar lógica automática de VectorManager
-                embedding_model=self.embedding_model
-            )
+            from vector_manager import get_vector_manager
+            
+            # Instancia compartida con los endpoints de documentos (un solo
+            # cliente de ChromaDB en Alfred/chroma_db)
+            self._vector_manager = get_vector_manager(embedding_model=self.embedding_model)
         
         return self._vector_manager
     
     @property
-    def retriever(self) -> SemanticRetriever:
+    def retriever(self) -> 'SemanticRetriever':
         """Lazy loading del retriever"""
         if self._retriever is None:
             logger.info("Inicializando Semantic Retriever...")
+            from retriever import SemanticRetriever
+            from reranker import get_reranker
             
             # Asegurar que vectorstore este inicializado
             vectorstore = self.vector_manager.get_vectorstore()
@@ -219,20 +248,45 @@ class AlfredCore:
             if vectorstore is None:
                 raise RuntimeError("Vectorstore no inicializado. Ejecutar initialize() primero")
             
+            # Indice particionado por ruta: consultar las colecciones habilitadas
+            store_provider = self.vector_manager.get_search_stores if self.vector_manager.per_path_collections else None
+            
             self._retriever = SemanticRetriever(
                 vectorstore=vectorstore,
                 default_k=20,  # Aumentado de 10 a 20 para mayor recall
                 score_threshold=0.0,  # Sin threshold estricto, dejar que LLM filtre
                 use_mmr=True,
-                mmr_diversity=0.3
+                mmr_diversity=0.3,
+                store_provider=store_provider,
+                reranker=get_reranker()  # None con ALFRED_RERANKER=none
             )
         
         return self._retriever
     
+    @property
+    def hybrid_retriever(self) -> 'HybridRetriever':
+        """Lazy loading del retriever hibrido (semantico + BM25)"""
+        if self._hybrid_retriever is None:
+            from retriever import HybridRetriever
+            
+            # Indice particionado por ruta: BM25 omite las rutas deshabilitadas
+            # igual que la busqueda semantica (get_search_stores)
+            per_path = self.vector_manager.per_path_collections
+            self._hybrid_retriever = HybridRetriever(
+                self.retriever,
+                keyword_index=self.vector_manager.keyword_index,
+                excluded_paths=self.vector_manager.get_disabled_path_ids if per_path else None
+            )
+        
+        return self._hybrid_retriever
+    
     async def initialize_async(self):
         """
         Inicializacion asincrona completa de Alfred
-        Realiza indexacion incremental de documentos
+        
+        Etapas observables (ver utils.startup / GET /health/ready):
+        db -> embeddings -> vectorstore (con consulta de calentamiento) -> retriever.
+        El calentamiento del LLM va aparte en warm_up_llm_async().
         """
         logger.info("="*60)
         logger.info("INICIALIZANDO ALFRED CORE (MODO ASYNC)")
@@ -242,25 +296,45 @@ class AlfredCore:
         logger.info(f"Modelo Embeddings: {self.embedding_model}")
         logger.info(f"Sistema de rutas: Gestionado por usuario (no usa .env)")
         
-        # 1. Inicializar GPU (opcional, puede fallar si PyTorch no esta instalado)
+        readiness = get_readiness()
+        
+        # Los pasos bloqueantes (import de torch/Chroma, apertura de la BD vectorial)
+        # corren en hilos para no bloquear el event loop mientras el servidor ya atiende
+        
+        # 1. Base de datos SQLite
+        with readiness.stage('db'):
+            await asyncio.to_thread(self._check_database)
+        
+        # 2. Inicializar GPU (opcional, puede fallar si PyTorch no esta instalado)
         try:
-            _ = self.gpu_manager
+            await asyncio.to_thread(lambda: self.gpu_manager)
             logger.info("GPU Manager inicializado")
         except Exception as e:
             logger.warning(f"GPU Manager no disponible, usando modo CPU: {str(e)[:100]}")
             self._gpu_manager = None
         
-        # 2. Inicializar vectorstore
-        logger.info("\nInicializando vectorstore...")
-        vectorstore = self.vector_manager.initialize_vectorstore(force_reload=self.force_reload)
+        # 3. Modelo de embeddings accesible en Ollama (no critico: Ollama puede arrancar despues)
+        with readiness.stage('embeddings', required=False):
+            await get_ollama_client().embed(self.embedding_model, "alfred warm-up")
         
-        # 3. Ya NO indexamos automaticamente - los documentos se indexan via endpoints
+        # 4. Inicializar vectorstore y forzar la carga del indice con una consulta de prueba
+        logger.info("\nInicializando vectorstore...")
+        with readiness.stage('vectorstore'):
+            await asyncio.to_thread(lambda: self.vector_manager.initialize_vectorstore(force_reload=self.force_reload))
+            # Migracion unica: metadata path_id/dir_prefix en chunks antiguos
+            await asyncio.to_thread(self.vector_manager.migrate_path_metadata)
+            # Migracion unica: indice BM25 de los chunks ya indexados
+            await asyncio.to_thread(self.vector_manager.sync_keyword_index)
+            await asyncio.to_thread(self._warm_up_vectorstore)
+        
+        # 5. Ya NO indexamos automaticamente - los documentos se indexan via endpoints
         # El usuario gestiona las rutas desde la UI y ejecuta reindexacion manual
         logger.info("\nSistema de indexacion: Manual via endpoints API")
         logger.info("Los documentos se indexan cuando el usuario ejecuta 'Reindexar' desde la UI")
         
-        # 4. Inicializar retriever
-        _ = self.retriever
+        # 6. Inicializar retriever
+        with readiness.stage('retriever'):
+            await asyncio.to_thread(lambda: self.hybrid_retriever)
         
         self._initialized = True
         
@@ -268,11 +342,60 @@ class AlfredCore:
         logger.info("ALFRED CORE INICIALIZADO Y LISTO")
         logger.info("="*60)
     
+    @staticmethod
+    def _check_database():
+        """Verificar que la BD SQLite responde"""
+        from db_manager import get_connection
+        
+        conn = get_connection()
+        try:
+            conn.execute("SELECT 1").fetchone()
+        finally:
+            conn.close()
+    
+    def _warm_up_vectorstore(self):
+        """
+        Consulta de prueba contra Chroma
+        
+        Chroma carga el indice HNSW de forma lazy en la primera busqueda; hacerla
+        aqui evita que esa latencia caiga en la primera consulta del usuario.
+        """
+        vectorstore = self.vector_manager.get_vectorstore()
+        if vectorstore is None:
+            return
+        try:
+            count = vectorstore._collection.count()
+            if count == 0:
+                logger.info("Vectorstore vacio, se omite la consulta de calentamiento")
+                return
+            start = time.perf_counter()
+            vectorstore.similarity_search("alfred warm-up", k=1)
+            logger.info(f"Vectorstore calentado ({count} chunks) en {(time.perf_counter() - start) * 1000:.0f}ms")
+        except Exception as e:
+            logger.warning(f"Consulta de calentamiento del vectorstore fallo: {e}")
+    
+    async def warm_up_llm_async(self) -> bool:
+        """
+        Etapa 'llm_warm': precargar el modelo actual en Ollama
+        
+        Usa la prioridad de fondo del scheduler, asi que las consultas del
+        usuario no esperan a que termine.
+        
+        Returns:
+            True si el modelo quedo cargado
+        """
+        readiness = get_readiness()
+        with readiness.stage('llm_warm', required=False):
+            if not await self.preload_model_async():
+                raise RuntimeError(self._model_state.get('error') or "No se pudo precargar el modelo")
+            return True
+        return False
+    
     def initialize(self):
         """
         Inicializacion sincrona (wrapper para compatibilidad)
         """
-        asyncio.run(self.initialize_async())
+        run_sync(self.initialize_async())
     
     async def query_async(
         self,
@@ -280,7 +403,8 @@ class AlfredCore:
         use_history: bool = True,
         search_documents: bool = True,
         search_kwargs: Optional[Dict[str, Any]] = None,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Procesar consulta de forma asincrona con cache LRU
@@ -291,16 +415,49 @@ class AlfredCore:
             search_documents: Buscar en documentos o solo usar prompt
             search_kwargs: Parametros adicionales de busqueda
             conversation_history: Historial de conversacion para contexto
+            filter_metadata: Filtro 'where' de Chroma para limitar la busqueda
+                (ver retriever.build_scope_filter)
             
         Returns:
-            Dict con respuesta y metadata
+            Dict con respuesta y metadata (incluye 'timings' con el desglose
+            de latencia por etapa en milisegundos)
         """
         if not self._initialized:
             raise RuntimeError("Alfred Core no esta inicializado")
         
+        with start_trace() as trace, get_profiler_manager().query_hook():
+            result = await self._query_pipeline_async(
+                question,
+                use_history,
+                search_documents,
+                search_kwargs,
+                conversation_history,
+                filter_metadata
+            )
+        
+        result = dict(result)
+        result['timings'] = trace.timings()
+        return result
+    
+    async def _query_pipeline_async(
+        self,
+        question: str,
+        use_history: bool,
+        search_documents: bool,
+        search_kwargs: Optional[Dict[str, Any]],
+        conversation_history: Optional[List[Dict[str, str]]],
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Pipeline de consulta: cache -> historial -> documentos -> LLM"""
+        # La misma pregunta con otro alcance o fusion es otra entrada de cache
+        fusion = (search_kwargs or {}).get('fusion')
+        if filter_metadata or fusion:
+            cache_key = hash((canonical_query(question), repr(filter_metadata), fusion))
+        else:
+            cache_key = hash(canonical_query(question))
+        
         # 0. Verificar cache en memoria (si esta habilitado)
         if self._cache_enabled and search_documents:
-            cache_key = hash(question.lower().strip())
             
             if cache_key in self._query_cache:
                 cached_entry = self._query_cache[cache_key]
@@ -308,6 +465,7 @@ class AlfredCore:
                 
                 # Verificar TTL
                 if elapsed < self._cache_ttl_seconds:
+                    self._cache_hits += 1
                     logger.info(f"Respuesta encontrada en cache (age={elapsed:.1f}s)")
                     result = cached_entry['result'].copy()
                     result['from_cache'] = True
@@ -317,9 +475,12 @@ class AlfredCore:
                     # Cache expirado, eliminar entrada
                     del self._query_cache[cache_key]
                     logger.debug(f"Entrada de cache expirada (age={elapsed:.1f}s)")
+            
+            self._cache_misses += 1
         
-        # 1. Buscar en historial (sincrono, rapido)
-        if use_history:
+        # 1. Buscar en historial (sincrono, rapido). Las respuestas del
+        # historial no tienen alcance: no se usan en busquedas filtradas
+        if use_history and not filter_metadata:
             history_results = functionsToHistory.search_in_qa_history(question)
             
             if history_results and history_results[0][0] > 0.6:
@@ -344,13 +505,12 @@ class AlfredCore:
         result = await self._generate_with_documents_async(
             question,
             conversation_history,
-            search_kwargs
+            search_kwargs,
+            filter_metadata=filter_metadata
         )
         
         # 4. Guardar en cache si esta habilitado
         if self._cache_enabled and search_documents:
-            cache_key = hash(question.lower().strip())
-            
             # Implementar LRU: si el cache esta lleno, eliminar la entrada mas antigua
             if len(self._query_cache) >= self._cache_max_size:
                 oldest_key = min(
@@ -375,72 +535,173 @@ class AlfredCore:
         use_history: bool = True,
         search_documents: bool = True,
         search_kwargs: Optional[Dict[str, Any]] = None,
-        conversation_history: Optional[List[Dict[str, str]]] = None
+        conversation_history: Optional[List[Dict[str, str]]] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         Procesar consulta de forma sincrona (wrapper para compatibilidad)
         """
-        return asyncio.run(
+        return run_sync(
             self.query_async(
                 question,
                 use_history,
                 search_documents,
                 search_kwargs,
-                conversation_history
+                conversation_history,
+                filter_metadata
             )
         )
     
     def change_model(self, new_model: str) -> bool:
         """
-        Cambiar el modelo LLM dinamicamente
+        Cambiar el modelo LLM dinamicamente (version sync, sin precarga)
+        
+        Args:
+            new_model: Nombre del nuevo modelo a utilizar (ej: 'gemma2:9b', 'llama3.2:3b')
+        
+        Returns:
+            True si el cambio fue exitoso, False en caso contrario
+        """
+        old_model = self.model_name
+        if not self._apply_model_change(new_model):
+            return False
+        
+        if old_model != new_model:
+            try:
+                get_ollama_client().generate_sync(old_model, "", keep_alive=0, timeout=30.0)
+                logger.info(f"Modelo anterior descargado de memoria: {old_model}")
+            except Exception as e:
+                logger.warning(f"No se pudo descargar el modelo anterior {old_model}: {e}")
+        return True
+    
+    async def change_model_async(self, new_model: str, preload: bool = True) -> bool:
+        """
+        Cambiar el modelo LLM dinamicamente sin reiniciar Ollama
         
         Proceso:
-        1. Mata proceso Ollama para liberar modelo anterior de memoria
-        2. Guarda nuevo modelo en base de datos SQLite
-        3. Invalida instancia LLM para forzar recarga
+        1. Guarda nuevo modelo en base de datos SQLite e invalida la instancia LLM
+        2. Descarga el modelo anterior de memoria (keep_alive=0 via API)
+        3. Precarga el nuevo modelo en segundo plano (estado consultable con get_model_state)
         
         Args:
             new_model: Nombre del nuevo modelo a utilizar (ej: 'gemma2:9b', 'llama3.2:3b')
+            preload: Precargar el nuevo modelo en segundo plano
         
         Returns:
             True si el cambio fue exitoso, False en caso contrario
         """
+        old_model = self.model_name
+        if not self._apply_model_change(new_model):
+            return False
+        
+        if old_model != new_model:
+            try:
+                await get_ollama_client().generate(old_model, "", keep_alive=0, timeout=30.0)
+                logger.info(f"Modelo anterior descargado de memoria: {old_model}")
+            except Exception as e:
+                logger.warning(f"No se pudo descargar el modelo anterior {old_model}: {e}")
+        
+        if preload:
+            if self._preload_task and not self._preload_task.done():
+                self._preload_task.cancel()
+            self._set_model_state(new_model, 'loading')
+            self._preload_task = asyncio.create_task(self.preload_model_async(new_model))
+        
+        return True
+    
+    def _apply_model_change(self, new_model: str) -> bool:
+        """Guardar el nuevo modelo en BD y en memoria"""
         try:
             from db_manager import set_model_setting
-            from utils.process_utils import kill_ollama_process
-            
-            old_model = self.model_name
-            logger.info(f"Iniciando cambio de modelo: {old_model} -> {new_model}")
-            
-            # 1. Matar proceso Ollama para liberar memoria del modelo anterior
-            logger.info("Matando proceso Ollama para liberar modelo anterior...")
-            if kill_ollama_process():
-                logger.info("Proceso Ollama terminado exitosamente")
-            else:
-                logger.warning("No se pudo terminar proceso Ollama (podria no estar corriendo)")
             
-            # 2. Guardar nuevo modelo en base de datos
-            logger.info(f"Guardando modelo en base de datos: {new_model}")
+            logger.info(f"Iniciando cambio de modelo: {self.model_name} -> {new_model}")
             if not set_model_setting('last_used_model', new_model):
                 logger.error("Error al guardar modelo en base de datos")
                 return False
             
-            # 3. Actualizar configuracion en memoria
             self.model_name = new_model
-            
-            # 4. Invalidar instancia LLM para forzar recarga en proxima consulta
             self._llm = None
-            
-            logger.info(f"Modelo cambiado exitosamente: {old_model} -> {new_model}")
-            logger.info("El nuevo modelo se cargara automaticamente en la proxima consulta")
+            self._set_model_state(new_model, 'idle')
+            logger.info(f"Modelo configurado: {new_model}")
             return True
             
         except Exception as e:
             logger.error(f"Error al cambiar modelo: {e}")
-            import traceback
-            traceback.print_exc()
             return False
     
+    async def preload_model_async(self, model: Optional[str] = None) -> bool:
+        """
+        Cargar el modelo en Ollama sin generar texto (prompt vacio)
+        
+        Args:
+            model: Modelo a precargar (default: modelo actual)
+        
+        Returns:
+            True si el modelo quedo cargado
+        """
+        model = model or self.model_name
+        self._set_model_state(model, 'loading')
+        start = time.perf_counter()
+        try:
+            async with self.llm_scheduler.slot(Priority.BACKGROUND):
+                await get_ollama_client().generate(model, "", keep_alive=self.ollama_keep_alive)
+            elapsed = time.perf_counter() - start
+            self._set_model_state(model, 'ready', load_seconds=round(elapsed, 2))
+            logger.info(f"Modelo {model} precargado en {elapsed:.1f}s")
+            return True
+        except asyncio.CancelledError:
+            self._set_model_state(model, 'idle')
+            raise
+        except Exception as e:
+            self._set_model_state(model, 'error', error=str(e))
+            logger.error(f"Error precargando modelo {model}: {e}")
+            return False
+    
+    def _set_model_state(self, model: str, status: str, load_seconds: Optional[float] = None, error: Optional[str] = None):
+        """Actualizar estado de carga del modelo (ignora modelos que ya no son el actual)"""
+        if model != self.model_name:
+            return
+        self._model_state = {
+            'model_name': model,
+            'status': status,
+            'load_seconds': load_seconds,
+            'error': error,
+            'updated_at': datetime.now().isoformat()
+        }
+    
+    def get_model_state(self) -> Dict[str, Any]:
+        """
+        Obtener estado de carga del modelo actual
+        
+        Returns:
+            Dict con model_name, status (idle, loading, ready, error), load_seconds, error y updated_at
+        """
+        return dict(self._model_state)
+    
+    async def _invoke_llm_async(self, prompt: str, priority: Priority = Priority.INTERACTIVE) -> str:
+        """
+        Llamar al LLM respetando el control de admision del scheduler
+        
+        Args:
+            prompt: Prompt completo
+            priority: Clase de prioridad de la llamada
+        
+        Returns:
+            Texto generado
+        
+        Raises:
+            SchedulerSaturatedError: Si la cola del LLM esta saturada
+        """
+        with span('llm_queue_wait'):
+            await self.llm_scheduler.acquire(priority)
+        
+        start = time.perf_counter()
+        try:
+            with span(f"llm_{priority.name.lower()}"):
+                return await self.llm.ainvoke(prompt)
+        finally:
+            self.llm_scheduler.release(time.perf_counter() - start)
+    
     async def _expand_query_async(self, question: str) -> str:
         """
         Expande la query original usando el LLM para mejorar la busqueda semantica.
@@ -474,10 +735,7 @@ Pregunta original: {question}
 Query expandida (solo palabras clave y terminos de busqueda):"""
 
         try:
-            expanded = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.llm.invoke(expansion_prompt)
-            )
+            expanded = await self._invoke_llm_async(expansion_prompt, Priority.EXPANSION)
             
             # Limpiar la respuesta (remover saltos de linea excesivos, etc.)
             expanded = ' '.join(expanded.strip().split())
@@ -493,7 +751,7 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
             logger.error(f"Error expandiendo query: {e}")
             return question  # Fallback a query original
     
-    def _should_use_query_expansion(self, question: str) -> bool:
+    def _should_use_query_expansion(self, question: str, keyword_search: bool = False) -> bool:
         """
         Decide si usar Query Expansion basado en la pregunta.
         
@@ -506,6 +764,11 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
         - Preguntas simples y directas
         - Nombres propios especificos
         - Busquedas de numeros exactos
+        - Identificadores, si hay busqueda por keywords (BM25)
+        
+        Args:
+            question: Pregunta del usuario
+            keyword_search: La recuperacion incluye BM25 (HybridRetriever)
         
         Returns:
             True si debe usar expansion, False si no
@@ -521,6 +784,15 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
             'cedula', 'profesional', 'certificado'
         ]
         
+        # Con BM25 las etiquetas (CURP, RFC...) y los identificadores escritos
+        # en la pregunta se encuentran literalmente: no hace falta el LLM
+        if keyword_search and (
+            any(keyword in q_lower for keyword in personal_data_keywords)
+            or re.search(r'\b(?=[A-Z0-9]*\d)(?=[A-Z0-9]*[A-Z])[A-Z0-9]{8,}\b', question.upper())
+        ):
+            logger.info("Query sobre datos personales - BM25, sin expansion")
+            return False
+        
         # Si menciona datos personales, SI usar expansion
         if any(keyword in q_lower for keyword in personal_data_keywords):
             logger.info("Query sobre datos personales - Usando expansion")
@@ -535,57 +807,139 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
         logger.info("Query directa - SIN expansion")
         return False
     
+    @staticmethod
+    def _requested_identifier_types(question: str) -> List[str]:
+        """Tipos de identificador (CURP, RFC, NSS) que menciona la pregunta"""
+        folded = fold(question)
+        return [
+            id_type for id_type, keywords in IDENTIFIER_QUESTION_KEYWORDS.items()
+            if any(keyword in folded for keyword in keywords)
+        ]
+    
+    async def _lookup_identifiers_async(
+        self,
+        question: str,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> list:
+        """
+        Chunks con los identificadores que pide la pregunta, del indice precalculado
+        
+        Args:
+            question: Pregunta del usuario
+            filter_metadata: Filtro de alcance de la consulta
+        
+        Returns:
+            Lista de documentos (vacia si la pregunta no pide identificadores,
+            el indice esta desactivado o no hay coincidencias)
+        """
+        id_types = self._requested_identifier_types(question)
+        if not id_types:
+            return []
+        keyword_index = self.vector_manager.keyword_index
+        if keyword_index is None:
+            return []
+        
+        from keyword_index import chunk_key
+        # Mismas rutas que la busqueda (per_path: sin las deshabilitadas)
+        excluded_paths = self.hybrid_retriever.excluded_paths
+        try:
+            with span('identifier_lookup'):
+                matches = await asyncio.to_thread(
+                    keyword_index.lookup_identifiers,
+                    id_types,
+                    filter_metadata,
+                    IDENTIFIER_LOOKUP_LIMIT,
+                    excluded_paths() if excluded_paths is not None else None
+                )
+        except Exception as e:
+            logger.warning(f"Error consultando indice de identificadores: {e}")
+            return []
+        
+        documents, seen = [], set()
+        for _, _, doc in matches:
+            key = chunk_key(doc)
+            if key not in seen:
+                seen.add(key)
+                documents.append(doc)
+        logger.info(f"Indice de identificadores {id_types}: {len(matches)} coincidencias")
+        return documents
+    
+    def _extract_personal_data_from_documents(self, documents: list) -> Dict[str, str]:
+        """
+        Datos personales de los documentos usados en la respuesta
+        
+        Usa los identificadores precalculados al indexar; solo aplica las
+        regex a los chunks que no estan en el indice (indice desactivado).
+        """
+        precomputed = {}
+        keyword_index = self.vector_manager.keyword_index
+        if keyword_index is not None:
+            from keyword_index import chunk_key
+            keys = [chunk_key(doc) for doc in documents]
+            try:
+                precomputed = keyword_index.identifiers_for_chunks(keys)
+            except Exception as e:
+                logger.warning(f"Error leyendo identificadores precalculados: {e}")
+        else:
+            keys = [None] * len(documents)
+        
+        all_personal_data = {}
+        for doc, key in zip(documents, keys):
+            personal_data = precomputed.get(key)
+            if personal_data is None:
+                personal_data = self.extract_personal_data(doc.page_content)
+            all_personal_data.update(personal_data)
+        return all_personal_data
+    
     async def _generate_without_documents_async(
         self,
         question: str,
         conversation_history: Optional[List[Dict[str, str]]] = None
     ) -> Dict[str, Any]:
         """Generar respuesta sin buscar documentos - flujo unificado con templates"""
-        current_datetime = get_current_datetime_spanish()
-        
-        # Obtener toda la personalizacion del usuario
-        personalization = get_user_personalization()
-        
-        # Usar template sin documentos para todos los modelos
-        prompt_template = config.PROMPT_TEMPLATE_NO_DOCUMENTS
-        
-        # Reemplazar placeholders de personalizacion
-        prompt_template = prompt_template.replace("{USER_NAME}", personalization['user_name'])
-        prompt_template = prompt_template.replace("{USER_AGE}", str(personalization['user_age']))
-        prompt_template = prompt_template.replace("{ASSISTANT_NAME}", personalization['assistant_name'])
-        prompt_template = prompt_template.replace("{CUSTOM_INSTRUCTIONS}", personalization['custom_instructions'])
-        prompt_template = prompt_template.replace("{USER_OCCUPATION}", personalization['user_occupation'])
-        prompt_template = prompt_template.replace("{ABOUT_USER}", personalization['about_user'])
-        prompt_template = prompt_template.replace("{CURRENT_DATETIME}", current_datetime)
-        
-        # Construir historial de conversacion
-        conversation_history_text = ""
-        if conversation_history and len(conversation_history) > 0:
-            history_parts = ["Previous messages in this conversation:"]
-            for msg in conversation_history[-30:]:
-                role = "User" if msg["role"] == "user" else "Alfred"
-                history_parts.append(f"{role}: {msg['content']}")
-            conversation_history_text = "\n".join(history_parts)
-        else:
-            conversation_history_text = "No previous conversation history."
-        
-        # Reemplazar historial de conversacion
-        prompt_template = prompt_template.replace("{conversation_history}", conversation_history_text)
-        
-        # Crear ChatPromptTemplate (mismo flujo que con documentos)
-        prompt = ChatPromptTemplate.from_template(prompt_template)
+        with span('prompt_build'):
+            current_datetime = get_current_datetime_spanish()
+            
+            # Obtener toda la personalizacion del usuario
+            personalization = get_user_personalization()
+            
+            # Usar template sin documentos para todos los modelos
+            prompt_template = config.PROMPT_TEMPLATE_NO_DOCUMENTS
+            
+            # Reemplazar placeholders de personalizacion
+            prompt_template = prompt_template.replace("{USER_NAME}", personalization['user_name'])
+            prompt_template = prompt_template.replace("{USER_AGE}", str(personalization['user_age']))
+            prompt_template = prompt_template.replace("{ASSISTANT_NAME}", personalization['assistant_name'])
+            prompt_template = prompt_template.replace("{CUSTOM_INSTRUCTIONS}", personalization['custom_instructions'])
+            prompt_template = prompt_template.replace("{USER_OCCUPATION}", personalization['user_occupation'])
+            prompt_template = prompt_template.replace("{ABOUT_USER}", personalization['about_user'])
+            prompt_template = prompt_template.replace("{CURRENT_DATETIME}", current_datetime)
+            
+            # Construir historial de conversacion
+            conversation_history_text = ""
+            if conversation_history and len(conversation_history) > 0:
+                history_parts = ["Previous messages in this conversation:"]
+                for msg in conversation_history[-30:]:
+                    role = "User" if msg["role"] == "user" else "Alfred"
+                    history_parts.append(f"{role}: {msg['content']}")
+                conversation_history_text = "\n".join(history_parts)
+            else:
+                conversation_history_text = "No previous conversation history."
+            
+            # Reemplazar historial de conversacion
+            prompt_template = prompt_template.replace("{conversation_history}", conversation_history_text)
+            
+            # Crear ChatPromptTemplate (mismo flujo que con documentos)
+            from langchain_core.prompts import ChatPromptTemplate
+            prompt = ChatPromptTemplate.from_template(prompt_template)
+            prompt_text = prompt.format(
+                input=question,
+                context=""  # Sin contexto de documentos
+            )
         
         try:
             # Invocar LLM con template de LangChain (flujo unificado)
-            answer = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.llm.invoke(
-                    prompt.format(
-                        input=question,
-                        context=""  # Sin contexto de documentos
-                    )
-                )
-            )
+            answer = await self._invoke_llm_async(prompt_text)
             
             return {
                 'answer': answer,
@@ -596,6 +950,8 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
                 'context_count': 0
             }
         
+        except SchedulerSaturatedError:
+            raise
         except Exception as e:
             logger.error(f"Error generando respuesta: {e}")
             return {
@@ -612,16 +968,28 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
         question: str,
         conversation_history: Optional[List[Dict[str, str]]] = None,
         search_kwargs: Optional[Dict[str, Any]] = None,
-        use_query_expansion: bool = None  # None = auto-detectar
+        use_query_expansion: bool = None,  # None = auto-detectar
+        filter_metadata: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Generar respuesta con busqueda de documentos"""
+        # Fusion de la busqueda hibrida para esta consulta (None = ALFRED_HYBRID_FUSION)
+        fusion = (search_kwargs or {}).get('fusion')
+        keyword_search = self.hybrid_retriever.uses_keywords(fusion)
+        
+        # Preguntas como "cual es mi CURP": consulta directa al indice de identificadores
+        identifier_documents = await self._lookup_identifiers_async(question, filter_metadata)
         
-        # 1. Query Expansion inteligente: solo cuando ayuda
+        # 1. Query Expansion inteligente: solo cuando ayuda (no hace falta si el
+        # indice ya tiene el identificador pedido)
         if use_query_expansion is None:
-            use_query_expansion = self._should_use_query_expansion(question)
+            use_query_expansion = (
+                not identifier_documents
+                and self._should_use_query_expansion(question, keyword_search)
+            )
         
         if use_query_expansion:
-            expanded_query = await self._expand_query_async(question)
+            with span('query_expansion'):
+                expanded_query = await self._expand_query_async(question)
             logger.info(f"Query original: {question}")
             logger.info(f"Query expandida: {expanded_query}")
         else:
@@ -630,96 +998,108 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
         
         # 2. Recuperar documentos relevantes con query expandida
         # Balance optimizado: velocidad + precision
-        # k=12 permite encontrar CURP/RFC/NSS sin sobrecarga
+        # k=12 permite encontrar CURP/RFC/NSS sin sobrecarga; con reranker los
+        # 40 candidatos se reordenan contra la pregunta y bastan 8 (prompt menor).
+        # Con reranker no se aplica MMR (una sola busqueda por similitud de 40):
+        # se gana relevancia y una busqueda menos, pero sin diversidad chunks
+        # casi repetidos del mismo documento pueden ocupar varios de los 8
+        default_k = 8 if self.retriever.reranker is not None else 12
         if search_kwargs is None:
-            search_kwargs = {"k": 12, "fetch_k": 40}
+            search_kwargs = {"k": default_k, "fetch_k": 40}
         
-        k = search_kwargs.get('k', 12)
+        k = search_kwargs.get('k', default_k)
         fetch_k = search_kwargs.get('fetch_k', 40)
         
-        retrieval_result = await self.retriever.retrieve_async(
-            query=expanded_query,  # Usar query expandida
+        # Semantica con la query expandida, BM25 con la pregunta original
+        retrieval_result = await self.hybrid_retriever.retrieve_hybrid(
+            query=expanded_query,
             k=k,
-            fetch_k=fetch_k
+            fetch_k=fetch_k,
+            filter_metadata=filter_metadata,
+            fusion=fusion,
+            keyword_query=question
         )
         
-        if not retrieval_result.documents:
+        # Los chunks con el identificador pedido van primero (anclan la respuesta)
+        documents = list(retrieval_result.documents)
+        if identifier_documents:
+            from keyword_index import chunk_key
+            anchored = {chunk_key(doc) for doc in identifier_documents}
+            documents = identifier_documents + [doc for doc in documents if chunk_key(doc) not in anchored]
+        
+        if not documents:
             logger.warning("No se encontraron documentos relevantes")
             return await self._generate_without_documents_async(question, conversation_history)
         
-        logger.info(f"Recuperados {len(retrieval_result.documents)} documentos relevantes")
-        
-        # 2. Preparar contexto para LLM (limitar a primeros docs mas relevantes)
-        # Con k=12, tomamos todos pero limitamos el texto
-        max_context_chars = 8000  # ~2000 tokens, suficiente para CURP/RFC/NSS
-        
-        context_string = self.retriever.get_context_string(
-            retrieval_result.documents,
-            include_metadata=True
-        )
-        
-        # Truncar contexto si es demasiado largo (mantener inicio que es lo mas relevante)
-        if len(context_string) > max_context_chars:
-            context_string = context_string[:max_context_chars] + "\n\n[...contexto truncado por longitud...]"
-            logger.info(f"Contexto truncado a {max_context_chars} caracteres")
-        
-        # 3. Construir historial de conversacion
-        conversation_history_text = ""
-        if conversation_history and len(conversation_history) > 0:
-            history_parts = ["Previous messages in this conversation:"]
-            for msg in conversation_history[-30:]:
-                role = "User" if msg["role"] == "user" else "Alfred"
-                history_parts.append(f"{role}: {msg['content']}")
-            conversation_history_text = "\n".join(history_parts)
-        else:
-            conversation_history_text = "No previous conversation history."
-        
-        # Combinar historial de conversacion + contexto de documentos en un solo string
-        combined_context = f"{conversation_history_text}\n\n--- DOCUMENT FRAGMENTS ---\n{context_string}"
-        
-        # 4. Generar prompt
-        current_datetime = get_current_datetime_spanish()
-        
-        # Obtener toda la personalizacion del usuario
-        personalization = get_user_personalization()
-        
-        # Usar template con documentos para todos los modelos
-        prompt_template = config.PROMPT_TEMPLATE_WITH_DOCUMENTS
+        logger.info(f"Recuperados {len(documents)} documentos relevantes")
         
-        # Reemplazar placeholders de personalizacion
-        prompt_template = prompt_template.replace("{USER_NAME}", personalization['user_name'])
-        prompt_template = prompt_template.replace("{USER_AGE}", str(personalization['user_age']))
-        prompt_template = prompt_template.replace("{ASSISTANT_NAME}", personalization['assistant_name'])
-        prompt_template = prompt_template.replace("{CUSTOM_INSTRUCTIONS}", personalization['custom_instructions'])
-        prompt_template = prompt_template.replace("{USER_OCCUPATION}", personalization['user_occupation'])
-        prompt_template = prompt_template.replace("{ABOUT_USER}", personalization['about_user'])
-        prompt_template = prompt_template.replace("{CURRENT_DATETIME}", current_datetime)
-        
-        # 5. Crear prompt con ChatPromptTemplate (flujo unificado)
-        prompt = ChatPromptTemplate.from_template(prompt_template)
+        with span('prompt_build'):
+            # 2. Preparar contexto para LLM (limitar a primeros docs mas relevantes)
+            # Con k=12, tomamos todos pero limitamos el texto
+            max_context_chars = 8000  # ~2000 tokens, suficiente para CURP/RFC/NSS
+            
+            context_string = self.retriever.get_context_string(
+                documents,
+                include_metadata=True
+            )
+            
+            # Truncar contexto si es demasiado largo (mantener inicio que es lo mas relevante)
+            if len(context_string) > max_context_chars:
+                context_string = context_string[:max_context_chars] + "\n\n[...contexto truncado por longitud...]"
+                logger.info(f"Contexto truncado a {max_context_chars} caracteres")
+            
+            # 3. Construir historial de conversacion
+            conversation_history_text = ""
+            if conversation_history and len(conversation_history) > 0:
+                history_parts = ["Previous messages in this conversation:"]
+                for msg in conversation_history[-30:]:
+                    role = "User" if msg["role"] == "user" else "Alfred"
+                    history_parts.append(f"{role}: {msg['content']}")
+                conversation_history_text = "\n".join(history_parts)
+            else:
+                conversation_history_text = "No previous conversation history."
+            
+            # Combinar historial de conversacion + contexto de documentos en un solo string
+            combined_context = f"{conversation_history_text}\n\n--- DOCUMENT FRAGMENTS ---\n{context_string}"
+            
+            # 4. Generar prompt
+            current_datetime = get_current_datetime_spanish()
+            
+            # Obtener toda la personalizacion del usuario
+            personalization = get_user_personalization()
+            
+            # Usar template con documentos para todos los modelos
+            prompt_template = config.PROMPT_TEMPLATE_WITH_DOCUMENTS
+            
+            # Reemplazar placeholders de personalizacion
+            prompt_template = prompt_template.replace("{USER_NAME}", personalization['user_name'])
+            prompt_template = prompt_template.replace("{USER_AGE}", str(personalization['user_age']))
+            prompt_template = prompt_template.replace("{ASSISTANT_NAME}", personalization['assistant_name'])
+            prompt_template = prompt_template.replace("{CUSTOM_INSTRUCTIONS}", personalization['custom_instructions'])
+            prompt_template = prompt_template.replace("{USER_OCCUPATION}", personalization['user_occupation'])
+            prompt_template = prompt_template.replace("{ABOUT_USER}", personalization['about_user'])
+            prompt_template = prompt_template.replace("{CURRENT_DATETIME}", current_datetime)
+            
+            # 5. Crear prompt con ChatPromptTemplate (flujo unificado)
+            from langchain_core.prompts import ChatPromptTemplate
+            prompt = ChatPromptTemplate.from_template(prompt_template)
+            prompt_text = prompt.format(
+                input=question,
+                context=combined_context  # Historial + documentos juntos
+            )
         
         # 6. Generar respuesta usando el contexto combinado
         try:
-            response = await asyncio.get_event_loop().run_in_executor(
-                None,
-                lambda: self.llm.invoke(
-                    prompt.format(
-                        input=question,
-                        context=combined_context  # Historial + documentos juntos
-                    )
-                )
-            )
+            response = await self._invoke_llm_async(prompt_text)
             
-            # 6. Extraer datos personales
-            all_personal_data = {}
-            for doc in retrieval_result.documents:
-                personal_data = self.extract_personal_data(doc.page_content)
-                all_personal_data.update(personal_data)
+            # 6. Extraer datos personales (precalculados al indexar)
+            with span('personal_data_extraction'):
+                all_personal_data = await asyncio.to_thread(self._extract_personal_data_from_documents, documents)
             
             # 7. Obtener fuentes
             sources = list(set([
                 doc.metadata.get('source', 'Desconocido')
-                for doc in retrieval_result.documents
+                for doc in documents
             ]))
             
             return {
@@ -728,7 +1108,7 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
                 'sources': sources,
                 'from_history': False,
                 'history_score': None,
-                'context_count': len(retrieval_result.documents)
+                'context_count': len(documents)
             }
         
         except Exception as e:
@@ -738,21 +1118,10 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
     @staticmethod
     def extract_personal_data(text: str) -> Dict[str, str]:
         """Extraer RFC, CURP y otros datos personales del texto"""
-        import re
-        
-        patterns = {
-            'RFC': r'RFC[:\s]*([A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3})',
-            'CURP': r'CURP[:\s]*([A-Z]{4}\d{6}[HM][A-Z]{5}[0-9A-Z]\d)',
-            'NSS': r'NSS[:\s]*(\d{11})',
-        }
+        from keyword_index import extract_identifiers
         
-        found_data = {}
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                found_data[key] = match.group(1)
-        
-        return found_data
+        # Primer valor de cada tipo (mismas regex que el indice de identificadores)
+        return {key: values[0] for key, values in extract_identifiers(text).items()}
     
     def get_stats(self) -> Dict[str, Any]:
         """Obtener estadisticas del sistema"""
@@ -839,14 +1208,8 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
             set_user_setting('ollama_keep_alive', seconds, 'int')
             logger.info(f"Keep_alive guardado en BD: {seconds}s")
             
-            # Recrear LLM con nuevo keep_alive
-            from langchain_ollama import OllamaLLM
-            
-            self.llm = OllamaLLM(
-                model=self.model_name,
-                base_url="http://localhost:11434",
-                keep_alive=seconds
-            )
+            # Recrear LLM con nuevo keep_alive en la proxima consulta
+            self._llm = None
             
             logger.info(f"Keep_alive actualizado exitosamente a {seconds}s")
             return True
@@ -885,6 +1248,7 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
             - size: Numero de entradas actuales
             - max_size: Tamaño maximo del cache
             - ttl_seconds: TTL en segundos
+            - hits / misses: Consultas servidas desde cache y no encontradas
             - entries: Lista de entradas con edad
         """
         if not self._cache_enabled:
@@ -892,7 +1256,9 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
                 'enabled': False,
                 'size': 0,
                 'max_size': self._cache_max_size,
-                'ttl_seconds': self._cache_ttl_seconds
+                'ttl_seconds': self._cache_ttl_seconds,
+                'hits': self._cache_hits,
+                'misses': self._cache_misses
             }
         
         now = datetime.now()
@@ -911,6 +1277,8 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
             'size': len(self._query_cache),
             'max_size': self._cache_max_size,
             'ttl_seconds': self._cache_ttl_seconds,
+            'hits': self._cache_hits,
+            'misses': self._cache_misses,
             'entries': entries
         }
     
@@ -932,7 +1300,7 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
                 return loop.run_until_complete(self.reindex_documents_async())
         except RuntimeError:
             # No hay event loop, crear uno nuevo
-            return asyncio.run(self.reindex_documents_async())
+            return run_sync(self.reindex_documents_async())
     
     def test_search(self, query: str, k: int = 5):
         """
@@ -949,10 +1317,10 @@ Query expandida (solo palabras clave y terminos de busqueda):"""
             raise RuntimeError("Alfred Core no esta inicializado")
         
         vectorstore = self.vector_manager.get_vectorstore()
-        if not vectorstore:
+        if vectorstore is None:
             raise RuntimeError("Vectorstore no esta disponible")
         
-        return vectorstore.similarity_search(query, k=k)
+        return self.retriever.retrieve_sync(query, k=k).documents
     
     def close(self):
         """Cerrar recursos"""
@@ -1,16 +1,62 @@
 # db_manager.py
+import time
 import sqlite3
 from pathlib import Path
 from utils.paths import get_db_path
 from utils.security import encrypt_data, decrypt_data
 from utils.logger import get_logger
+from utils.metrics import histogram
 
 db_logger = get_logger("db")
 
 DB_FILE = get_db_path() / "alfred.db"
 
+# Tiempo de ejecucion de sentencias SQLite (expuesto en /metrics)
+SQLITE_QUERY_DURATION = histogram(
+    'alfred_sqlite_query_duration_seconds',
+    'Duracion de sentencias SQLite por tipo',
+    ('operation',)
+)
+
+
+def _sql_operation(sql: str) -> str:
+    """Primera palabra de la sentencia (SELECT, INSERT, ...) como label"""
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'UNKNOWN'
+
+
+class TimedCursor(sqlite3.Cursor):
+    """Cursor que registra la duracion de execute/executemany"""
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, operation=_sql_operation(sql))
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            SQLITE_QUERY_DURATION.observe(time.perf_counter() - start, operation=_sql_operation(sql))
+
+
+class TimedConnection(sqlite3.Connection):
+    """Conexion cuyos cursores (incluido conn.execute) usan TimedCursor"""
+
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
 def get_connection():
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(DB_FILE, factory=TimedConnection)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -1700,7 +1746,7 @@ def save_model_download_history(model_name: str, status: str, message: str = "",
     
     Args:
         model_name: Nombre del modelo
-        status: Estado (downloading, completed, failed, deleted)
+        status: Estado (downloading, completed, failed, cancelled, deleted)
         message: Mensaje adicional
         progress: Progreso de descarga (0-100)
     """
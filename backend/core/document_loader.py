@@ -149,6 +149,7 @@ class DocumentLoader:
                         'file_hash': current_hash,
                         'file_size': stat.st_size,
                         'last_modified': stat.st_mtime,
+                        'file_extension': file_path.suffix.lower(),
                         'loaded_at': metadata.loaded_at
                     })
                 
@@ -166,6 +167,7 @@ class DocumentLoader:
                         'file_hash': current_hash,
                         'file_size': stat.st_size,
                         'last_modified': stat.st_mtime,
+                        'file_extension': file_path.suffix.lower(),
                         'loaded_at': metadata.loaded_at
                     })
                 
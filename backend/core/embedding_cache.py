@@ -1,12 +1,15 @@
 """
 Embedding Cache - Cache LRU para embeddings frecuentes
-Evita recalcular embeddings de queries repetidas
+Evita recalcular embeddings de queries repetidas (clave canonica: ver query_normalizer)
 """
 
 from functools import lru_cache
+from threading import Lock
 from typing import List
 import hashlib
 
+from query_normalizer import canonical_query
+
 
 class EmbeddingCache:
     """Cache para queries frecuentes"""
@@ -15,34 +18,71 @@ class EmbeddingCache:
         self.max_size = max_size
         self._cache = {}
         self._access_order = []
+        self._hits = 0
+        self._misses = 0
+        self._lock = Lock()
     
-    def _hash_query(self, query: str) -> str:
-        """Generar hash de query"""
-        return hashlib.md5(query.encode('utf-8')).hexdigest()
+    def _hash_query(self, query: str, model: str = '') -> str:
+        """Generar hash de query (forma canonica + modelo de embeddings)"""
+        return hashlib.md5(f"{model}\x00{canonical_query(query)}".encode('utf-8')).hexdigest()
     
-    def get(self, query: str) -> List[float] | None:
+    def get(self, query: str, model: str = '') -> List[float] | None:
         """Obtener embedding desde cache"""
-        key = self._hash_query(query)
-        if key in self._cache:
-            # Actualizar orden de acceso (LRU)
-            self._access_order.remove(key)
-            self._access_order.append(key)
-            return self._cache[key]
-        return None
+        key = self._hash_query(query, model)
+        with self._lock:
+            if key in self._cache:
+                # Actualizar orden de acceso (LRU)
+                self._access_order.remove(key)
+                self._access_order.append(key)
+                self._hits += 1
+                return self._cache[key]
+            self._misses += 1
+            return None
     
-    def set(self, query: str, embedding: List[float]):
+    def set(self, query: str, embedding: List[float], model: str = ''):
         """Guardar embedding en cache"""
-        key = self._hash_query(query)
-        
-        # Si cache lleno, eliminar el menos usado
-        if len(self._cache) >= self.max_size:
-            oldest_key = self._access_order.pop(0)
-            del self._cache[oldest_key]
+        key = self._hash_query(query, model)
         
-        self._cache[key] = embedding
-        self._access_order.append(key)
+        with self._lock:
+            if key in self._cache:
+                self._access_order.remove(key)
+            # Si cache lleno, eliminar el menos usado
+            elif len(self._cache) >= self.max_size:
+                oldest_key = self._access_order.pop(0)
+                del self._cache[oldest_key]
+            
+            self._cache[key] = embedding
+            self._access_order.append(key)
     
     def clear(self):
         """Limpiar cache"""
-        self._cache.clear()
-        self._access_order.clear()
+        with self._lock:
+            self._cache.clear()
+            self._access_order.clear()
+    
+    def get_stats(self) -> dict:
+        """Obtener estadisticas del cache"""
+        total = self._hits + self._misses
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate_percent': round(self._hits / total * 100, 2) if total else 0.0,
+            'cache_size': len(self._cache),
+            'max_size': self.max_size
+        }
+
+
+def get_embedding_cache(max_size: int = 100) -> EmbeddingCache:
+    """
+    Obtener instancia singleton de EmbeddingCache
+    
+    Args:
+        max_size: Tamano maximo del cache
+        
+    Returns:
+        Instancia de EmbeddingCache
+    """
+    if not hasattr(get_embedding_cache, '_instance'):
+        get_embedding_cache._instance = EmbeddingCache(max_size)
+    
+    return get_embedding_cache._instance
@@ -4,15 +4,70 @@ Detecta VRAM disponible y elige el mejor modelo automaticamente
 """
 
 import os
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from dataclasses import dataclass
 
-from langchain_ollama import OllamaEmbeddings
+# langchain_core.embeddings arrastra langsmith (~0.6s): este modulo solo se
+# importa al construir el vectorstore, no en el arranque del servidor
+from langchain_core.embeddings import Embeddings
+
+from ollama_client import OllamaClient, get_ollama_client
+from embedding_cache import get_embedding_cache
 from utils.logger import get_logger
 
 logger = get_logger("embedding_manager")
 
 
+class PooledOllamaEmbeddings(Embeddings):
+    """
+    Embeddings de LangChain sobre OllamaClient
+    Envia los textos en lotes a /api/embed reutilizando conexiones.
+    Los embeddings de consultas pasan por la cache LRU de embeddings.
+    """
+
+    def __init__(self, model: str, batch_size: int = 32, client: Optional[OllamaClient] = None, use_cache: bool = True):
+        self.model = model
+        self.batch_size = batch_size
+        self.client = client or get_ollama_client()
+        self.cache = get_embedding_cache() if use_cache else None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings de documentos en lotes"""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self.client.embed_sync(self.model, texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embedding de una consulta"""
+        if self.cache is not None:
+            cached = self.cache.get(text, self.model)
+            if cached is not None:
+                return cached
+        vector = self.client.embed_sync(self.model, [text])[0]
+        if self.cache is not None:
+            self.cache.set(text, vector, self.model)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Version async de embed_documents"""
+        vectors: List[List[float]] = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(await self.client.embed(self.model, texts[start:start + self.batch_size]))
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Version async de embed_query"""
+        if self.cache is not None:
+            cached = self.cache.get(text, self.model)
+            if cached is not None:
+                return cached
+        vector = (await self.client.embed(self.model, [text]))[0]
+        if self.cache is not None:
+            self.cache.set(text, vector, self.model)
+        return vector
+
+
 @dataclass
 class EmbeddingModelConfig:
     """Configuracion de un modelo de embeddings"""
@@ -182,12 +237,12 @@ class EmbeddingManager:
         self._selected_model = selected
         return selected
     
-    def get_embeddings(self) -> OllamaEmbeddings:
+    def get_embeddings(self) -> PooledOllamaEmbeddings:
         """
         Obtener instancia de embeddings del modelo seleccionado
         
         Returns:
-            Instancia de OllamaEmbeddings
+            Instancia de PooledOllamaEmbeddings (pool HTTP compartido)
         """
         if self._embeddings is not None:
             return self._embeddings
@@ -200,7 +255,7 @@ class EmbeddingManager:
         logger.info(f"  Calidad: {model_config.quality}")
         logger.info(f"  Mejor para: {model_config.best_for}")
         
-        self._embeddings = OllamaEmbeddings(model=model_config.ollama_name)
+        self._embeddings = PooledOllamaEmbeddings(model=model_config.ollama_name)
         
         return self._embeddings
     
@@ -1,41 +1,25 @@
 from datetime import datetime
 import os
 import json
-import re
+import query_normalizer
 from utils.security import encrypt_data, decrypt_data
+from utils.tracing import traced
 from db_manager import (
     insert_qa_history, 
     get_qa_history as db_get_qa_history,
     delete_qa_history as db_delete_qa_history
 )
 
-# Stopwords en español (palabras comunes sin significado relevante)
-SPANISH_STOPWORDS = {
-    'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'ser', 'se', 'no', 'haber',
-    'por', 'con', 'su', 'para', 'como', 'estar', 'tener', 'le', 'lo', 'todo',
-    'pero', 'más', 'hacer', 'o', 'poder', 'decir', 'este', 'ir', 'otro', 'ese',
-    'si', 'me', 'ya', 'ver', 'porque', 'dar', 'cuando', 'él', 'muy', 'sin',
-    'vez', 'mucho', 'saber', 'qué', 'sobre', 'mi', 'alguno', 'mismo', 'yo',
-    'también', 'hasta', 'año', 'dos', 'querer', 'entre', 'así', 'primero',
-    'desde', 'grande', 'eso', 'ni', 'nos', 'llegar', 'pasar', 'tiempo', 'ella',
-    'sí', 'día', 'uno', 'bien', 'poco', 'deber', 'entonces', 'poner', 'cosa',
-    'tanto', 'hombre', 'parecer', 'nuestro', 'tan', 'donde', 'ahora', 'parte',
-    'después', 'vida', 'quedar', 'siempre', 'creer', 'hablar', 'llevar', 'dejar',
-    'nada', 'cada', 'seguir', 'menos', 'nuevo', 'encontrar', 'algo', 'solo',
-    'decir', 'necesitar', 'casa', 'llamar', 'venir', 'pensar', 'salir', 'volver',
-    'tomar', 'conocer', 'vivir', 'sentir', 'tratar', 'mirar', 'contar', 'empezar',
-    'esperar', 'buscar', 'existir', 'entrar', 'trabajar', 'escribir', 'perder',
-    'producir', 'ocurrir', 'entender', 'pedir', 'recibir', 'recordar', 'terminar',
-    'permitir', 'aparecer', 'conseguir', 'comenzar', 'servir', 'sacar', 'cual',
-    'es', 'son', 'esta', 'estas', 'estos', 'este', 'fue', 'fueron', 'sea', 'seas',
-    'tengo', 'tienes', 'tiene', 'tienen', 'tuyo', 'tuya', 'mi', 'mis', 'tu', 'tus',
-    'cual', 'cuales', 'quien', 'quienes', 'donde', 'como', 'cuando', 'cuanto'
-}
+# Stopwords y normalizacion compartidas con las caches (query_normalizer)
+SPANISH_STOPWORDS = query_normalizer.SPANISH_STOPWORDS
 
 def extract_keywords(text, min_length=3):
     """
     Extrae keywords relevantes de un texto eliminando stopwords
     
+    Usa la canonicalizacion compartida: sin acentos, numeros normalizados
+    y plurales regulares en singular ('direcciones' y 'dirección' coinciden).
+    
     Args:
         text: Texto del cual extraer keywords
         min_length: Longitud mínima de palabras a considerar
@@ -43,17 +27,7 @@ def extract_keywords(text, min_length=3):
     Returns:
         Set de keywords relevantes
     """
-    text_lower = text.lower()
-    # Extraer palabras alfanuméricas
-    words = re.findall(r'\w+', text_lower)
-    
-    # Filtrar stopwords y palabras muy cortas
-    keywords = {
-        word for word in words 
-        if word not in SPANISH_STOPWORDS and len(word) >= min_length
-    }
-    
-    return keywords
+    return query_normalizer.keywords(text, min_length=min_length)
 
 # --- Funciones de cifrado para datos sensibles ---
 def encrypt_personal_data(personal_data: dict) -> dict:
@@ -174,6 +148,18 @@ def delete_qa_from_history(timestamp, QA_HISTORY_FILE='alfred_qa_history.json'):
         print(f"Error al eliminar del historial SQLite: {e}")
         return False
 
+# Palabras clave importantes (alta prioridad en búsqueda), sin acentos como las keywords
+HIGH_PRIORITY_KEYWORDS = {
+    'rfc', 'curp', 'nss', 'nombre', 'direccion', 'telefono', 'celular', 'email',
+    'correo', 'edad', 'fecha', 'nacimiento', 'domicilio', 'trabajo', 'empresa',
+    'salario', 'sueldo', 'cuenta', 'banco', 'clabe', 'tarjeta', 'ine', 'pasaporte',
+    'licencia', 'cedula', 'titulo', 'certificado', 'acta', 'comprobante'
+}
+
+# Palabras de consulta (indican que se está preguntando algo)
+QUERY_WORDS = {'cual', 'que', 'donde', 'como', 'cuando', 'cuanto', 'quien'}
+
+@traced('history_search')
 def search_in_qa_history(question, history=None, threshold=0.3, top_k=3):
     """
     Busca en el historial de Q&A respuestas similares a la pregunta actual.
@@ -203,20 +189,11 @@ def search_in_qa_history(question, history=None, threshold=0.3, top_k=3):
         print("No se encontraron keywords relevantes en la pregunta.")
         return []
     
-    # Palabras clave importantes (alta prioridad en búsqueda)
-    high_priority_keywords = {
-        'rfc', 'curp', 'nss', 'nombre', 'dirección', 'direccion', 
-        'teléfono', 'telefono', 'celular', 'email', 'correo', 'edad', 'fecha',
-        'nacimiento', 'domicilio', 'trabajo', 'empresa', 'salario', 'sueldo',
-        'cuenta', 'banco', 'clabe', 'tarjeta', 'ine', 'pasaporte', 'licencia',
-        'cedula', 'cédula', 'titulo', 'título', 'certificado', 'acta', 'comprobante'
-    }
+    high_priority_keywords = HIGH_PRIORITY_KEYWORDS
+    query_words = QUERY_WORDS
     
-    # Palabras de consulta (indican que se está preguntando algo)
-    query_words = {
-        'cual', 'cuál', 'qué', 'que', 'dónde', 'donde', 'cómo', 'como',
-        'cuándo', 'cuando', 'cuánto', 'cuanto', 'quién', 'quien'
-    }
+    question_canonical = query_normalizer.canonical_query(question)
+    question_normalized = query_normalizer.normalize(question)
     
     results = []
     
@@ -225,6 +202,12 @@ def search_in_qa_history(question, history=None, threshold=0.3, top_k=3):
             continue
         
         stored_question = entry['question']
+        
+        # Misma pregunta canonica (mayusculas, acentos, signos, cortesia, plurales)
+        if query_normalizer.canonical_query(stored_question) == question_canonical:
+            results.append((1.0, entry))
+            continue
+        
         stored_keywords = extract_keywords(stored_question, min_length=2)
         
         # Encontrar keywords comunes (excluyendo palabras de consulta)
@@ -249,7 +232,7 @@ def search_in_qa_history(question, history=None, threshold=0.3, top_k=3):
         # 3. Bonus por coincidencia exacta de keywords importantes
         exact_match_bonus = 0
         for keyword in high_priority_matches:
-            if keyword in question.lower() and keyword in stored_question.lower():
+            if keyword in question_normalized and keyword in query_normalizer.normalize(stored_question):
                 exact_match_bonus += 0.15
         
         # 4. Bonus si tiene datos personales extraídos
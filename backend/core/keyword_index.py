@@ -0,0 +1,433 @@
+"""
+Keyword Index - Indice invertido BM25 de los chunks (SQLite FTS5)
+Se actualiza de forma incremental junto al vectorstore (agregar, borrar por
+archivo o por ruta, vaciar) y vive en keyword_index.db junto a chroma_db.
+Complementa la busqueda semantica en identificadores exactos (CURP, RFC, NSS,
+numeros de poliza...) que los embeddings no distinguen bien.
+Al indexar extrae tambien esos identificadores para consultarlos directamente
+sin volver a aplicar las regex sobre cada chunk recuperado. El texto de los
+chunks y los identificadores se guardan cifrados; el indice FTS5 no guarda
+contenido, solo los terminos.
+"""
+
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Any, Iterable
+
+from langchain_core.documents import Document
+
+from query_normalizer import search_terms
+from utils.logger import get_logger
+from utils.security import get_cipher, is_encryption_enabled
+
+logger = get_logger("keyword_index", sample_every=10)
+
+# Version del esquema (PRAGMA user_version). La 0 guardaba el texto en claro
+# en 'chunks' y en un indice FTS5 de contenido externo: se elimina al abrir
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    chunk_key TEXT UNIQUE NOT NULL,
+    source TEXT,
+    path_id INTEGER,
+    dir_prefix TEXT,
+    text TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source);
+CREATE INDEX IF NOT EXISTS idx_chunks_path_id ON chunks(path_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_dir_prefix ON chunks(dir_prefix);
+CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+    text,
+    content='',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS identifiers (
+    chunk_id INTEGER NOT NULL,
+    id_type TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_identifiers_type ON identifiers(id_type);
+CREATE INDEX IF NOT EXISTS idx_identifiers_chunk ON identifiers(chunk_id);
+CREATE TRIGGER IF NOT EXISTS chunks_ad_identifiers AFTER DELETE ON chunks BEGIN
+    DELETE FROM identifiers WHERE chunk_id = old.id;
+END;
+"""
+
+LEGACY_SCHEMA = """
+DROP TRIGGER IF EXISTS chunks_ai;
+DROP TRIGGER IF EXISTS chunks_ad;
+DROP TRIGGER IF EXISTS chunks_ad_identifiers;
+DROP TABLE IF EXISTS chunks_fts;
+DROP TABLE IF EXISTS identifiers;
+DROP TABLE IF EXISTS chunks;
+"""
+
+# Identificadores personales que se extraen al indexar (la etiqueta precede al valor)
+IDENTIFIER_PATTERNS = {
+    'RFC': re.compile(r'RFC[:\s]*([A-ZÑ&]{3,4}\d{6}[A-Z0-9]{3})', re.IGNORECASE),
+    'CURP': re.compile(r'CURP[:\s]*([A-Z]{4}\d{6}[HM][A-Z]{5}[0-9A-Z]\d)', re.IGNORECASE),
+    'NSS': re.compile(r'NSS[:\s]*(\d{11})', re.IGNORECASE),
+}
+
+
+def chunk_key(document: Document) -> str:
+    """
+    Clave estable de un chunk (fuente + contenido)
+    
+    Identifica el mismo chunk en resultados semanticos y de keyword para
+    fusionarlos, sin depender de los ids de cada backend.
+    """
+    source = str(document.metadata.get('source', ''))
+    return hashlib.sha1(f"{source}\0{document.page_content}".encode('utf-8')).hexdigest()
+
+
+def extract_identifiers(text: str) -> Dict[str, List[str]]:
+    """
+    Identificadores personales (RFC, CURP, NSS) de un texto
+    
+    Args:
+        text: Texto del chunk
+    
+    Returns:
+        Dict tipo -> valores unicos en orden de aparicion (solo tipos encontrados)
+    """
+    found = {}
+    for id_type, pattern in IDENTIFIER_PATTERNS.items():
+        values = []
+        for match in pattern.finditer(text):
+            if match.group(1) not in values:
+                values.append(match.group(1))
+        if values:
+            found[id_type] = values
+    return found
+
+
+class _BatchCipher:
+    """
+    Cifrado de un lote de valores con la clave de la aplicacion
+    
+    encrypt_data/decrypt_data leen la configuracion y el archivo de la clave
+    en cada valor; aqui se leen una vez por lote (indexacion o consulta).
+    """
+    
+    def __init__(self):
+        self.enabled = is_encryption_enabled()
+        self._fernet = get_cipher()
+    
+    def encrypt(self, value: str) -> str:
+        if not value or not self.enabled:
+            return value
+        return self._fernet.encrypt(value.encode()).decode()
+    
+    def decrypt(self, token: str) -> str:
+        # Aunque el cifrado este deshabilitado: pudo indexarse con el habilitado
+        if not token:
+            return token
+        try:
+            return self._fernet.decrypt(token.encode()).decode()
+        except Exception:
+            return token
+
+
+class KeywordIndex:
+    """
+    Indice BM25 persistente sobre SQLite FTS5
+    
+    La tabla 'chunks' guarda el texto cifrado con la clave de la aplicacion
+    y la metadata (con indices por source, path_id y dir_prefix para borrar
+    sin recorrer todo). 'chunks_fts' es un indice FTS5 sin contenido: solo
+    terminos, que se agregan y borran desde aqui (el borrado necesita el
+    texto original, que se descifra de 'chunks'). La tabla 'identifiers'
+    guarda los RFC/CURP/NSS de cada chunk, tambien cifrados, y se borra
+    junto con el chunk (trigger).
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Abrir (o crear) el indice
+        
+        Args:
+            db_path: Archivo SQLite del indice
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._drop_legacy_schema()
+        self._conn.executescript(SCHEMA)
+        self._conn.create_function('where_match', 2, self._where_match, deterministic=True)
+        self._conn.commit()
+        logger.info(f"Indice de keywords abierto: {self.db_path} ({self.count()} chunks)")
+    
+    def _drop_legacy_schema(self):
+        """Eliminar un indice de una version anterior (se reconstruye desde el vectorstore)"""
+        exists = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'chunks'").fetchone()
+        self._conn.executescript(LEGACY_SCHEMA)
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._conn.commit()
+        if exists:
+            # Sin VACUUM las paginas libres conservarian el texto en claro
+            self._conn.execute("VACUUM")
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            logger.info("Indice de keywords anterior eliminado (texto sin cifrar), se reconstruira")
+    
+    @staticmethod
+    def _where_match(metadata: str, where: str) -> bool:
+        from vector_index import matches_where
+        return matches_where(json.loads(metadata), json.loads(where))
+    
+    def count(self) -> int:
+        """Chunks indexados"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    
+    def add_documents(self, chunks: Iterable[Document]) -> int:
+        """
+        Indexar chunks (los que ya existen con la misma clave se reemplazan)
+        
+        Args:
+            chunks: Chunks etiquetados (source, path_id, dir_prefix en metadata)
+        
+        Returns:
+            Numero de chunks indexados
+        """
+        cipher = _BatchCipher()
+        # Chunks repetidos (mismo archivo y texto) comparten clave: se indexan una vez
+        rows = {}
+        for chunk in chunks:
+            metadata = chunk.metadata or {}
+            path_id = metadata.get('path_id')
+            key = chunk_key(chunk)
+            rows[key] = (
+                (
+                    key,
+                    metadata.get('source'),
+                    int(path_id) if path_id is not None else None,
+                    metadata.get('dir_prefix'),
+                    cipher.encrypt(chunk.page_content),
+                    json.dumps(metadata, ensure_ascii=False, default=str)
+                ),
+                chunk.page_content,
+                [
+                    (id_type, cipher.encrypt(value))
+                    for id_type, values in extract_identifiers(chunk.page_content).items()
+                    for value in values
+                ]
+            )
+        if not rows:
+            return 0
+        keys = list(rows)
+        with self._lock, self._conn:
+            # Los que ya existen se borran antes (tambien sus terminos del indice FTS)
+            for offset in range(0, len(keys), 500):
+                batch = keys[offset:offset + 500]
+                self._delete_rows(f"chunk_key IN ({', '.join('?' * len(batch))})", batch, cipher)
+            for row, text, identifiers in rows.values():
+                chunk_id = self._conn.execute(
+                    "INSERT INTO chunks (chunk_key, source, path_id, dir_prefix, text, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                    row
+                ).lastrowid
+                self._conn.execute("INSERT INTO chunks_fts (rowid, text) VALUES (?, ?)", (chunk_id, text))
+                if identifiers:
+                    self._conn.executemany(
+                        "INSERT INTO identifiers (chunk_id, id_type, value) VALUES (?, ?, ?)",
+                        [(chunk_id, id_type, value) for id_type, value in identifiers]
+                    )
+        return len(rows)
+    
+    def _delete_rows(self, condition: str, params: List[Any], cipher: Optional[_BatchCipher] = None) -> int:
+        """
+        Borrar chunks y sus terminos del indice FTS (con el lock y la transaccion tomados)
+        
+        Args:
+            condition: Condicion SQL sobre 'chunks'
+            params: Parametros de la condicion
+            cipher: Cifrado del lote (None = crear uno)
+        
+        Returns:
+            Numero de chunks borrados
+        """
+        rows = self._conn.execute(f"SELECT id, text FROM chunks WHERE {condition}", params).fetchall()
+        if not rows:
+            return 0
+        cipher = cipher or _BatchCipher()
+        # FTS5 sin contenido: el borrado recibe el texto que se indexo
+        self._conn.executemany(
+            "INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', ?, ?)",
+            [(chunk_id, cipher.decrypt(text)) for chunk_id, text in rows]
+        )
+        self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id, _ in rows])
+        return len(rows)
+    
+    def delete_source(self, source: str) -> int:
+        """Eliminar los chunks de un archivo"""
+        with self._lock, self._conn:
+            return self._delete_rows("source = ?", [source])
+    
+    def delete_path(self, path_id: Optional[int] = None, dir_prefix: Optional[str] = None) -> int:
+        """Eliminar los chunks de una ruta (por path_id y/o dir_prefix)"""
+        deleted = 0
+        with self._lock, self._conn:
+            if path_id is not None:
+                deleted += self._delete_rows("path_id = ?", [int(path_id)])
+            if dir_prefix:
+                deleted += self._delete_rows("dir_prefix = ?", [dir_prefix])
+        return deleted
+    
+    def clear(self) -> int:
+        """Vaciar el indice"""
+        with self._lock, self._conn:
+            count = self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("INSERT INTO chunks_fts (chunks_fts) VALUES ('delete-all')")
+        return count
+    
+    @staticmethod
+    def _exclude_paths_sql(exclude_path_ids: Optional[Iterable[int]], params: List[Any]) -> str:
+        """Condicion SQL que descarta los chunks de unas rutas (agrega sus parametros)"""
+        path_ids = [int(path_id) for path_id in exclude_path_ids or ()]
+        if not path_ids:
+            return ""
+        params.extend(path_ids)
+        return f" AND (c.path_id IS NULL OR c.path_id NOT IN ({', '.join('?' * len(path_ids))}))"
+    
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        exclude_path_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[Document, float]]:
+        """
+        Busqueda BM25
+        
+        Args:
+            query: Pregunta (terminos de search_terms unidos con OR)
+            k: Numero de resultados
+            filter_metadata: Filtro 'where' de Chroma (se aplica antes del top-k)
+            exclude_path_ids: Rutas cuyos chunks se descartan (deshabilitadas)
+        
+        Returns:
+            Lista de (documento, score BM25) ordenada de mayor a menor score
+        """
+        terms = search_terms(query)
+        if not terms or k <= 0:
+            return []
+        match = ' OR '.join(f'"{term}"' for term in terms)
+        
+        sql = (
+            "SELECT c.text, c.metadata, -bm25(chunks_fts) AS score "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ?"
+        )
+        params: List[Any] = [match]
+        sql += self._exclude_paths_sql(exclude_path_ids, params)
+        if filter_metadata:
+            sql += " AND where_match(c.metadata, ?)"
+            params.append(json.dumps(filter_metadata, default=str))
+        sql += " ORDER BY bm25(chunks_fts) LIMIT ?"
+        params.append(int(k))
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        logger.info(f"BM25: {len(rows)} resultados para {len(terms)} terminos")
+        if not rows:
+            return []
+        cipher = _BatchCipher()
+        return [
+            (Document(page_content=cipher.decrypt(text), metadata=json.loads(metadata)), float(score))
+            for text, metadata, score in rows
+        ]
+    
+    def lookup_identifiers(
+        self,
+        id_types: Optional[Iterable[str]] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        limit: int = 20,
+        exclude_path_ids: Optional[Iterable[int]] = None
+    ) -> List[Tuple[str, str, Document]]:
+        """
+        Consultar identificadores precalculados (sin busqueda ni regex)
+        
+        Args:
+            id_types: Tipos a buscar (RFC, CURP, NSS); None = todos
+            filter_metadata: Filtro 'where' de Chroma sobre el chunk
+            limit: Maximo de resultados (los chunks indexados mas recientes primero)
+            exclude_path_ids: Rutas cuyos chunks se descartan (deshabilitadas)
+        
+        Returns:
+            Lista de (tipo, valor descifrado, chunk que lo contiene)
+        """
+        sql = (
+            "SELECT i.id_type, i.value, c.text, c.metadata "
+            "FROM identifiers i JOIN chunks c ON c.id = i.chunk_id WHERE 1 = 1"
+        )
+        params: List[Any] = []
+        if id_types:
+            id_types = list(id_types)
+            sql += f" AND i.id_type IN ({', '.join('?' * len(id_types))})"
+            params.extend(id_types)
+        sql += self._exclude_paths_sql(exclude_path_ids, params)
+        if filter_metadata:
+            sql += " AND where_match(c.metadata, ?)"
+            params.append(json.dumps(filter_metadata, default=str))
+        sql += " ORDER BY c.id DESC, i.rowid LIMIT ?"
+        params.append(int(limit))
+        
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        
+        if not rows:
+            return []
+        cipher = _BatchCipher()
+        return [
+            (id_type, cipher.decrypt(value), Document(page_content=cipher.decrypt(text), metadata=json.loads(metadata)))
+            for id_type, value, text, metadata in rows
+        ]
+    
+    def identifiers_for_chunks(self, keys: Iterable[str]) -> Dict[str, Dict[str, str]]:
+        """
+        Identificadores precalculados de chunks concretos
+        
+        Args:
+            keys: Claves de chunk (chunk_key)
+        
+        Returns:
+            Dict clave -> {tipo: primer valor}; los chunks indexados sin
+            identificadores tienen un dict vacio y los no indexados no aparecen
+        """
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT c.chunk_key, i.id_type, i.value "
+                "FROM chunks c LEFT JOIN identifiers i ON i.chunk_id = c.id "
+                f"WHERE c.chunk_key IN ({', '.join('?' * len(keys))}) ORDER BY i.rowid",
+                keys
+            ).fetchall()
+        
+        # La mayoria de chunks no tiene identificadores: no leer la clave si no hay
+        cipher = _BatchCipher() if any(id_type is not None for _, id_type, _ in rows) else None
+        found: Dict[str, Dict[str, str]] = {}
+        for key, id_type, value in rows:
+            data = found.setdefault(key, {})
+            if id_type is not None and id_type not in data:
+                data[id_type] = cipher.decrypt(value)
+        return found
+    
+    def close(self):
+        """Cerrar la conexion"""
+        with self._lock:
+            self._conn.close()
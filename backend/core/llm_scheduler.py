@@ -0,0 +1,241 @@
+"""
+LLM Scheduler - Control de admision y prioridades para llamadas al LLM
+Limita las generaciones concurrentes contra el modelo local y atiende
+primero las respuestas interactivas, luego expansiones y tareas de fondo
+"""
+
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from enum import IntEnum
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional
+
+from utils.logger import get_logger
+
+logger = get_logger("llm_scheduler")
+
+
+class Priority(IntEnum):
+    """Clases de prioridad (menor valor = mayor prioridad)"""
+    INTERACTIVE = 0  # Respuesta al usuario
+    EXPANSION = 1    # Query expansion
+    BACKGROUND = 2   # Precarga de modelos y tareas de fondo
+
+
+class SchedulerSaturatedError(Exception):
+    """
+    La cola del LLM esta saturada
+
+    status_code es 429 si la peticion se rechazo al encolar (cola llena)
+    y 503 si espero en cola mas del tiempo maximo.
+    """
+
+    def __init__(self, message: str, retry_after: float, status_code: int = 429):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+
+class LLMScheduler:
+    """
+    Semaforo con cola de prioridad para llamadas al LLM
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait_seconds: Optional[float] = None
+    ):
+        """
+        Inicializar scheduler
+
+        Args:
+            max_concurrency: Generaciones simultaneas permitidas (ALFRED_LLM_CONCURRENCY)
+            max_queue: Peticiones en espera antes de rechazar (ALFRED_LLM_QUEUE_MAX)
+            max_wait_seconds: Espera maxima en cola antes de responder 503 (ALFRED_LLM_QUEUE_TIMEOUT)
+        """
+        self.max_concurrency = max_concurrency or int(os.getenv('ALFRED_LLM_CONCURRENCY', '2'))
+        self.max_queue = max_queue or int(os.getenv('ALFRED_LLM_QUEUE_MAX', '16'))
+        self.max_wait_seconds = max_wait_seconds or float(os.getenv('ALFRED_LLM_QUEUE_TIMEOUT', '120'))
+
+        # Las tareas de fondo solo pueden ocupar la mitad de la cola
+        self._queue_limits = {
+            Priority.INTERACTIVE: self.max_queue,
+            Priority.EXPANSION: self.max_queue,
+            Priority.BACKGROUND: max(1, self.max_queue // 2),
+        }
+
+        self._active = 0
+        self._waiters: List[tuple] = []  # heap de (prioridad, secuencia, future)
+        self._sequence = itertools.count()
+
+        # Metricas
+        self._admitted = {p: 0 for p in Priority}
+        self._rejected = {p: 0 for p in Priority}
+        self._timeouts = {p: 0 for p in Priority}
+        self._wait_total = {p: 0.0 for p in Priority}
+        self._wait_max = {p: 0.0 for p in Priority}
+        self._service_ewma = 5.0  # segundos por generacion (estimacion inicial)
+
+        logger.info(
+            f"Scheduler LLM: concurrencia={self.max_concurrency}, "
+            f"cola={self.max_queue}, espera_max={self.max_wait_seconds}s"
+        )
+
+    # ====================================
+    # Estado
+    # ====================================
+
+    @property
+    def queue_depth(self) -> int:
+        """Peticiones esperando turno"""
+        return sum(1 for _, _, fut in self._waiters if not fut.done())
+
+    @property
+    def active(self) -> int:
+        """Generaciones en curso"""
+        return self._active
+
+    def _depth_by_priority(self) -> Dict[Priority, int]:
+        depth = {p: 0 for p in Priority}
+        for priority, _, fut in self._waiters:
+            if not fut.done():
+                depth[Priority(priority)] += 1
+        return depth
+
+    def estimate_retry_after(self) -> float:
+        """Segundos estimados hasta que se libere capacidad"""
+        pending = self.queue_depth + self._active
+        return max(1.0, self._service_ewma * pending / self.max_concurrency)
+
+    # ====================================
+    # Admision
+    # ====================================
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE) -> float:
+        """
+        Obtener un turno para llamar al LLM
+
+        Args:
+            priority: Clase de prioridad
+
+        Returns:
+            Segundos esperados en cola
+
+        Raises:
+            SchedulerSaturatedError: Cola llena (429) o espera excedida (503)
+        """
+        if self._active < self.max_concurrency and self.queue_depth == 0:
+            self._active += 1
+            self._admitted[priority] += 1
+            return 0.0
+
+        depth = self._depth_by_priority()
+        queued_ahead = sum(count for p, count in depth.items() if p <= priority)
+        if queued_ahead >= self._queue_limits[priority]:
+            self._rejected[priority] += 1
+            retry_after = self.estimate_retry_after()
+            logger.warning(f"Cola LLM llena ({self.queue_depth} en espera), rechazando {priority.name}")
+            raise SchedulerSaturatedError(
+                f"El modelo esta ocupado ({self.queue_depth} consultas en espera)",
+                retry_after=retry_after,
+                status_code=429
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future))
+        start = time.perf_counter()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.max_wait_seconds)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # El turno llego justo al expirar: devolverlo
+                self._release_slot()
+            future.cancel()
+            self._timeouts[priority] += 1
+            raise SchedulerSaturatedError(
+                f"Tiempo de espera agotado en la cola del modelo ({self.max_wait_seconds:.0f}s)",
+                retry_after=self.estimate_retry_after(),
+                status_code=503
+            )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release_slot()
+            future.cancel()
+            raise
+
+        waited = time.perf_counter() - start
+        self._admitted[priority] += 1
+        self._wait_total[priority] += waited
+        self._wait_max[priority] = max(self._wait_max[priority], waited)
+        return waited
+
+    def _release_slot(self):
+        """Liberar un turno y cederlo al siguiente en la cola"""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # El turno pasa directamente al siguiente (active no cambia)
+                future.set_result(True)
+                return
+        self._active -= 1
+
+    def release(self, service_seconds: Optional[float] = None):
+        """
+        Liberar turno tras una llamada al LLM
+
+        Args:
+            service_seconds: Duracion de la llamada (actualiza la estimacion de retry-after)
+        """
+        if service_seconds is not None:
+            self._service_ewma = 0.8 * self._service_ewma + 0.2 * service_seconds
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.INTERACTIVE):
+        """
+        Context manager async para ejecutar una llamada al LLM con turno
+
+        Uso:
+            async with scheduler.slot(Priority.EXPANSION):
+                await llm.ainvoke(prompt)
+        """
+        await self.acquire(priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Obtener metricas del scheduler
+
+        Returns:
+            Dict con concurrencia, profundidad de cola y contadores por prioridad
+        """
+        depth = self._depth_by_priority()
+        priorities = {}
+        for p in Priority:
+            admitted = self._admitted[p]
+            priorities[p.name.lower()] = {
+                'queued': depth[p],
+                'admitted': admitted,
+                'rejected': self._rejected[p],
+                'timeouts': self._timeouts[p],
+                'avg_wait_seconds': round(self._wait_total[p] / admitted, 3) if admitted else 0.0,
+                'max_wait_seconds': round(self._wait_max[p], 3)
+            }
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'active': self._active,
+            'queue_depth': sum(depth.values()),
+            'avg_service_seconds': round(self._service_ewma, 3),
+            'priorities': priorities
+        }
@@ -0,0 +1,230 @@
+"""
+Model Downloads - Descargas de modelos Ollama con progreso estructurado
+Consume el stream JSON de /api/pull, limita las escrituras en BD y
+publica el progreso a suscriptores SSE. Permite cancelar descargas.
+"""
+
+import os
+import time
+import asyncio
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from ollama_client import get_ollama_client
+from utils.logger import get_logger
+
+logger = get_logger("model_downloads")
+
+# Estados finales de una descarga
+FINAL_STATUSES = ('completed', 'failed', 'cancelled')
+# Evento unico para un suscriptor sin descarga registrada (el stream se cierra)
+NOT_FOUND_STATUS = 'not_found'
+
+
+@dataclass
+class DownloadState:
+    """Estado en memoria de una descarga"""
+    model_name: str
+    status: str = 'downloading'
+    progress: int = 0
+    message: str = 'Descarga iniciada'
+    completed_bytes: int = 0
+    total_bytes: int = 0
+    layers: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    task: Optional[asyncio.Task] = None
+    subscribers: List[asyncio.Queue] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Serializar estado para la API/SSE"""
+        return {
+            'model_name': self.model_name,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'completed_bytes': self.completed_bytes,
+            'total_bytes': self.total_bytes,
+            'layers': len(self.layers),
+            'elapsed_seconds': round(self.updated_at - self.started_at, 1),
+            'updated_at': datetime.fromtimestamp(self.updated_at).isoformat()
+        }
+
+
+class ModelDownloadManager:
+    """
+    Gestor de descargas activas de modelos
+    """
+
+    def __init__(self, db_write_interval: Optional[float] = None):
+        """
+        Inicializar gestor
+
+        Args:
+            db_write_interval: Segundos minimos entre escrituras de progreso en BD
+        """
+        self.db_write_interval = db_write_interval or float(os.getenv('ALFRED_DOWNLOAD_DB_INTERVAL', '1.0'))
+        self._downloads: Dict[str, DownloadState] = {}
+
+    def get(self, model_name: str) -> Optional[DownloadState]:
+        """Obtener estado de una descarga (activa o recien terminada)"""
+        return self._downloads.get(model_name)
+
+    def is_active(self, model_name: str) -> bool:
+        """Verificar si hay una descarga en curso para el modelo"""
+        state = self._downloads.get(model_name)
+        return state is not None and state.task is not None and state.status not in FINAL_STATUSES
+
+    def list_active(self) -> List[Dict[str, Any]]:
+        """Listar descargas en curso"""
+        return [s.to_dict() for s in self._downloads.values() if s.status not in FINAL_STATUSES]
+
+    def start(self, model_name: str) -> DownloadState:
+        """
+        Iniciar descarga en segundo plano (debe llamarse desde el event loop)
+
+        Args:
+            model_name: Nombre del modelo
+
+        Returns:
+            Estado de la descarga (la existente si ya estaba en curso)
+        """
+        if self.is_active(model_name):
+            return self._downloads[model_name]
+
+        state = DownloadState(model_name=model_name)
+        # Conservar suscriptores que esperaban una descarga previa del mismo modelo
+        previous = self._downloads.get(model_name)
+        if previous:
+            state.subscribers = previous.subscribers
+        self._downloads[model_name] = state
+        state.task = asyncio.create_task(self._run(state))
+        return state
+
+    def cancel(self, model_name: str) -> bool:
+        """
+        Cancelar una descarga en curso
+
+        Returns:
+            True si habia una descarga activa
+        """
+        state = self._downloads.get(model_name)
+        if state is None or state.status in FINAL_STATUSES or state.task is None:
+            return False
+        state.task.cancel()
+        return True
+
+    def subscribe(self, model_name: str) -> asyncio.Queue:
+        """
+        Registrar un suscriptor de eventos de progreso
+
+        Sin descarga registrada para el modelo no se crea estado: la cola
+        recibe un unico evento NOT_FOUND_STATUS y el suscriptor debe cerrar.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        state = self._downloads.get(model_name)
+        if state is None:
+            queue.put_nowait({
+                'model_name': model_name,
+                'status': NOT_FOUND_STATUS,
+                'message': 'Sin descarga activa'
+            })
+            return queue
+        state.subscribers.append(queue)
+        queue.put_nowait(state.to_dict())
+        return queue
+
+    def unsubscribe(self, model_name: str, queue: asyncio.Queue):
+        """Eliminar un suscriptor"""
+        state = self._downloads.get(model_name)
+        if state and queue in state.subscribers:
+            state.subscribers.remove(queue)
+
+    def _publish(self, state: DownloadState):
+        """Enviar snapshot a todos los suscriptores (descarta si la cola esta llena)"""
+        snapshot = state.to_dict()
+        for queue in state.subscribers:
+            try:
+                queue.put_nowait(snapshot)
+            except asyncio.QueueFull:
+                pass
+
+    @staticmethod
+    def _apply_event(state: DownloadState, event: Dict[str, Any]):
+        """Actualizar bytes por capa a partir de un evento de /api/pull"""
+        status = event.get('status', '')
+        digest = event.get('digest')
+        if digest and event.get('total'):
+            state.layers[digest] = (int(event.get('completed') or 0), int(event['total']))
+            state.completed_bytes = sum(c for c, _ in state.layers.values())
+            state.total_bytes = sum(t for _, t in state.layers.values())
+            if state.total_bytes:
+                # 99 como maximo hasta que Ollama confirme 'success'
+                state.progress = min(99, int(state.completed_bytes * 100 / state.total_bytes))
+            done_mb = state.completed_bytes / (1024 * 1024)
+            total_mb = state.total_bytes / (1024 * 1024)
+            state.message = f"{status} {done_mb:.0f}/{total_mb:.0f} MB"
+        elif status:
+            state.message = status
+        state.updated_at = time.time()
+
+    async def _run(self, state: DownloadState):
+        """Ejecutar descarga consumiendo el stream de progreso"""
+        from db_manager import save_model_download_history, update_model_download_progress
+
+        model_name = state.model_name
+        logger.info(f"Iniciando descarga del modelo: {model_name}")
+
+        last_db_write = time.monotonic()
+        try:
+            # Dentro del try: si falla o se cancela, el estado termina igualmente
+            await asyncio.to_thread(save_model_download_history, model_name, 'downloading', 'Descarga iniciada', 0)
+            self._publish(state)
+
+            async for event in get_ollama_client().pull(model_name):
+                self._apply_event(state, event)
+                self._publish(state)
+
+                if event.get('status') == 'success':
+                    break
+
+                # Escribir en BD como maximo una vez por intervalo
+                now = time.monotonic()
+                if now - last_db_write >= self.db_write_interval:
+                    last_db_write = now
+                    await asyncio.to_thread(update_model_download_progress, model_name, state.progress, state.message)
+
+            state.status = 'completed'
+            state.progress = 100
+            state.message = 'Descarga completada'
+            logger.info(f"Modelo {model_name} descargado exitosamente")
+
+        except asyncio.CancelledError:
+            state.status = 'cancelled'
+            state.message = 'Descarga cancelada por el usuario'
+            logger.info(f"Descarga de {model_name} cancelada ({state.progress}%)")
+
+        except Exception as e:
+            state.status = 'failed'
+            state.message = str(e)
+            logger.error(f"Error al descargar modelo {model_name}: {e}")
+
+        state.updated_at = time.time()
+        self._publish(state)
+        try:
+            await asyncio.to_thread(save_model_download_history, model_name, state.status, state.message, state.progress)
+        except Exception as e:
+            logger.error(f"Error al guardar historial de {model_name}: {e}")
+
+
+def get_download_manager() -> ModelDownloadManager:
+    """
+    Obtener instancia singleton de ModelDownloadManager
+
+    Returns:
+        Instancia compartida del gestor de descargas
+    """
+    if not hasattr(get_download_manager, '_instance'):
+        get_download_manager._instance = ModelDownloadManager()
+    return get_download_manager._instance
@@ -0,0 +1,489 @@
+"""
+Ollama Client - Cliente HTTP compartido para la API REST de Ollama
+Mantiene un pool de conexiones persistente (keep-alive) con timeouts y reintentos
+Expone generate, embed, tags, pull, ps y delete en versiones async y sync
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from typing import Dict, Any, List, Optional, AsyncIterator, Union
+
+import httpx
+
+from utils.logger import get_logger
+from utils.metrics import counter
+
+logger = get_logger("ollama_client")
+
+# Metricas de generacion (tokens/s = rate(tokens) / rate(eval_seconds))
+LLM_TOKENS_GENERATED = counter('alfred_llm_tokens_generated_total', 'Tokens generados por el LLM', ('model',))
+LLM_PROMPT_TOKENS = counter('alfred_llm_prompt_tokens_total', 'Tokens de prompt evaluados por el LLM', ('model',))
+LLM_EVAL_SECONDS = counter('alfred_llm_eval_seconds_total', 'Segundos de generacion reportados por Ollama', ('model',))
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+
+# Errores de red que justifican reintentar la peticion
+RETRYABLE_ERRORS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.RemoteProtocolError,
+    httpx.ReadError,
+    httpx.PoolTimeout,
+)
+
+# Codigos HTTP que justifican reintentar la peticion
+RETRYABLE_STATUS = (502, 503, 504)
+
+
+class OllamaClientError(Exception):
+    """Error devuelto por la API de Ollama o por el transporte HTTP"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class OllamaConnectionError(OllamaClientError):
+    """Ollama no es alcanzable despues de agotar los reintentos"""
+
+
+class OllamaClient:
+    """
+    Cliente HTTP para Ollama con pool de conexiones compartido
+
+    El cliente async se asocia al event loop donde se creo; si se usa desde
+    otro loop (ej: asyncio.run en modo sync) se crea uno nuevo automaticamente.
+    """
+
+    def __init__(
+        self,
+        base_url: Optional[str] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        max_connections: Optional[int] = None
+    ):
+        """
+        Inicializar cliente
+
+        Args:
+            base_url: URL base de Ollama (default: ALFRED_OLLAMA_URL o localhost:11434)
+            connect_timeout: Timeout de conexion en segundos
+            read_timeout: Timeout de lectura en segundos (generaciones largas)
+            max_retries: Reintentos ante errores de conexion
+            max_connections: Maximo de conexiones en el pool
+        """
+        self.base_url = (base_url or os.getenv('ALFRED_OLLAMA_URL', DEFAULT_OLLAMA_URL)).rstrip('/')
+        self.connect_timeout = connect_timeout or float(os.getenv('ALFRED_OLLAMA_CONNECT_TIMEOUT', '5'))
+        self.read_timeout = read_timeout or float(os.getenv('ALFRED_OLLAMA_TIMEOUT', '300'))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('ALFRED_OLLAMA_RETRIES', '2'))
+        self.retry_backoff = 0.25
+
+        max_connections = max_connections or int(os.getenv('ALFRED_OLLAMA_MAX_CONNECTIONS', '10'))
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=60.0
+        )
+        self._timeout = httpx.Timeout(
+            self.read_timeout,
+            connect=self.connect_timeout,
+            pool=self.connect_timeout
+        )
+
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self._lock = threading.Lock()
+
+        # Cache corto de /api/tags (invalidado por pull/delete)
+        self.tags_ttl_seconds = float(os.getenv('ALFRED_OLLAMA_TAGS_TTL', '30'))
+        self._tags_cache: Optional[List[Dict[str, Any]]] = None
+        self._tags_cache_time = 0.0
+
+        logger.info(f"Cliente Ollama configurado: {self.base_url} (pool={max_connections}, retries={self.max_retries})")
+
+    # ====================================
+    # Transporte
+    # ====================================
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        """
+        Obtener cliente async asociado al event loop actual
+
+        Cada loop tiene su cliente y debe cerrarlo antes de terminar
+        (aclose_async_client, run_sync). Un cliente de un loop anterior que
+        no se cerro no se puede esperar desde este loop: solo se descarta.
+        """
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_client.is_closed or self._async_loop is not loop:
+            if self._async_client is not None and not self._async_client.is_closed:
+                logger.debug("Cliente async de un event loop anterior sin cerrar, se descarta")
+            self._async_client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self._timeout,
+                limits=self._limits
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def _get_sync_client(self) -> httpx.Client:
+        """Obtener cliente sync compartido entre hilos"""
+        if self._sync_client is None or self._sync_client.is_closed:
+            with self._lock:
+                if self._sync_client is None or self._sync_client.is_closed:
+                    self._sync_client = httpx.Client(
+                        base_url=self.base_url,
+                        timeout=self._timeout,
+                        limits=self._limits
+                    )
+        return self._sync_client
+
+    @staticmethod
+    def _error_detail(response: httpx.Response) -> str:
+        """Extraer mensaje de error de una respuesta de Ollama"""
+        try:
+            return response.json().get('error', response.text)
+        except Exception:
+            return response.text
+
+    def _check_response(self, response: httpx.Response, path: str):
+        """Lanzar OllamaClientError si la respuesta no es exitosa"""
+        if response.status_code >= 400:
+            raise OllamaClientError(
+                f"Ollama {path} respondio {response.status_code}: {self._error_detail(response)}",
+                status_code=response.status_code
+            )
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None
+    ) -> httpx.Response:
+        """
+        Ejecutar peticion async con reintentos ante errores de conexion
+
+        Args:
+            method: Metodo HTTP
+            path: Ruta de la API (ej: /api/tags)
+            payload: Cuerpo JSON
+            timeout: Timeout total opcional para esta peticion
+            retries: Reintentos (default: self.max_retries)
+
+        Returns:
+            Respuesta HTTP exitosa
+        """
+        retries = self.max_retries if retries is None else retries
+        request_timeout = timeout if timeout is not None else self._timeout
+
+        for attempt in range(retries + 1):
+            try:
+                client = self._get_async_client()
+                response = await client.request(method, path, json=payload, timeout=request_timeout)
+                if response.status_code in RETRYABLE_STATUS and attempt < retries:
+                    logger.warning(f"Ollama {path} respondio {response.status_code}, reintentando ({attempt + 1}/{retries})")
+                    await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                    continue
+                self._check_response(response, path)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if attempt >= retries:
+                    raise OllamaConnectionError(f"No se pudo conectar con Ollama en {self.base_url}: {e}") from e
+                logger.warning(f"Error de conexion con Ollama ({type(e).__name__}), reintentando ({attempt + 1}/{retries})")
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    def _request_sync(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None
+    ) -> httpx.Response:
+        """Version sync de _request (para hilos de executor y LangChain)"""
+        retries = self.max_retries if retries is None else retries
+        request_timeout = timeout if timeout is not None else self._timeout
+
+        for attempt in range(retries + 1):
+            try:
+                response = self._get_sync_client().request(method, path, json=payload, timeout=request_timeout)
+                if response.status_code in RETRYABLE_STATUS and attempt < retries:
+                    logger.warning(f"Ollama {path} respondio {response.status_code}, reintentando ({attempt + 1}/{retries})")
+                    time.sleep(self.retry_backoff * (2 ** attempt))
+                    continue
+                self._check_response(response, path)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if attempt >= retries:
+                    raise OllamaConnectionError(f"No se pudo conectar con Ollama en {self.base_url}: {e}") from e
+                logger.warning(f"Error de conexion con Ollama ({type(e).__name__}), reintentando ({attempt + 1}/{retries})")
+                time.sleep(self.retry_backoff * (2 ** attempt))
+
+    @staticmethod
+    def _generate_payload(
+        model: str,
+        prompt: str,
+        keep_alive: Optional[Union[int, str]],
+        options: Optional[Dict[str, Any]],
+        system: Optional[str]
+    ) -> Dict[str, Any]:
+        """Construir cuerpo de /api/generate sin streaming"""
+        payload: Dict[str, Any] = {'model': model, 'prompt': prompt, 'stream': False}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        if options:
+            payload['options'] = options
+        if system:
+            payload['system'] = system
+        return payload
+
+    # ====================================
+    # API async
+    # ====================================
+
+    async def version(self, timeout: float = 2.0) -> str:
+        """Obtener version de Ollama (sirve como ping)"""
+        response = await self._request('GET', '/api/version', timeout=timeout, retries=0)
+        return response.json().get('version', 'unknown')
+
+    async def is_available(self, timeout: float = 2.0) -> bool:
+        """Verificar si Ollama responde"""
+        try:
+            await self.version(timeout=timeout)
+            return True
+        except OllamaClientError:
+            return False
+
+    async def generate(
+        self,
+        model: str,
+        prompt: str,
+        keep_alive: Optional[Union[int, str]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        system: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        Generar respuesta completa (sin streaming)
+
+        Args:
+            model: Nombre del modelo
+            prompt: Prompt a enviar
+            keep_alive: Tiempo que el modelo permanece cargado (segundos o "5m")
+            options: Opciones del modelo (temperature, num_ctx, etc.)
+            system: System prompt opcional
+            timeout: Timeout total opcional
+
+        Returns:
+            Respuesta JSON de Ollama (response, eval_count, eval_duration, ...)
+        """
+        payload = self._generate_payload(model, prompt, keep_alive, options, system)
+        response = await self._request('POST', '/api/generate', payload, timeout=timeout)
+        return response.json()
+
+    async def embed(self, model: str, inputs: Union[str, List[str]], keep_alive: Optional[Union[int, str]] = None) -> List[List[float]]:
+        """
+        Generar embeddings en lote
+
+        Args:
+            model: Modelo de embeddings
+            inputs: Texto o lista de textos
+            keep_alive: Tiempo que el modelo permanece cargado
+
+        Returns:
+            Lista de vectores (uno por texto)
+        """
+        payload: Dict[str, Any] = {'model': model, 'input': inputs}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        response = await self._request('POST', '/api/embed', payload)
+        return response.json().get('embeddings', [])
+
+    async def tags(self, use_cache: bool = True) -> List[Dict[str, Any]]:
+        """
+        Listar modelos instalados (/api/tags)
+
+        Args:
+            use_cache: Reutilizar el listado si tiene menos de tags_ttl_seconds
+
+        Returns:
+            Lista de modelos con name, size (bytes), digest, modified_at y details
+        """
+        if use_cache and self._tags_cache is not None:
+            if time.monotonic() - self._tags_cache_time < self.tags_ttl_seconds:
+                return self._tags_cache
+
+        response = await self._request('GET', '/api/tags', timeout=10.0)
+        self._tags_cache = response.json().get('models', [])
+        self._tags_cache_time = time.monotonic()
+        return self._tags_cache
+
+    def invalidate_tags_cache(self):
+        """Descartar el listado de modelos en cache"""
+        self._tags_cache = None
+
+    async def ps(self) -> List[Dict[str, Any]]:
+        """Listar modelos cargados en memoria (/api/ps)"""
+        response = await self._request('GET', '/api/ps', timeout=10.0)
+        return response.json().get('models', [])
+
+    async def delete(self, model: str):
+        """Eliminar un modelo instalado"""
+        try:
+            await self._request('DELETE', '/api/delete', {'model': model}, timeout=30.0)
+        finally:
+            self.invalidate_tags_cache()
+
+    async def pull(self, model: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Descargar modelo consumiendo el stream de progreso de /api/pull
+
+        Args:
+            model: Nombre del modelo (ej: 'llama3.2:3b')
+
+        Yields:
+            Eventos JSON de progreso (status, digest, total, completed)
+        """
+        client = self._get_async_client()
+        timeout = httpx.Timeout(None, connect=self.connect_timeout)
+        try:
+            async with client.stream('POST', '/api/pull', json={'model': model, 'stream': True}, timeout=timeout) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    self._check_response(response, '/api/pull')
+                async for line in response.aiter_lines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    if 'error' in event:
+                        raise OllamaClientError(f"Error descargando {model}: {event['error']}")
+                    yield event
+        except RETRYABLE_ERRORS as e:
+            raise OllamaConnectionError(f"No se pudo conectar con Ollama en {self.base_url}: {e}") from e
+        finally:
+            # Incluso una descarga parcial puede dejar el modelo registrado
+            self.invalidate_tags_cache()
+
+    # ====================================
+    # API sync
+    # ====================================
+
+    def generate_sync(
+        self,
+        model: str,
+        prompt: str,
+        keep_alive: Optional[Union[int, str]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        system: Optional[str] = None,
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Version sync de generate"""
+        payload = self._generate_payload(model, prompt, keep_alive, options, system)
+        response = self._request_sync('POST', '/api/generate', payload, timeout=timeout)
+        return response.json()
+
+    def embed_sync(self, model: str, inputs: Union[str, List[str]], keep_alive: Optional[Union[int, str]] = None) -> List[List[float]]:
+        """Version sync de embed (usada por Chroma durante la indexacion)"""
+        payload: Dict[str, Any] = {'model': model, 'input': inputs}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        response = self._request_sync('POST', '/api/embed', payload)
+        return response.json().get('embeddings', [])
+
+    # ====================================
+    # Ciclo de vida
+    # ====================================
+
+    async def aclose_async_client(self):
+        """Cerrar el cliente async si es del loop actual (si es de otro, solo se descarta)"""
+        client, loop = self._async_client, self._async_loop
+        self._async_client = None
+        self._async_loop = None
+        if client is not None and not client.is_closed and loop is asyncio.get_running_loop():
+            await client.aclose()
+
+    async def aclose(self):
+        """Cerrar conexiones del pool"""
+        await self.aclose_async_client()
+        self.close()
+
+    def close(self):
+        """Cerrar cliente sync"""
+        if self._sync_client is not None and not self._sync_client.is_closed:
+            self._sync_client.close()
+        self._sync_client = None
+
+
+class PooledOllamaLLM:
+    """
+    Wrapper LLM sobre OllamaClient
+    Sustituye a OllamaLLM de LangChain reutilizando el pool de conexiones
+    """
+
+    def __init__(self, model: str, keep_alive: Optional[Union[int, str]] = None,
+                 options: Optional[Dict[str, Any]] = None, client: Optional[OllamaClient] = None):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.options = options
+        self.client = client or get_ollama_client()
+
+    def _record_usage(self, result: Dict[str, Any]):
+        """Acumular conteos de tokens que Ollama devuelve con cada respuesta"""
+        if result.get('eval_count'):
+            LLM_TOKENS_GENERATED.inc(result['eval_count'], model=self.model)
+            LLM_EVAL_SECONDS.inc(result.get('eval_duration', 0) / 1e9, model=self.model)
+        if result.get('prompt_eval_count'):
+            LLM_PROMPT_TOKENS.inc(result['prompt_eval_count'], model=self.model)
+
+    def invoke(self, prompt: str) -> str:
+        """Generar respuesta (sync)"""
+        result = self.client.generate_sync(self.model, prompt, keep_alive=self.keep_alive, options=self.options)
+        self._record_usage(result)
+        return result.get('response', '')
+
+    async def ainvoke(self, prompt: str) -> str:
+        """Generar respuesta (async, sin ocupar hilos del executor)"""
+        result = await self.client.generate(self.model, prompt, keep_alive=self.keep_alive, options=self.options)
+        self._record_usage(result)
+        return result.get('response', '')
+
+
+def get_ollama_client() -> OllamaClient:
+    """
+    Obtener instancia singleton de OllamaClient
+
+    Returns:
+        Instancia compartida de OllamaClient
+    """
+    if not hasattr(get_ollama_client, '_instance'):
+        get_ollama_client._instance = OllamaClient()
+    return get_ollama_client._instance
+
+
+def run_sync(coro):
+    """
+    Ejecutar una corrutina en un event loop nuevo (asyncio.run) cerrando el
+    cliente async de ese loop antes de que termine
+
+    Para wrappers sincronos, scripts y benchmarks: cada asyncio.run crea un
+    loop y un cliente nuevos, y sin cerrarlo sus conexiones quedarian abiertas.
+
+    Args:
+        coro: Corrutina a ejecutar
+
+    Returns:
+        Resultado de la corrutina
+    """
+    async def main():
+        try:
+            return await coro
+        finally:
+            await get_ollama_client().aclose_async_client()
+
+    return asyncio.run(main())
@@ -0,0 +1,189 @@
+"""
+Query Normalizer - Canonicalizacion compartida de preguntas
+Una sola forma de normalizar preguntas para todas las caches (respuestas,
+retrieval, embeddings) y para la busqueda en el historial Q&A: acentos y
+Unicode, puntuacion y espacios, numeros, stopwords e inflexion (plurales)
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Set, Optional, FrozenSet
+
+# Numeros escritos con palabra -> digitos ("tres" y "3" son la misma pregunta)
+NUMBER_WORDS = {
+    'cero': '0', 'uno': '1', 'dos': '2', 'tres': '3', 'cuatro': '4', 'cinco': '5',
+    'seis': '6', 'siete': '7', 'ocho': '8', 'nueve': '9', 'diez': '10',
+    'once': '11', 'doce': '12', 'trece': '13', 'catorce': '14', 'quince': '15',
+    'dieciseis': '16', 'diecisiete': '17', 'dieciocho': '18', 'diecinueve': '19',
+    'veinte': '20', 'treinta': '30', 'cuarenta': '40', 'cincuenta': '50',
+    'sesenta': '60', 'setenta': '70', 'ochenta': '80', 'noventa': '90', 'cien': '100'
+}
+
+# Formas plurales irregulares o cortas (que stem() no toca) -> singular
+IRREGULAR_FORMS = {
+    'mis': 'mi', 'tus': 'tu', 'sus': 'su', 'son': 'es', 'cuales': 'cual',
+    'quienes': 'quien', 'estos': 'este', 'estas': 'esta', 'esos': 'ese', 'esas': 'esa',
+    'nuestros': 'nuestro', 'nuestras': 'nuestra'
+}
+
+# Palabras que no cambian lo que se pregunta (articulos, cortesia, relleno).
+# Conservador a proposito: negaciones, interrogativos y preposiciones con
+# significado (por/para/sin) se mantienen para no mezclar preguntas distintas
+QUERY_STOPWORDS: FrozenSet[str] = frozenset({
+    'el', 'la', 'los', 'las', 'un', 'una', 'unos', 'unas', 'lo', 'al', 'del', 'de',
+    'y', 'e', 'favor', 'porfa', 'porfavor', 'hola', 'oye', 'gracias', 'alfred',
+    'dime', 'dame', 'decir', 'puedes', 'podrias', 'podria', 'quiero', 'quisiera',
+    'necesito', 'saber', 'me', 'mostrar', 'muestrame', 'ayudame', 'ayuda'
+})
+
+# Stopwords para extraccion de keywords (busqueda en historial), sin acentos
+SPANISH_STOPWORDS: FrozenSet[str] = frozenset({
+    'el', 'la', 'de', 'que', 'y', 'a', 'en', 'un', 'ser', 'se', 'no', 'haber',
+    'por', 'con', 'su', 'para', 'como', 'estar', 'tener', 'le', 'lo', 'todo',
+    'pero', 'mas', 'hacer', 'o', 'poder', 'decir', 'este', 'ir', 'otro', 'ese',
+    'si', 'me', 'ya', 'ver', 'porque', 'dar', 'cuando', 'muy', 'sin',
+    'vez', 'mucho', 'saber', 'sobre', 'mi', 'alguno', 'mismo', 'yo',
+    'tambien', 'hasta', 'ano', 'querer', 'entre', 'asi', 'primero',
+    'desde', 'grande', 'eso', 'ni', 'nos', 'llegar', 'pasar', 'tiempo', 'ella',
+    'dia', 'bien', 'poco', 'deber', 'entonces', 'poner', 'cosa',
+    'tanto', 'hombre', 'parecer', 'nuestro', 'tan', 'donde', 'ahora', 'parte',
+    'despues', 'vida', 'quedar', 'siempre', 'creer', 'hablar', 'llevar', 'dejar',
+    'nada', 'cada', 'seguir', 'menos', 'nuevo', 'encontrar', 'algo', 'solo',
+    'necesitar', 'casa', 'llamar', 'venir', 'pensar', 'salir', 'volver',
+    'tomar', 'conocer', 'vivir', 'sentir', 'tratar', 'mirar', 'contar', 'empezar',
+    'esperar', 'buscar', 'existir', 'entrar', 'trabajar', 'escribir', 'perder',
+    'producir', 'ocurrir', 'entender', 'pedir', 'recibir', 'recordar', 'terminar',
+    'permitir', 'aparecer', 'conseguir', 'comenzar', 'servir', 'sacar', 'cual',
+    'es', 'son', 'esta', 'estas', 'estos', 'fue', 'fueron', 'sea', 'seas',
+    'tengo', 'tienes', 'tiene', 'tienen', 'tuyo', 'tuya', 'mis', 'tu', 'tus',
+    'cuales', 'quien', 'quienes', 'cuanto'
+})
+
+# Keywords del historial: ademas de las anteriores, descartar cortesia y relleno
+KEYWORD_STOPWORDS: FrozenSet[str] = SPANISH_STOPWORDS | QUERY_STOPWORDS
+
+_COURTESY = re.compile(r'\bpor favor\b')
+_THOUSANDS = re.compile(r'\b\d{1,3}(?:[.,]\d{3})+\b')
+_DECIMAL_COMMA = re.compile(r'(\d),(\d)')
+_NON_WORD = re.compile(r'[^\w.]+|(?<!\d)\.|\.(?!\d)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fold(text: str) -> str:
+    """
+    Minusculas, compatibilidad Unicode (NFKD) y sin acentos/dieresis
+
+    'ñ' se conserva como 'n' (se pierde la distincion ano/año, igual en ambos lados)
+    """
+    text = unicodedata.normalize('NFKD', text.casefold())
+    return ''.join(ch for ch in text if not unicodedata.combining(ch))
+
+
+def normalize(text: str) -> str:
+    """
+    Normalizacion ligera: fold, numeros, puntuacion y espacios
+
+    '¿Cuál es mi  RFC?' -> 'cual es mi rfc'; '1,500.00' -> '1500.00'
+    """
+    text = fold(text)
+    text = _THOUSANDS.sub(lambda m: re.sub(r'[.,]', '', m.group()), text)
+    text = _DECIMAL_COMMA.sub(r'\1.\2', text)
+    text = _NON_WORD.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+@lru_cache(maxsize=4096)
+def stem(word: str) -> str:
+    """
+    Inflexion ligera del espanol: singular de plurales regulares
+
+    direcciones -> direccion, documentos -> documento, luces -> luz,
+    papeles -> papel. Numeros y palabras cortas no se tocan.
+    """
+    if len(word) <= 3 or word.isdigit():
+        return word
+    if word.endswith('ces'):
+        return word[:-3] + 'z'
+    if word.endswith('es') and len(word) > 4 and word[-3] not in 'aeiou':
+        return word[:-2]
+    if word.endswith('s') and word[-2] in 'aeiou':
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str, stopwords: Optional[Set[str]] = QUERY_STOPWORDS, stemmed: bool = True) -> List[str]:
+    """
+    Tokens canonicos de un texto (en orden)
+
+    Args:
+        text: Texto a tokenizar
+        stopwords: Palabras a descartar (None = ninguna)
+        stemmed: Aplicar singularizacion
+
+    Returns:
+        Lista de tokens normalizados
+    """
+    tokens = []
+    for word in _COURTESY.sub(' ', normalize(text)).split():
+        word = NUMBER_WORDS.get(word, word)
+        if stopwords and word in stopwords:
+            continue
+        if stemmed:
+            word = IRREGULAR_FORMS.get(word) or stem(word)
+        tokens.append(word)
+    return tokens
+
+
+def search_terms(text: str) -> List[str]:
+    """
+    Terminos de una pregunta para la busqueda por keywords (BM25, reranking lexico)
+
+    Sin singularizar (el indice FTS5 guarda las palabras tal cual), sin
+    stopwords de keywords, de mas de una letra y sin repetidos.
+
+    Args:
+        text: Pregunta del usuario
+
+    Returns:
+        Terminos unicos en orden de aparicion
+    """
+    return list(dict.fromkeys(
+        word for word in tokenize(text, stopwords=KEYWORD_STOPWORDS, stemmed=False)
+        if len(word) > 1
+    ))
+
+
+@lru_cache(maxsize=4096)
+def canonical_query(text: str) -> str:
+    """
+    Clave canonica de una pregunta para caches
+
+    Conserva el orden de las palabras ('juan paga a pedro' != 'pedro paga a juan').
+    Si todo eran stopwords, devuelve la normalizacion ligera.
+
+    Args:
+        text: Pregunta del usuario
+
+    Returns:
+        Texto canonico (usar como clave o como entrada de un hash)
+    """
+    return ' '.join(tokenize(text)) or normalize(text)
+
+
+@lru_cache(maxsize=4096)
+def keywords(text: str, min_length: int = 3) -> FrozenSet[str]:
+    """
+    Keywords de un texto para la busqueda en el historial Q&A
+
+    Args:
+        text: Texto del cual extraer keywords
+        min_length: Longitud minima (antes de singularizar)
+
+    Returns:
+        Frozenset de keywords canonicas (cacheado: el historial se compara en cada consulta)
+    """
+    return frozenset(
+        stem(word) for word in tokenize(text, stopwords=KEYWORD_STOPWORDS, stemmed=False)
+        if len(word) >= min_length
+    )
@@ -0,0 +1,289 @@
+"""
+Reranker - Reordenado de los candidatos de la busqueda antes del prompt
+Puntua en lote los fetch_k candidatos (solapamiento lexico o cross-encoder en
+CPU), cachea los scores por (query, chunk) y se omite si no cabe en el
+presupuesto de latencia, conservando el orden de la recuperacion.
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Dict, Any
+
+from langchain_core.documents import Document
+
+from keyword_index import chunk_key
+from query_normalizer import canonical_query, search_terms, tokenize
+from utils import metrics
+from utils.logger import get_logger
+from utils.tracing import span
+
+logger = get_logger("reranker", sample_every=10)  # Logs por consulta: 1 de cada 10
+
+# 'lexical' (terminos de la pregunta presentes en el chunk, sin dependencias),
+# 'cross-encoder' (transformers + torch en CPU) o 'none'
+RERANKERS = ('none', 'lexical', 'cross-encoder')
+DEFAULT_RERANKER = os.getenv('ALFRED_RERANKER', 'lexical').lower()
+CROSS_ENCODER_MODEL = os.getenv('ALFRED_RERANK_MODEL', 'cross-encoder/mmarco-mMiniLMv2-L12-H384-v1')
+RERANK_BUDGET_MS = float(os.getenv('ALFRED_RERANK_BUDGET_MS', '250'))
+RERANK_BATCH_SIZE = int(os.getenv('ALFRED_RERANK_BATCH_SIZE', '16'))
+RERANK_CACHE_SIZE = int(os.getenv('ALFRED_RERANK_CACHE_SIZE', '4096'))
+
+RERANK_SKIPPED = metrics.counter(
+    'alfred_rerank_skipped_total', 'Reordenados omitidos por el presupuesto de latencia', ('reason',)
+)
+
+
+def _min_max(values: List[float]) -> List[float]:
+    low, spread = min(values), max(values) - min(values)
+    return [(value - low) / spread if spread > 0 else 1.0 for value in values]
+
+
+class LexicalScorer:
+    """Fraccion de los terminos de la pregunta que aparecen en el chunk"""
+    
+    name = 'lexical'
+    # Peso del score del reranker frente al de la recuperacion (el lexico
+    # solo desempata y corrige; el semantico sigue contando)
+    weight = 0.5
+    
+    def score_batch(self, query: str, texts: List[str]) -> List[float]:
+        terms = search_terms(query)
+        if not terms:
+            return [0.0] * len(texts)
+        scores = []
+        for text in texts:
+            tokens = set(tokenize(text, stopwords=None, stemmed=False))
+            scores.append(sum(term in tokens for term in terms) / len(terms))
+        return scores
+
+
+class CrossEncoderScorer:
+    """Cross-encoder (pregunta, chunk) de HuggingFace en CPU"""
+    
+    weight = 1.0
+    
+    def __init__(self, model_name: str = CROSS_ENCODER_MODEL):
+        """
+        Cargar el modelo (se descarga la primera vez)
+        
+        Raises:
+            ImportError: Si transformers o torch no estan instalados
+        """
+        import torch
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        
+        self._torch = torch
+        self.name = f"cross-encoder:{model_name}"
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        self.model.eval()
+    
+    def score_batch(self, query: str, texts: List[str]) -> List[float]:
+        with self._torch.inference_mode():
+            features = self.tokenizer(
+                [query] * len(texts),
+                texts,
+                padding=True,
+                truncation=True,
+                max_length=512,
+                return_tensors='pt'
+            )
+            logits = self.model(**features).logits
+        # Un logit (relevancia) o dos (irrelevante, relevante): la ultima columna
+        return logits[:, -1].float().tolist()
+
+
+class Reranker:
+    """
+    Etapa de reranking con cache LRU y presupuesto de latencia
+    
+    Los scores del scorer se cachean por (hash de la query canonica, chunk_key):
+    repetir una pregunta o compartir candidatos entre preguntas no vuelve a
+    puntuarlos. El coste por chunk se estima con una media movil; si los
+    chunks sin cache no caben en el presupuesto (o se agota a mitad), se
+    devuelve el orden original de la recuperacion.
+    """
+    
+    def __init__(
+        self,
+        scorer,
+        budget_ms: float = RERANK_BUDGET_MS,
+        batch_size: int = RERANK_BATCH_SIZE,
+        cache_size: int = RERANK_CACHE_SIZE
+    ):
+        """
+        Inicializar reranker
+        
+        Args:
+            scorer: Objeto con name, weight y score_batch(query, texts)
+            budget_ms: Presupuesto de latencia por consulta (0 = sin limite)
+            batch_size: Chunks por llamada al scorer
+            cache_size: Maximo de scores en cache
+        """
+        self.scorer = scorer
+        self.budget_ms = budget_ms
+        self.batch_size = max(1, batch_size)
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple[str, str], float]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._cost_per_chunk_ms = 0.0
+        
+        # Estadisticas
+        self._hits = 0
+        self._misses = 0
+        self._reranked = 0
+        self._skipped = 0
+        
+        logger.info(f"Reranker: {scorer.name} (presupuesto={budget_ms}ms, lote={self.batch_size})")
+    
+    def _query_hash(self, query: str) -> str:
+        return hashlib.sha1(f"{self.scorer.name}\0{canonical_query(query)}".encode('utf-8')).hexdigest()
+    
+    def _skip(
+        self,
+        reason: str,
+        documents: List[Document],
+        scores: List[float],
+        top_k: int
+    ) -> Tuple[List[Document], List[float]]:
+        """Orden original de la recuperacion (sin reranking)"""
+        with self._lock:
+            self._skipped += 1
+        RERANK_SKIPPED.inc(reason=reason)
+        logger.info(f"Reranking omitido ({reason}): presupuesto de {self.budget_ms}ms")
+        return documents[:top_k], scores[:top_k]
+    
+    def rerank(
+        self,
+        query: str,
+        documents: List[Document],
+        scores: List[float],
+        top_k: int
+    ) -> Tuple[List[Document], List[float]]:
+        """
+        Reordenar candidatos combinando el score del scorer y el de la recuperacion
+        
+        Args:
+            query: Pregunta del usuario
+            documents: Candidatos ordenados por la recuperacion
+            scores: Scores de la recuperacion (mayor = mejor)
+            top_k: Documentos a devolver
+        
+        Returns:
+            Tupla (documentos, scores combinados) de los top_k mejores
+        """
+        if not documents:
+            return [], []
+        
+        start = time.perf_counter()
+        query_hash = self._query_hash(query)
+        keys = [(query_hash, chunk_key(doc)) for doc in documents]
+        
+        with self._lock:
+            rerank_scores: List[Optional[float]] = []
+            for key in keys:
+                score = self._cache.get(key)
+                if score is not None:
+                    self._cache.move_to_end(key)
+                rerank_scores.append(score)
+            missing = [i for i, score in enumerate(rerank_scores) if score is None]
+            self._hits += len(keys) - len(missing)
+            self._misses += len(missing)
+            predicted_ms = len(missing) * self._cost_per_chunk_ms
+        
+        if self.budget_ms and predicted_ms > self.budget_ms:
+            # Reducir la estimacion para volver a intentarlo en proximas consultas
+            with self._lock:
+                self._cost_per_chunk_ms *= 0.5
+            return self._skip('predicted', documents, scores, top_k)
+        
+        with span('rerank'):
+            for offset in range(0, len(missing), self.batch_size):
+                if self.budget_ms and (time.perf_counter() - start) * 1000 > self.budget_ms:
+                    return self._skip('exceeded', documents, scores, top_k)
+                
+                batch = missing[offset:offset + self.batch_size]
+                batch_start = time.perf_counter()
+                batch_scores = self.scorer.score_batch(query, [documents[i].page_content for i in batch])
+                cost_ms = (time.perf_counter() - batch_start) * 1000 / len(batch)
+                
+                with self._lock:
+                    self._cost_per_chunk_ms = (
+                        cost_ms if not self._cost_per_chunk_ms
+                        else 0.8 * self._cost_per_chunk_ms + 0.2 * cost_ms
+                    )
+                    for i, score in zip(batch, batch_scores):
+                        rerank_scores[i] = float(score)
+                        self._cache[keys[i]] = float(score)
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+        
+        weight = self.scorer.weight
+        combined = [
+            weight * reranked + (1 - weight) * retrieved
+            for reranked, retrieved in zip(_min_max(rerank_scores), _min_max(list(scores)))
+        ]
+        ranked = sorted(zip(documents, combined), key=lambda pair: pair[1], reverse=True)[:top_k]
+        
+        with self._lock:
+            self._reranked += 1
+        logger.info(
+            f"Reranking ({self.scorer.name}): {len(documents)} -> {len(ranked)} documentos, "
+            f"{len(missing)} puntuados en {(time.perf_counter() - start) * 1000:.1f}ms"
+        )
+        return [doc for doc, _ in ranked], [score for _, score in ranked]
+    
+    def clear(self):
+        """Vaciar la cache de scores"""
+        with self._lock:
+            self._cache.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Estadisticas del reranker y su cache"""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'scorer': self.scorer.name,
+                'budget_ms': self.budget_ms,
+                'batch_size': self.batch_size,
+                'cost_per_chunk_ms': round(self._cost_per_chunk_ms, 3),
+                'reranked': self._reranked,
+                'skipped': self._skipped,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0,
+                'cache_size': len(self._cache),
+                'max_size': self.cache_size
+            }
+
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    Obtener el reranker configurado (ALFRED_RERANKER), singleton
+    
+    Returns:
+        Instancia de Reranker, o None con ALFRED_RERANKER=none. Si el
+        cross-encoder no se puede cargar se usa el scorer lexico.
+    """
+    if hasattr(get_reranker, '_instance'):
+        return get_reranker._instance
+    
+    name = DEFAULT_RERANKER
+    if name not in RERANKERS:
+        logger.warning(f"Reranker no soportado: {name}, usando 'lexical' (opciones: {RERANKERS})")
+        name = 'lexical'
+    if name == 'none':
+        return None
+    
+    scorer = None
+    if name == 'cross-encoder':
+        try:
+            scorer = CrossEncoderScorer()
+        except Exception as e:
+            logger.warning(f"Cross-encoder no disponible ({e}), usando reranking lexico")
+    
+    get_reranker._instance = Reranker(scorer or LexicalScorer())
+    return get_reranker._instance
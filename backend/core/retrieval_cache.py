@@ -12,9 +12,10 @@ from threading import Lock
 
 from langchain_core.documents import Document
 
+from query_normalizer import canonical_query
 from utils.logger import get_logger
 
-logger = get_logger("retrieval_cache")
+logger = get_logger("retrieval_cache", sample_every=10)  # Logs por consulta: 1 de cada 10
 
 
 @dataclass
@@ -72,8 +73,8 @@ class RetrievalCache:
         Returns:
             Hash SHA256 como string
         """
-        # Incluir query y parametros relevantes en el hash
-        cache_key = f"{query}:{sorted(kwargs.items())}"
+        # Incluir query (forma canonica) y parametros relevantes en el hash
+        cache_key = f"{canonical_query(query)}:{sorted(kwargs.items(), key=lambda item: item[0])}"
         return hashlib.sha256(cache_key.encode()).hexdigest()
     
     def _is_expired(self, entry: CacheEntry) -> bool:
@@ -138,7 +139,7 @@ class RetrievalCache:
         
         with self._lock:
             # Limpiar entradas expiradas periodicamente
-            if len(self._cache) > 0 and self._hits + self._misses % 10 == 0:
+            if len(self._cache) > 0 and (self._hits + self._misses) % 10 == 0:
                 self._cleanup_expired()
             
             if query_hash in self._cache:
@@ -3,8 +3,10 @@ Retriever - Busquedas vectoriales con ranking semantico
 Implementa recuperacion avanzada y reranking de resultados
 """
 
+import os
 import asyncio
-from typing import List, Dict, Optional, Tuple, Any
+from datetime import datetime
+from typing import List, Dict, Optional, Tuple, Any, Callable, Iterable, Set
 from dataclasses import dataclass
 
 from langchain_community.vectorstores import Chroma
@@ -13,9 +15,135 @@ from langchain_core.retrievers import BaseRetriever
 from langchain.retrievers import ContextualCompressionRetriever
 from langchain.retrievers.document_compressors import EmbeddingsFilter
 
+from retrieval_cache import get_retrieval_cache
+from keyword_index import chunk_key
 from utils.logger import get_logger
+from utils.tracing import span, traced
 
-logger = get_logger("retriever")
+logger = get_logger("retriever", sample_every=10)  # Logs por consulta: 1 de cada 10
+
+# Fusion de HybridRetriever: 'rrf' (Reciprocal Rank Fusion), 'weighted'
+# (scores normalizados y ponderados), 'semantic' o 'keyword' (una sola fuente)
+FUSION_MODES = ('rrf', 'weighted', 'semantic', 'keyword')
+DEFAULT_FUSION = os.getenv('ALFRED_HYBRID_FUSION', 'rrf').lower()
+RRF_K = 60
+
+
+def build_scope_filter(
+    path_ids: Optional[Iterable[int]] = None,
+    extensions: Optional[Iterable[str]] = None,
+    modified_after: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Traducir un alcance de busqueda a un filtro 'where' de Chroma
+    
+    Usa la metadata escrita al indexar: 'path_id' (tag_chunks),
+    'file_extension' y 'last_modified' (document_loader). Chroma filtra
+    antes de calcular el top-k, asi que se obtienen k resultados completos.
+    
+    Args:
+        path_ids: Ids de rutas de document_paths
+        extensions: Extensiones de archivo ('.pdf' o 'pdf')
+        modified_after: Solo archivos modificados despues de esta fecha
+        
+    Returns:
+        Filtro para filter_metadata (None si no hay alcance)
+    """
+    conditions = []
+    if path_ids:
+        conditions.append({'path_id': {'$in': sorted({int(path_id) for path_id in path_ids})}})
+    if extensions:
+        normalized = sorted({'.' + ext.lower().lstrip('.') for ext in extensions if ext.strip('.')})
+        conditions.append({'file_extension': {'$in': normalized}})
+    if modified_after is not None:
+        conditions.append({'last_modified': {'$gte': modified_after.timestamp()}})
+    
+    if not conditions:
+        return None
+    if len(conditions) == 1:
+        return conditions[0]
+    return {'$and': conditions}
+
+
+def scope_path_ids(filter_metadata: Optional[Dict[str, Any]]) -> Optional[Set[int]]:
+    """Rutas a las que limita un filtro de build_scope_filter (None = sin limite)"""
+    if not filter_metadata:
+        return None
+    for condition in filter_metadata.get('$and', [filter_metadata]):
+        path_condition = condition.get('path_id')
+        if isinstance(path_condition, dict) and '$in' in path_condition:
+            return set(path_condition['$in'])
+        if isinstance(path_condition, int):
+            return {path_condition}
+    return None
+
+
+def merge_by_distance(
+    batches: List[List[Tuple[Document, float]]],
+    limit: int
+) -> List[Tuple[Document, float]]:
+    """
+    Combinar resultados de varias colecciones (distancia: menor es mejor)
+    
+    Args:
+        batches: Resultados (documento, distancia) de cada coleccion
+        limit: Maximo de resultados combinados
+        
+    Returns:
+        Top 'limit' por distancia ascendente
+    """
+    if len(batches) == 1:
+        return batches[0]
+    merged = [pair for batch in batches for pair in batch]
+    merged.sort(key=lambda pair: pair[1])
+    return merged[:limit]
+
+
+def fuse_results(
+    ranked_lists: List[List[Tuple[Document, float]]],
+    mode: str = 'rrf',
+    limit: int = 10,
+    weights: Optional[List[float]] = None,
+    rrf_k: int = RRF_K
+) -> List[Tuple[Document, float]]:
+    """
+    Fusionar resultados de varios buscadores (cada lista: mayor score = mejor)
+    
+    'rrf' suma 1 / (rrf_k + posicion) en cada lista: solo usa el orden, asi
+    que no importa que BM25 y similitud coseno tengan escalas distintas.
+    'weighted' normaliza los scores de cada lista a [0, 1] (min-max) y suma
+    peso * score. Los chunks se identifican con chunk_key (fuente + texto).
+    
+    Args:
+        ranked_lists: Listas (documento, score) ordenadas de mejor a peor
+        mode: 'rrf' o 'weighted'
+        limit: Maximo de resultados
+        weights: Peso de cada lista (solo 'weighted'; default: iguales)
+        rrf_k: Constante de RRF (atenua el peso de las primeras posiciones)
+        
+    Returns:
+        Lista (documento, score fusionado) ordenada de mayor a menor
+    """
+    weights = weights or [1.0] * len(ranked_lists)
+    fused: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    
+    for results, weight in zip(ranked_lists, weights):
+        if not results:
+            continue
+        scores = [score for _, score in results]
+        low, spread = min(scores), max(scores) - min(scores)
+        for rank, (doc, score) in enumerate(results, 1):
+            key = chunk_key(doc)
+            documents.setdefault(key, doc)
+            if mode == 'weighted':
+                value = weight * ((score - low) / spread if spread > 0 else 1.0)
+            else:
+                value = 1.0 / (rrf_k + rank)
+            fused[key] = fused.get(key, 0.0) + value
+    
+    ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:limit]
+    return [(documents[key], score) for key, score in ranked]
 
 
 @dataclass
@@ -41,7 +169,10 @@ class SemanticRetriever:
         default_k: int = 10,
         score_threshold: float = 0.0,  # Threshold mas bajo por defecto
         use_mmr: bool = False,
-        mmr_diversity: float = 0.3
+        mmr_diversity: float = 0.3,
+        use_cache: Optional[bool] = None,
+        store_provider: Optional[Callable[[Optional[Set[int]]], List[Chroma]]] = None,
+        reranker: Optional[Any] = None
     ):
         """
         Inicializar Semantic Retriever
@@ -52,38 +183,75 @@ class SemanticRetriever:
             score_threshold: Umbral minimo de similitud (0-1)
             use_mmr: Usar Maximum Marginal Relevance para diversidad
             mmr_diversity: Factor de diversidad para MMR (0=relevancia, 1=diversidad)
+            use_cache: Cachear resultados por query canonica (default: ALFRED_RETRIEVAL_CACHE_ENABLED)
+            store_provider: Devuelve los vectorstores a consultar en cada busqueda
+                (colecciones por ruta, opcionalmente limitadas a unos path_ids);
+                None = solo 'vectorstore'
+            reranker: Reranker para rerank_by_relevance (None = ordenar por score)
         """
         self.vectorstore = vectorstore
+        self.reranker = reranker
+        self.store_provider = store_provider
         self.default_k = default_k
         self.score_threshold = score_threshold
         self.use_mmr = use_mmr
         self.mmr_diversity = mmr_diversity
         
+        if use_cache is None:
+            use_cache = os.getenv('ALFRED_RETRIEVAL_CACHE_ENABLED', 'true').lower() == 'true'
+        self.cache = get_retrieval_cache() if use_cache else None
+        
         # Configuracion de retrieval
         self._base_retriever = None
     
+    def _search_stores(self, filter_metadata: Optional[Dict[str, Any]] = None) -> List[Chroma]:
+        """
+        Vectorstores a consultar (uno por coleccion si el indice esta
+        particionado por ruta; con alcance por path_id, solo esas rutas)
+        """
+        if self.store_provider is None:
+            return [self.vectorstore]
+        return self.store_provider(scope_path_ids(filter_metadata)) or [self.vectorstore]
+    
+    async def _fan_out(
+        self,
+        search: Callable[[Chroma], List[Tuple[Document, float]]],
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Ejecutar una busqueda en cada vectorstore en paralelo (executor por defecto)"""
+        loop = asyncio.get_event_loop()
+        return await asyncio.gather(*(
+            loop.run_in_executor(None, search, store)
+            for store in self._search_stores(filter_metadata)
+        ))
+    
     def _mmr_search_with_scores(
         self,
-        query: str,
+        query_embedding: List[float],
         k: int,
         fetch_k: int,
-        filter_metadata: Optional[Dict[str, Any]] = None
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        vectorstore: Optional[Chroma] = None
     ) -> List[Tuple[Document, float]]:
         """
         Realizar busqueda MMR y aproximar scores
         
         Args:
-            query: Query de busqueda
+            query_embedding: Embedding de la query (calculado una sola vez)
             k: Documentos finales a retornar
             fetch_k: Documentos a recuperar antes de aplicar MMR
             filter_metadata: Filtros de metadata
+            vectorstore: Coleccion a consultar (default: self.vectorstore)
             
         Returns:
             Lista de tuplas (documento, score)
         """
+        if vectorstore is None:
+            vectorstore = self.vectorstore
+        
         # Primero obtener candidatos con scores
-        candidates_with_scores = self.vectorstore.similarity_search_with_score(
-            query,
+        candidates_with_scores = vectorstore.similarity_search_by_vector_with_relevance_scores(
+            query_embedding,
             k=fetch_k,
             filter=filter_metadata
         )
@@ -94,8 +262,8 @@ class SemanticRetriever:
         
         logger.info(f"MMR: Buscando {k} docs finales de {fetch_k} candidatos (diversity={self.mmr_diversity})")
         
-        mmr_docs = self.vectorstore.max_marginal_relevance_search(
-            query,
+        mmr_docs = vectorstore.max_marginal_relevance_search_by_vector(
+            query_embedding,
             k=k,
             fetch_k=fetch_k,
             lambda_mult=1 - self.mmr_diversity,
@@ -146,13 +314,15 @@ class SemanticRetriever:
             search_kwargs=search_kwargs
         )
     
+    @traced('retrieval')
     async def retrieve_async(
         self,
         query: str,
         k: Optional[int] = None,
         fetch_k: Optional[int] = None,
         filter_metadata: Optional[Dict[str, Any]] = None,
-        score_threshold: Optional[float] = None
+        score_threshold: Optional[float] = None,
+        use_mmr: Optional[bool] = None
     ) -> RetrievalResult:
         """
         Realizar busqueda vectorial asincrona
@@ -163,6 +333,7 @@ class SemanticRetriever:
             fetch_k: Numero de documentos a recuperar antes de filtrar (para MMR)
             filter_metadata: Filtros de metadata para aplicar
             score_threshold: Umbral de similitud personalizado
+            use_mmr: Aplicar MMR (None = self.use_mmr)
             
         Returns:
             RetrievalResult con documentos y scores
@@ -173,29 +344,60 @@ class SemanticRetriever:
         k = k or self.default_k
         fetch_k = fetch_k or (k * 5)  # Por defecto, fetch 5x mas para tener pool
         threshold = score_threshold or self.score_threshold
+        use_mmr = self.use_mmr if use_mmr is None else use_mmr
         
         logger.info(f"Buscando documentos para query: '{query[:50]}...'")
-        logger.info(f"Parametros: k={k}, fetch_k={fetch_k}, threshold={threshold}, use_mmr={self.use_mmr}")
+        logger.info(f"Parametros: k={k}, fetch_k={fetch_k}, threshold={threshold}, use_mmr={use_mmr}")
+        
+        # Resultados previos para la misma query canonica y parametros
+        # (la cache se invalida al modificar el indice)
+        cache_params = {
+            'k': k,
+            'fetch_k': fetch_k,
+            'threshold': threshold,
+            'use_mmr': use_mmr,
+            'mmr_diversity': self.mmr_diversity,
+            'filter': filter_metadata
+        }
+        if self.cache is not None:
+            cached = self.cache.get(query, **cache_params)
+            if cached is not None:
+                documents, scores = cached
+                return RetrievalResult(
+                    documents=list(documents),
+                    scores=list(scores),
+                    query=query,
+                    total_results=len(documents),
+                    filtered_results=len(documents),
+                    retrieval_time=time.time() - start_time
+                )
         
         try:
-            # Realizar busqueda segun configuracion
-            if self.use_mmr:
-                # MMR search (devuelve solo documentos, sin scores directos)
-                docs_with_scores = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self._mmr_search_with_scores(query, k, fetch_k, filter_metadata)
-                )
-                results = docs_with_scores
-            else:
-                # Similarity search con scores
-                results = await asyncio.get_event_loop().run_in_executor(
-                    None,
-                    lambda: self.vectorstore.similarity_search_with_score(
-                        query,
-                        k=fetch_k,  # Recuperar mas documentos inicialmente
-                        filter=filter_metadata
+            # Embedding de la query una sola vez (reutilizado por MMR y scores)
+            with span('embedding'):
+                query_embedding = await self.vectorstore.embeddings.aembed_query(query)
+            
+            # Realizar busqueda segun configuracion (en paralelo sobre cada
+            # coleccion si el indice esta particionado por ruta)
+            with span('vector_search'):
+                if use_mmr:
+                    # MMR search (devuelve solo documentos, sin scores directos)
+                    batches = await self._fan_out(
+                        lambda store: self._mmr_search_with_scores(query_embedding, k, fetch_k, filter_metadata, store),
+                        filter_metadata
                     )
-                )
+                    results = merge_by_distance(batches, k)
+                else:
+                    # Similarity search con scores
+                    batches = await self._fan_out(
+                        lambda store: store.similarity_search_by_vector_with_relevance_scores(
+                            query_embedding,
+                            k=fetch_k,  # Recuperar mas documentos inicialmente
+                            filter=filter_metadata
+                        ),
+                        filter_metadata
+                    )
+                    results = merge_by_distance(batches, fetch_k)
             
             # Separar documentos y scores
             documents = []
@@ -235,6 +437,9 @@ class SemanticRetriever:
                 f"documentos (threshold={threshold:.2f}, tiempo={retrieval_time:.3f}s)"
             )
             
+            if self.cache is not None:
+                self.cache.put(query, documents, scores, **cache_params)
+            
             return result
         
         except Exception as e:
@@ -269,11 +474,19 @@ class SemanticRetriever:
         logger.info(f"Buscando documentos para query: '{query[:50]}...'")
         
         try:
-            results = self.vectorstore.similarity_search_with_score(
-                query,
-                k=k,
-                filter=filter_metadata
-            )
+            stores = self._search_stores(filter_metadata)
+            if len(stores) == 1:
+                results = stores[0].similarity_search_with_score(
+                    query,
+                    k=k,
+                    filter=filter_metadata
+                )
+            else:
+                query_embedding = self.vectorstore.embeddings.embed_query(query)
+                results = merge_by_distance([
+                    store.similarity_search_by_vector_with_relevance_scores(query_embedding, k=k, filter=filter_metadata)
+                    for store in stores
+                ], k)
             
             documents = []
             scores = []
@@ -347,15 +560,20 @@ class SemanticRetriever:
         self,
         documents: List[Document],
         scores: List[float],
-        top_k: int = 5
+        top_k: int = 5,
+        query: Optional[str] = None
     ) -> Tuple[List[Document], List[float]]:
         """
         Reordenar documentos por relevancia
         
+        Con reranker y query se puntuan los candidatos contra la pregunta
+        (ver reranker.Reranker); si no, se ordenan por el score existente.
+        
         Args:
             documents: Lista de documentos
             scores: Lista de scores correspondientes
             top_k: Numero de documentos top a retornar
+            query: Pregunta para el reranker
             
         Returns:
             Tupla (documentos_reordenados, scores_reordenados)
@@ -363,6 +581,9 @@ class SemanticRetriever:
         if not documents:
             return [], []
         
+        if self.reranker is not None and query:
+            return self.reranker.rerank(query, documents, scores, top_k)
+        
         # Combinar documentos con scores y ordenar
         doc_score_pairs = list(zip(documents, scores))
         doc_score_pairs.sort(key=lambda x: x[1], reverse=True)
@@ -415,7 +636,10 @@ class SemanticRetriever:
         metadata_filters: Dict[str, Any]
     ) -> Tuple[List[Document], List[float]]:
         """
-        Filtrar documentos por metadata
+        Filtrar documentos por metadata (despues de recuperar)
+        
+        Puede dejar menos de k resultados: para busquedas con alcance usar
+        filter_metadata en retrieve_async (ver build_scope_filter).
         
         Args:
             documents: Lista de documentos
@@ -515,26 +739,45 @@ class SemanticRetriever:
 
 class HybridRetriever:
     """
-    Retriever hibrido que combina busqueda vectorial con keyword search
+    Retriever hibrido: busqueda vectorial + BM25 (KeywordIndex) con fusion
+    por ranking reciproco (rrf) o por scores ponderados (weighted)
     """
     
     def __init__(
         self,
         semantic_retriever: SemanticRetriever,
         vector_weight: float = 0.7,
-        keyword_weight: float = 0.3
+        keyword_weight: float = 0.3,
+        keyword_index: Optional[Any] = None,
+        fusion: Optional[str] = None,
+        rrf_k: int = RRF_K,
+        excluded_paths: Optional[Callable[[], Set[int]]] = None
     ):
         """
         Inicializar Hybrid Retriever
         
         Args:
             semantic_retriever: Instancia de SemanticRetriever
-            vector_weight: Peso para resultados vectoriales (0-1)
-            keyword_weight: Peso para resultados de keyword search (0-1)
+            vector_weight: Peso para resultados vectoriales (0-1, fusion 'weighted')
+            keyword_weight: Peso para resultados de keyword search (0-1, fusion 'weighted')
+            keyword_index: KeywordIndex (None = solo busqueda semantica)
+            fusion: Fusion por defecto (default: ALFRED_HYBRID_FUSION)
+            rrf_k: Constante de Reciprocal Rank Fusion
+            excluded_paths: Devuelve los path_ids que BM25 debe omitir en cada
+                busqueda (las rutas que la semantica no consulta); None = ninguno
         """
         self.semantic_retriever = semantic_retriever
+        self.keyword_index = keyword_index
+        self.excluded_paths = excluded_paths
         self.vector_weight = vector_weight
         self.keyword_weight = keyword_weight
+        self.rrf_k = rrf_k
+        
+        fusion = (fusion or DEFAULT_FUSION).lower()
+        if fusion not in FUSION_MODES:
+            logger.warning(f"Fusion no soportada: {fusion}, usando 'rrf' (opciones: {FUSION_MODES})")
+            fusion = 'rrf'
+        self.fusion = fusion
         
         # Normalizar pesos
         total = vector_weight + keyword_weight
@@ -542,27 +785,116 @@ class HybridRetriever:
         self.keyword_weight = keyword_weight / total
         
         logger.info(
-            f"Hybrid Retriever: vector_weight={self.vector_weight:.2f}, "
-            f"keyword_weight={self.keyword_weight:.2f}"
+            f"Hybrid Retriever: fusion={self.fusion}, vector_weight={self.vector_weight:.2f}, "
+            f"keyword_weight={self.keyword_weight:.2f}, bm25={'si' if keyword_index is not None else 'no'}"
         )
     
+    def uses_keywords(self, fusion: Optional[str] = None) -> bool:
+        """True si una busqueda con esta fusion consulta el indice BM25"""
+        return self.keyword_index is not None and (fusion or self.fusion) != 'semantic'
+    
+    def _keyword_search(
+        self,
+        query: str,
+        k: int,
+        filter_metadata: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """BM25 sin interrumpir la consulta si el indice falla"""
+        try:
+            with span('keyword_search'):
+                excluded = self.excluded_paths() if self.excluded_paths is not None else None
+                return self.keyword_index.search(query, k, filter_metadata, exclude_path_ids=excluded)
+        except Exception as e:
+            logger.warning(f"Error en busqueda por keywords, se usa solo la semantica: {e}")
+            return []
+    
     async def retrieve_hybrid(
         self,
         query: str,
-        k: int = 10
+        k: int = 10,
+        fetch_k: Optional[int] = None,
+        filter_metadata: Optional[Dict[str, Any]] = None,
+        fusion: Optional[str] = None,
+        keyword_query: Optional[str] = None
     ) -> RetrievalResult:
         """
         Busqueda hibrida combinando vectorial y keyword
         
+        Con reranker en el SemanticRetriever se recuperan y fusionan fetch_k
+        candidatos, y el reranker elige los k finales. En ese caso no se aplica
+        MMR: elegiria fetch_k de fetch_k candidatos (sin diversificar) con una
+        segunda busqueda; basta una busqueda por similitud de fetch_k.
+        
         Args:
             query: Query de busqueda
             k: Numero total de documentos a retornar
+            fetch_k: Candidatos de la busqueda semantica antes de MMR (o del reranker)
+            filter_metadata: Filtro 'where' (se aplica en ambas busquedas)
+            fusion: 'rrf', 'weighted', 'semantic' o 'keyword' (None = self.fusion)
+            keyword_query: Texto para BM25 (default: query); permite usar la
+                pregunta original aunque la semantica use una query expandida
             
         Returns:
             RetrievalResult con documentos combinados
         """
-        # Por ahora solo usar semantic retriever
-        # En el futuro se puede agregar BM25 o keyword search
-        result = await self.semantic_retriever.retrieve_async(query, k)
+        import time
         
-        return result
+        mode = (fusion or self.fusion).lower()
+        if mode not in FUSION_MODES:
+            raise ValueError(f"Fusion no soportada: {mode} (opciones: {FUSION_MODES})")
+        
+        start_time = time.time()
+        keyword_query = keyword_query or query
+        
+        # Con reranker se recuperan fetch_k candidatos (por similitud, sin MMR)
+        # y el reranker elige los k
+        reranker = self.semantic_retriever.reranker
+        pool = max(k, fetch_k or k) if reranker is not None else k
+        use_mmr = False if reranker is not None else None
+        
+        if not self.uses_keywords(mode):
+            result = await self.semantic_retriever.retrieve_async(query, pool, fetch_k, filter_metadata, use_mmr=use_mmr)
+            if reranker is None:
+                return result
+            semantic_pairs, keyword_pairs = list(zip(result.documents, result.scores)), []
+            fused = semantic_pairs
+        elif mode == 'keyword':
+            semantic_pairs = []
+            keyword_pairs = await asyncio.to_thread(self._keyword_search, keyword_query, pool, filter_metadata)
+            fused = keyword_pairs[:pool]
+        else:
+            # Ambas busquedas en paralelo (BM25 en un hilo: SQLite es bloqueante)
+            semantic_result, keyword_pairs = await asyncio.gather(
+                self.semantic_retriever.retrieve_async(query, pool, fetch_k, filter_metadata, use_mmr=use_mmr),
+                asyncio.to_thread(self._keyword_search, keyword_query, pool, filter_metadata)
+            )
+            semantic_pairs = list(zip(semantic_result.documents, semantic_result.scores))
+            fused = fuse_results(
+                [semantic_pairs, keyword_pairs],
+                mode=mode,
+                limit=pool,
+                weights=[self.vector_weight, self.keyword_weight],
+                rrf_k=self.rrf_k
+            )
+        
+        documents = [doc for doc, _ in fused]
+        scores = [score for _, score in fused]
+        if reranker is not None:
+            # Reranking con la pregunta original (la query expandida es para embeddings)
+            documents, scores = await asyncio.to_thread(
+                self.semantic_retriever.rerank_by_relevance, documents, scores, k, keyword_query
+            )
+        
+        logger.info(
+            f"Busqueda hibrida ({mode}): {len(semantic_pairs)} semanticos + "
+            f"{len(keyword_pairs)} BM25 -> {len(documents)} documentos"
+        )
+        
+        return RetrievalResult(
+            documents=documents,
+            scores=scores,
+            query=query,
+            total_results=len(semantic_pairs) + len(keyword_pairs),
+            filtered_results=len(documents),
+            retrieval_time=time.time() - start_time
+        )
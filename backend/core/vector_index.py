@@ -0,0 +1,825 @@
+"""
+Vector Index - Indice vectorial en proceso como alternativa a ChromaDB
+Los embeddings viven en una matriz mapeada en memoria (float32, float16 o
+int8 con reordenado a precision completa) junto a los registros (id, texto, metadata) en archivos append-only.
+Busqueda exacta con NumPy (flat) o aproximada con HNSW (hnswlib, opcional).
+
+Implementa la interfaz de VectorStore de LangChain que usa el retriever y
+el subconjunto de la API de coleccion de Chroma que usa VectorManager
+(count, get, update, delete con filtros 'where'), asi que ambos backends
+son intercambiables.
+"""
+
+import os
+import json
+import uuid
+import shutil
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Any, Iterable, Callable
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+
+from utils.logger import get_logger
+
+logger = get_logger("vector_index")
+
+INDEX_TYPES = ('flat', 'hnsw')
+STORAGE_DTYPES = ('float32', 'float16', 'int8')
+
+# Compactar archivos cuando las filas eliminadas superan esta fraccion
+COMPACT_RATIO = 0.25
+# Filas por bloque al multiplicar matrices float16/int8 (evita convertir todo a float32)
+SEARCH_BLOCK_ROWS = 4096
+# int8: candidatos aproximados por resultado que se reordenan con los vectores float32
+DEFAULT_RESCORE_FACTOR = 4
+
+
+# ====================================
+# Filtros 'where' (sintaxis de Chroma)
+# ====================================
+
+_COMPARATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '$eq': lambda value, expected: value == expected,
+    '$ne': lambda value, expected: value != expected,
+    '$gt': lambda value, expected: value is not None and value > expected,
+    '$gte': lambda value, expected: value is not None and value >= expected,
+    '$lt': lambda value, expected: value is not None and value < expected,
+    '$lte': lambda value, expected: value is not None and value <= expected,
+    '$in': lambda value, expected: value in expected,
+    '$nin': lambda value, expected: value not in expected,
+}
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """
+    Evaluar un filtro 'where' de Chroma sobre la metadata de un chunk
+    
+    Soporta igualdad directa, $eq/$ne/$gt/$gte/$lt/$lte/$in/$nin y $and/$or.
+    
+    Args:
+        metadata: Metadata del chunk
+        where: Filtro (None = todo coincide)
+    
+    Returns:
+        True si la metadata cumple el filtro
+    """
+    if not where:
+        return True
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for operator, expected in condition.items():
+                if operator not in _COMPARATORS:
+                    raise ValueError(f"Operador no soportado en filtro: {operator}")
+                if not _COMPARATORS[operator](value, expected):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _load_hnswlib():
+    """Importar hnswlib si esta instalado (dependencia opcional)"""
+    try:
+        import hnswlib
+        return hnswlib
+    except ImportError:
+        return None
+
+
+def _encode_rows(vectors: np.ndarray, dtype: str) -> Dict[str, np.ndarray]:
+    """
+    Contenido de los archivos de vectores para filas float32
+    
+    Args:
+        vectors: Matriz float32 (filas x dimension)
+        dtype: Almacenamiento de la coleccion
+    
+    Returns:
+        Dict {archivo: datos a escribir}
+    """
+    if dtype != 'int8':
+        return {'vectors.bin': vectors.astype(dtype)}
+    # Cuantizacion escalar simetrica por fila: v ~= codigo * escala
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return {
+        'vectors.bin': codes,
+        'scales.bin': scales.astype(np.float32),
+        'full.bin': vectors.astype(np.float32)
+    }
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store local: matriz de embeddings mapeada en memoria + indice
+    
+    Archivos en el directorio de la coleccion:
+        manifest.json   dimension, dtype y tipo de indice
+        vectors.bin     filas de embeddings (append-only, np.memmap)
+        scales.bin      escala por fila (solo dtype='int8')
+        full.bin        vectores float32 para reordenar (solo dtype='int8',
+                        se leen del disco solo para los candidatos)
+        records.jsonl   una linea {id, text, metadata} por fila
+        deleted.json    filas eliminadas (hasta la siguiente compactacion)
+        hnsw.bin        indice HNSW (solo index_type='hnsw')
+    
+    Las distancias son L2 al cuadrado, igual que la coleccion de Chroma por
+    defecto, para que los scores del retriever no cambien de escala.
+    
+    Con dtype='int8' cada fila se cuantiza de forma simetrica (escala =
+    max|v| / 127): la matriz residente ocupa 1/4 de float32 y la busqueda
+    flat toma rescore_factor * k candidatos aproximados y los reordena con
+    distancias exactas. HNSW (hnswlib) guarda su propia copia float32, asi
+    que int8 solo reduce memoria con el indice flat.
+    """
+    
+    def __init__(
+        self,
+        directory: str,
+        embedding_function: Optional[Embeddings] = None,
+        collection_name: str = 'langchain',
+        index_type: str = 'flat',
+        dtype: str = 'float32',
+        hnsw_m: int = 16,
+        hnsw_ef_construction: int = 200,
+        hnsw_ef_search: int = 64,
+        rescore_factor: int = DEFAULT_RESCORE_FACTOR
+    ):
+        """
+        Inicializar (o cargar) una coleccion local
+        
+        Args:
+            directory: Directorio de la coleccion
+            embedding_function: Embeddings para consultas de texto
+            collection_name: Nombre de la coleccion
+            index_type: 'flat' (exacto, NumPy) o 'hnsw' (aproximado, hnswlib)
+            dtype: Almacenamiento de vectores: 'float32', 'float16' o 'int8'
+                (si la coleccion ya existe con otro dtype se convierte)
+            hnsw_m: Conexiones por nodo del grafo HNSW
+            hnsw_ef_construction: Amplitud de busqueda al construir HNSW
+            hnsw_ef_search: Amplitud de busqueda al consultar HNSW
+            rescore_factor: Candidatos por resultado a reordenar (solo int8)
+        """
+        if index_type not in INDEX_TYPES:
+            raise ValueError(f"Tipo de indice no soportado: {index_type} (opciones: {INDEX_TYPES})")
+        if dtype not in STORAGE_DTYPES:
+            raise ValueError(f"Tipo de almacenamiento no soportado: {dtype} (opciones: {STORAGE_DTYPES})")
+        
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._embedding_function = embedding_function
+        self.name = collection_name
+        self.metadata = {'hnsw:space': 'l2'}
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.rescore_factor = max(1, rescore_factor)
+        
+        if index_type == 'hnsw' and _load_hnswlib() is None:
+            logger.warning("hnswlib no esta instalado, usando indice 'flat' (pip install hnswlib)")
+            index_type = 'flat'
+        self.index_type = index_type
+        self.dtype = dtype
+        
+        # VectorManager usa vectorstore._collection (API de Chroma): aqui es el propio store
+        self._collection = self
+        # Las escrituras reemplazan vectores, normas, mascara, grafo y metadata
+        # en varios pasos: las busquedas tambien toman el lock para no mezclar
+        # arrays de generaciones distintas
+        self._lock = threading.RLock()
+        self._load()
+    
+    # ====================================
+    # Persistencia
+    # ====================================
+    
+    @property
+    def _manifest_path(self) -> Path:
+        return self.directory / 'manifest.json'
+    
+    def _load(self):
+        """Cargar manifest, registros, filas eliminadas, vectores e indice"""
+        self.dim: Optional[int] = None
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._full: Optional[np.ndarray] = None
+        self._sq_norms = np.zeros(0, dtype=np.float32)
+        self._hnsw = None
+        self._mask_cache: Dict[str, np.ndarray] = {}
+        
+        requested_dtype = self.dtype
+        if self._manifest_path.exists():
+            manifest = json.loads(self._manifest_path.read_text(encoding='utf-8'))
+            self.dim = manifest.get('dim')
+            self.dtype = manifest.get('dtype') or self.dtype
+        
+        records_path = self.directory / 'records.jsonl'
+        if records_path.exists():
+            with open(records_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._append_record(record['id'], record['text'], record['metadata'])
+        
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        deleted_path = self.directory / 'deleted.json'
+        if deleted_path.exists():
+            for row in json.loads(deleted_path.read_text(encoding='utf-8')):
+                self._alive[row] = False
+                self._row_of.pop(self._ids[row], None)
+        
+        self._map_vectors()
+        if requested_dtype != self.dtype:
+            if self._vectors is not None:
+                self._convert_storage(requested_dtype)
+            else:
+                self.dtype = requested_dtype
+                if self.dim:
+                    self._write_manifest()
+        self._load_index()
+        logger.info(f"Coleccion local '{self.name}' cargada: {self.count()} chunks ({self.index_type}, {self.dtype})")
+    
+    def _append_record(self, chunk_id: str, text: str, metadata: Dict[str, Any]):
+        self._row_of[chunk_id] = len(self._ids)
+        self._ids.append(chunk_id)
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+    
+    def _map_vectors(self, compute_norms: bool = True):
+        """Mapear vectors.bin en memoria (solo lectura) y calcular normas"""
+        vectors_path = self.directory / 'vectors.bin'
+        rows = len(self._ids)
+        if not rows or not self.dim or not vectors_path.exists():
+            self._vectors = None
+            self._scales = None
+            self._full = None
+            self._sq_norms = np.zeros(0, dtype=np.float32)
+            return
+        self._vectors = np.memmap(vectors_path, dtype=self.dtype, mode='r', shape=(rows, self.dim))
+        if self.dtype == 'int8':
+            self._scales = np.fromfile(self.directory / 'scales.bin', dtype=np.float32, count=rows)
+            self._full = np.memmap(self.directory / 'full.bin', dtype=np.float32, mode='r', shape=(rows, self.dim))
+        else:
+            self._scales = None
+            self._full = None
+        if compute_norms:
+            self._sq_norms = self._row_norms(self._vectors, self._scales)
+    
+    @staticmethod
+    def _row_norms(vectors: np.ndarray, scales: Optional[np.ndarray] = None) -> np.ndarray:
+        norms = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+            norms[start:start + len(block)] = np.einsum('ij,ij->i', block, block)
+        if scales is not None:
+            norms *= scales * scales
+        return norms
+    
+    def _full_rows(self, rows) -> np.ndarray:
+        """Vectores float32 de las filas indicadas (int8: desde full.bin)"""
+        source = self._full if self._full is not None else self._vectors
+        return np.asarray(source[rows], dtype=np.float32)
+    
+    def _storage_arrays(self, rows) -> Dict[str, np.ndarray]:
+        """Contenido de los archivos de vectores restringido a 'rows'"""
+        if self._vectors is None:
+            return {}
+        arrays = {'vectors.bin': np.asarray(self._vectors[rows], dtype=self.dtype)}
+        if self._scales is not None:
+            arrays['scales.bin'] = np.asarray(self._scales[rows], dtype=np.float32)
+            arrays['full.bin'] = np.asarray(self._full[rows], dtype=np.float32)
+        return arrays
+    
+    def _replace_storage(self, arrays: Dict[str, np.ndarray]):
+        """Reemplazar los archivos de vectores (los que no vienen se borran)"""
+        # Soltar los memmap antes de reemplazar archivos (Windows bloquea archivos mapeados)
+        self._vectors = None
+        self._scales = None
+        self._full = None
+        self._hnsw = None
+        for filename in ('vectors.bin', 'scales.bin', 'full.bin'):
+            path = self.directory / filename
+            if filename in arrays:
+                tmp = self.directory / f"{filename}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(arrays[filename].tobytes())
+                os.replace(tmp, path)
+            elif path.exists():
+                path.unlink()
+    
+    def _convert_storage(self, dtype: str):
+        """Reescribir los vectores en otro dtype partiendo de la mayor precision disponible"""
+        rows = len(self._ids)
+        logger.info(f"Coleccion '{self.name}': convirtiendo {rows} vectores de {self.dtype} a {dtype}")
+        parts: Dict[str, List[np.ndarray]] = {}
+        for start in range(0, rows, SEARCH_BLOCK_ROWS):
+            block = self._full_rows(slice(start, start + SEARCH_BLOCK_ROWS))
+            for filename, data in _encode_rows(block, dtype).items():
+                parts.setdefault(filename, []).append(data)
+        self._replace_storage({filename: np.concatenate(chunks) for filename, chunks in parts.items()})
+        self.dtype = dtype
+        self._write_manifest()
+        self._map_vectors()
+    
+    def _load_index(self):
+        """Cargar o construir el indice HNSW"""
+        if self.index_type != 'hnsw' or not self.dim:
+            return
+        hnswlib = _load_hnswlib()
+        index_path = self.directory / 'hnsw.bin'
+        index = hnswlib.Index(space='l2', dim=self.dim)
+        if index_path.exists():
+            index.load_index(str(index_path), max_elements=max(len(self._ids), 1), allow_replace_deleted=False)
+            if index.get_current_count() != len(self._ids):
+                logger.warning(f"Indice HNSW de '{self.name}' desactualizado, reconstruyendo")
+                index = None
+        else:
+            index = None
+        
+        if index is None:
+            index = hnswlib.Index(space='l2', dim=self.dim)
+            index.init_index(
+                max_elements=max(len(self._ids), 1024),
+                ef_construction=self.hnsw_ef_construction,
+                M=self.hnsw_m
+            )
+            if self._ids:
+                index.add_items(self._full_rows(slice(None)), np.arange(len(self._ids)))
+                for row in np.flatnonzero(~self._alive):
+                    index.mark_deleted(int(row))
+            index.save_index(str(index_path))
+        index.set_ef(self.hnsw_ef_search)
+        self._hnsw = index
+    
+    def _write_manifest(self):
+        manifest = {'dim': self.dim, 'dtype': self.dtype, 'index_type': self.index_type, 'name': self.name}
+        self._manifest_path.write_text(json.dumps(manifest), encoding='utf-8')
+    
+    def _write_deleted(self):
+        deleted = np.flatnonzero(~self._alive).tolist()
+        (self.directory / 'deleted.json').write_text(json.dumps(deleted), encoding='utf-8')
+    
+    def _rewrite_records(self):
+        tmp = self.directory / 'records.jsonl.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for chunk_id, text, metadata in zip(self._ids, self._texts, self._metadatas):
+                f.write(json.dumps({'id': chunk_id, 'text': text, 'metadata': metadata}, ensure_ascii=False) + '\n')
+        os.replace(tmp, self.directory / 'records.jsonl')
+    
+    def _save_index(self):
+        if self._hnsw is not None:
+            self._hnsw.save_index(str(self.directory / 'hnsw.bin'))
+    
+    # ====================================
+    # Escritura
+    # ====================================
+    
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Agregar chunks con embeddings ya calculados
+        
+        Args:
+            texts: Textos de los chunks
+            embeddings: Vectores (uno por texto)
+            metadatas: Metadata de cada chunk
+            ids: Ids (None = uuid4)
+        
+        Returns:
+            Ids agregados
+        """
+        if not texts:
+            return []
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self._write_manifest()
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimension {vectors.shape[1]} distinta a la de la coleccion ({self.dim})")
+            
+            # Reemplazar ids existentes (igual que upsert)
+            replaced = [chunk_id for chunk_id in ids if chunk_id in self._row_of]
+            if replaced:
+                self.delete(replaced)
+            
+            first_row = len(self._ids)
+            encoded = _encode_rows(vectors, self.dtype)
+            for filename, data in encoded.items():
+                with open(self.directory / filename, 'ab') as f:
+                    f.write(data.tobytes())
+            with open(self.directory / 'records.jsonl', 'a', encoding='utf-8') as f:
+                for chunk_id, text, metadata in zip(ids, texts, metadatas):
+                    metadata = dict(metadata or {})
+                    f.write(json.dumps({'id': chunk_id, 'text': text, 'metadata': metadata}, ensure_ascii=False) + '\n')
+                    self._append_record(chunk_id, text, metadata)
+            
+            self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+            sq_norms = np.concatenate([self._sq_norms, self._row_norms(encoded['vectors.bin'], encoded.get('scales.bin'))])
+            self._map_vectors(compute_norms=False)
+            self._sq_norms = sq_norms
+            
+            if self.index_type == 'hnsw':
+                if self._hnsw is None:
+                    self._load_index()
+                else:
+                    needed = len(self._ids)
+                    if needed > self._hnsw.get_max_elements():
+                        self._hnsw.resize_index(max(needed, self._hnsw.get_max_elements() * 2))
+                    self._hnsw.add_items(vectors, np.arange(first_row, first_row + len(ids)))
+                    self._save_index()
+            
+            self._mask_cache.clear()
+        return list(ids)
+    
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """Agregar textos calculando sus embeddings (interfaz VectorStore)"""
+        texts = list(texts)
+        if self._embedding_function is None:
+            raise ValueError("LocalVectorStore sin embedding_function: usar add_embeddings")
+        embeddings = self._embedding_function.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas, ids)
+    
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None, **kwargs: Any) -> int:
+        """
+        Eliminar chunks por id o por filtro 'where'
+        
+        Returns:
+            Numero de chunks eliminados
+        """
+        with self._lock:
+            rows = [self._row_of[chunk_id] for chunk_id in (ids or []) if chunk_id in self._row_of]
+            if where:
+                rows.extend(np.flatnonzero(self._where_mask(where)).tolist())
+            rows = sorted(set(rows))
+            if not rows:
+                return 0
+            
+            for row in rows:
+                self._alive[row] = False
+                self._row_of.pop(self._ids[row], None)
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(row)
+            self._mask_cache.clear()
+            
+            if (~self._alive).sum() > COMPACT_RATIO * len(self._alive):
+                self._compact()
+            else:
+                self._write_deleted()
+                self._save_index()
+        return len(rows)
+    
+    def delete_where(self, where: Dict[str, Any]) -> int:
+        """Eliminar todos los chunks que cumplen el filtro (ej: {'source': ruta})"""
+        return self.delete(where=where)
+    
+    def update(self, ids: List[str], metadatas: Optional[List[Dict[str, Any]]] = None, **kwargs: Any):
+        """Reemplazar la metadata de chunks existentes (API de coleccion de Chroma)"""
+        if not metadatas:
+            return
+        with self._lock:
+            for chunk_id, metadata in zip(ids, metadatas):
+                row = self._row_of.get(chunk_id)
+                if row is not None:
+                    self._metadatas[row] = dict(metadata)
+            self._rewrite_records()
+            self._mask_cache.clear()
+    
+    def _compact(self):
+        """Reescribir archivos sin las filas eliminadas y reconstruir el indice"""
+        keep = np.flatnonzero(self._alive)
+        arrays = self._storage_arrays(keep)
+        ids = [self._ids[row] for row in keep]
+        texts = [self._texts[row] for row in keep]
+        metadatas = [self._metadatas[row] for row in keep]
+        
+        self._replace_storage(arrays)
+        
+        self._ids, self._texts, self._metadatas, self._row_of = [], [], [], {}
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            self._append_record(chunk_id, text, metadata)
+        self._rewrite_records()
+        self._alive = np.ones(len(self._ids), dtype=bool)
+        self._write_deleted()
+        
+        index_path = self.directory / 'hnsw.bin'
+        if index_path.exists():
+            index_path.unlink()
+        self._map_vectors()
+        self._load_index()
+        logger.info(f"Coleccion local '{self.name}' compactada: {len(self._ids)} chunks")
+    
+    def clear(self) -> int:
+        """Eliminar todos los chunks (borra los archivos de la coleccion)"""
+        with self._lock:
+            count = self.count()
+            self._vectors = None
+            self._full = None
+            self._hnsw = None
+            for child in self.directory.iterdir():
+                if child.is_file():
+                    child.unlink()
+            self._load()
+        return count
+    
+    def drop(self):
+        """Eliminar la coleccion completa (directorio incluido)"""
+        with self._lock:
+            self._vectors = None
+            self._full = None
+            self._hnsw = None
+            shutil.rmtree(self.directory, ignore_errors=True)
+    
+    # ====================================
+    # API de coleccion (subconjunto de Chroma)
+    # ====================================
+    
+    def count(self) -> int:
+        """Chunks vivos en la coleccion"""
+        return len(self._row_of)
+    
+    def storage_stats(self) -> Dict[str, Any]:
+        """
+        Tamano de la coleccion
+        
+        Returns:
+            Dict con chunks, dim, dtype, index_type, memory_bytes (matriz que
+            recorre la busqueda + normas y escalas + grafo HNSW estimado) y
+            disk_bytes
+        """
+        memory = 0
+        with self._lock:
+            if self._vectors is not None:
+                memory = self._vectors.nbytes + self._sq_norms.nbytes
+                if self._scales is not None:
+                    memory += self._scales.nbytes
+                if self._hnsw is not None:
+                    # hnswlib guarda los vectores en float32 mas 2*M enlaces por nodo
+                    memory += len(self._ids) * (self.dim * 4 + self.hnsw_m * 2 * 4)
+        disk = sum(f.stat().st_size for f in self.directory.iterdir() if f.is_file()) if self.directory.exists() else 0
+        return {
+            'name': self.name,
+            'chunks': self.count(),
+            'dim': self.dim,
+            'dtype': self.dtype,
+            'index_type': self.index_type,
+            'memory_bytes': int(memory),
+            'disk_bytes': int(disk)
+        }
+    
+    def _where_mask(self, where: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Mascara de filas vivas que cumplen el filtro (cacheada hasta la siguiente escritura)"""
+        if not where:
+            return self._alive
+        key = json.dumps(where, sort_keys=True, default=str)
+        mask = self._mask_cache.get(key)
+        if mask is None:
+            mask = np.fromiter(
+                (matches_where(metadata, where) for metadata in self._metadatas),
+                dtype=bool,
+                count=len(self._metadatas)
+            ) & self._alive
+            if len(self._mask_cache) > 64:
+                self._mask_cache.clear()
+            self._mask_cache[key] = mask
+        return mask
+    
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> Dict[str, Any]:
+        """Leer chunks por id o filtro (formato de Collection.get de Chroma)"""
+        include = ['metadatas', 'documents'] if include is None else include
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[chunk_id] for chunk_id in ids if chunk_id in self._row_of]
+                rows = [row for row in rows if matches_where(self._metadatas[row], where)]
+            else:
+                rows = np.flatnonzero(self._where_mask(where)).tolist()
+            rows = rows[offset:offset + limit] if limit is not None else rows[offset:]
+            
+            result: Dict[str, Any] = {'ids': [self._ids[row] for row in rows]}
+            if 'metadatas' in include:
+                result['metadatas'] = [dict(self._metadatas[row]) for row in rows]
+            if 'documents' in include:
+                result['documents'] = [self._texts[row] for row in rows]
+            if 'embeddings' in include:
+                result['embeddings'] = self._full_rows(rows) if rows else []
+        return result
+    
+    # ====================================
+    # Busqueda
+    # ====================================
+    
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding_function
+    
+    def _distances(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """L2 al cuadrado de la query contra todas las filas (o contra 'rows')"""
+        vectors = self._vectors if rows is None else self._vectors[rows]
+        norms = self._sq_norms if rows is None else self._sq_norms[rows]
+        if vectors.dtype == np.float32:
+            dots = vectors @ query
+        else:
+            dots = np.empty(len(vectors), dtype=np.float32)
+            for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+                block = np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS], dtype=np.float32)
+                dots[start:start + len(block)] = block @ query
+            if self._scales is not None:
+                dots *= self._scales if rows is None else self._scales[rows]
+        return norms - 2 * dots + float(query @ query)
+    
+    def search_rows(
+        self,
+        embedding: List[float],
+        k: int,
+        where: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Filas mas cercanas a un embedding
+        
+        Args:
+            embedding: Vector de la consulta
+            k: Numero de resultados
+            where: Filtro de metadata (se aplica antes del top-k)
+        
+        Returns:
+            Lista de (fila, distancia L2^2) ordenada por distancia
+        """
+        with self._lock:
+            if self._vectors is None or not self.count() or k <= 0:
+                return []
+            query = np.asarray(embedding, dtype=np.float32)
+            mask = self._where_mask(where)
+            candidates = int(mask.sum())
+            if not candidates:
+                return []
+            k = min(k, candidates)
+            
+            # HNSW salvo filtros muy selectivos: ahi la busqueda exacta sobre
+            # pocas filas es mas rapida y el grafo podria no llegar a k resultados
+            if self._hnsw is not None and (not where or candidates * 10 > len(mask)):
+                try:
+                    labels, distances = self._hnsw.knn_query(
+                        query,
+                        k=k,
+                        filter=(lambda label: bool(mask[label])) if where else None
+                    )
+                    return [(int(row), float(distance)) for row, distance in zip(labels[0], distances[0])]
+                except RuntimeError as e:
+                    logger.debug(f"HNSW no devolvio {k} resultados ({e}), usando busqueda exacta")
+            
+            if candidates < len(mask):
+                rows = np.flatnonzero(mask)
+                distances = self._distances(query, rows)
+            else:
+                rows = None
+                distances = self._distances(query)
+            
+            # int8: distancias aproximadas para preseleccionar, exactas para ordenar
+            fetch = k if self._full is None else min(len(distances), k * self.rescore_factor)
+            top = np.argpartition(distances, fetch - 1)[:fetch] if fetch < len(distances) else np.arange(len(distances))
+            top_rows = rows[top] if rows is not None else top
+            top_distances = distances[top]
+            if self._full is not None:
+                diff = self._full_rows(top_rows) - query
+                top_distances = np.einsum('ij,ij->i', diff, diff)
+            order = np.argsort(top_distances)[:k]
+            return [(int(top_rows[i]), float(top_distances[i])) for i in order]
+    
+    def _document(self, row: int) -> Document:
+        return Document(page_content=self._texts[row], metadata=dict(self._metadatas[row]))
+    
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Documentos y distancias (mismo nombre y semantica que en Chroma)"""
+        with self._lock:
+            return [(self._document(row), distance) for row, distance in self.search_rows(embedding, k, filter)]
+    
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+    
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)
+    
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+    
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        """MMR sobre los fetch_k candidatos mas cercanos"""
+        with self._lock:
+            candidates = self.search_rows(embedding, fetch_k, filter)
+            if not candidates:
+                return []
+            rows = [row for row, _ in candidates]
+            vectors = self._full_rows(rows)
+            documents = [self._document(row) for row in rows]
+        selected = maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32),
+            vectors,
+            k=min(k, len(rows)),
+            lambda_mult=lambda_mult
+        )
+        return [documents[i] for i in selected]
+    
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        embedding = self._embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult, filter)
+    
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return self._euclidean_relevance_score_fn
+    
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        directory: Optional[str] = None,
+        **kwargs: Any
+    ) -> 'LocalVectorStore':
+        """Crear una coleccion local a partir de textos"""
+        if directory is None:
+            raise ValueError("LocalVectorStore.from_texts requiere 'directory'")
+        store = cls(directory=directory, embedding_function=embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
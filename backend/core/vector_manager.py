@@ -6,31 +6,142 @@ VERSION OPTIMIZADA: DuckDB+Parquet, chunking adaptativo, cache LRU
 
 import asyncio
 import os
+import threading
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Set
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor
 
-from langchain_ollama import OllamaEmbeddings
 from langchain_community.vectorstores import Chroma
+from langchain_core.vectorstores import VectorStore
 from langchain_community.vectorstores.utils import filter_complex_metadata
 from langchain_core.documents import Document
 
 from utils.logger import get_logger
-from utils.paths import get_data_path, get_chroma_path
+from utils import metrics
+from utils.paths import get_data_path, get_chroma_path, normalize_path_key
 from document_loader import DocumentLoader, DocumentMetadata
-from embedding_manager import get_embedding_manager
+from embedding_manager import get_embedding_manager, PooledOllamaEmbeddings
 from chunking_manager import get_chunking_manager
 from db_manager import (
     insert_document_meta,
     get_all_document_hashes,
     delete_document_meta,
     update_document_status,
-    get_document_stats
+    get_document_stats,
+    get_document_paths,
+    get_user_setting,
+    set_user_setting
 )
 
 logger = get_logger("vector_manager")
 
+# Version de la metadata de rutas en los chunks (1: path_id, dir_prefix; 2: file_extension)
+PATH_METADATA_VERSION = 2
+PATH_METADATA_SETTING = 'chroma_path_metadata_version'
+
+# Tamano de lote para get/update/delete sobre la coleccion (limita memoria)
+CHROMA_BATCH_SIZE = int(os.getenv('ALFRED_CHROMA_BATCH_SIZE', '5000'))
+
+# Distribucion de los chunks: 'single' (todo en la coleccion 'langchain') o
+# 'per_path' (una coleccion por ruta de document_paths: deshabilitar o
+# reindexar una ruta elimina su coleccion y las consultas omiten rutas
+# deshabilitadas). Los chunks sin ruta siguen en 'langchain' en ambos modos
+CHROMA_LAYOUT = os.getenv('ALFRED_CHROMA_LAYOUT', 'single').lower()
+DEFAULT_COLLECTION = 'langchain'
+PATH_COLLECTION_PREFIX = 'alfred_path_'
+
+# Backend de vectores: 'chroma' o 'local' (vector_index: matriz de embeddings
+# mapeada en memoria con indice 'flat' o 'hnsw', en vector_index/ junto a chroma_db)
+VECTOR_BACKEND = os.getenv('ALFRED_VECTOR_BACKEND', 'chroma').lower()
+LOCAL_INDEX_TYPE = os.getenv('ALFRED_VECTOR_INDEX', 'flat').lower()
+LOCAL_INDEX_DTYPE = os.getenv('ALFRED_VECTOR_DTYPE', 'float32').lower()
+# dtype por coleccion, ej: "langchain=int8,alfred_path_3=float16" (el resto usa
+# ALFRED_VECTOR_DTYPE). Cambiarlo convierte la coleccion al abrirla, sin reindexar
+LOCAL_COLLECTION_DTYPES = os.getenv('ALFRED_VECTOR_COLLECTION_DTYPES', '')
+# int8: candidatos por resultado que se reordenan con los vectores float32
+LOCAL_RESCORE_FACTOR = int(os.getenv('ALFRED_VECTOR_RESCORE_FACTOR', '4'))
+
+
+
+def parse_collection_dtypes(raw: str) -> Dict[str, str]:
+    """
+    Leer la configuracion de dtype por coleccion
+    
+    Args:
+        raw: Pares "coleccion=dtype" separados por comas
+        
+    Returns:
+        Dict {coleccion: dtype}
+    """
+    overrides = {}
+    for item in raw.split(','):
+        if not item.strip():
+            continue
+        name, sep, dtype = item.partition('=')
+        if not sep or not name.strip() or not dtype.strip():
+            logger.warning(f"ALFRED_VECTOR_COLLECTION_DTYPES: entrada invalida '{item.strip()}' (se ignora)")
+            continue
+        overrides[name.strip()] = dtype.strip().lower()
+    return overrides
+
+
+# Indice BM25 (keyword_index.db junto a chroma_db) que se mantiene al indexar
+# y borrar chunks; lo usa HybridRetriever para la busqueda por keywords.
+# Version 2: incluye el indice cifrado de identificadores (RFC/CURP/NSS)
+# Version 3: texto de los chunks cifrado e indice FTS5 sin contenido
+KEYWORD_INDEX_ENABLED = os.getenv('ALFRED_KEYWORD_INDEX', 'true').lower() == 'true'
+KEYWORD_INDEX_VERSION = 3
+KEYWORD_INDEX_SETTING = 'keyword_index_version'
+
+CHROMA_CLIENTS_CREATED = metrics.counter(
+    'alfred_chroma_clients_created_total', 'Clientes PersistentClient de ChromaDB creados en el proceso'
+)
+
+
+# ====================================
+# Cliente de ChromaDB compartido
+# ====================================
+
+# Un solo PersistentClient por directorio en todo el proceso: abrir uno nuevo
+# recarga SQLite y los segmentos del indice. Las escrituras (agregar, borrar,
+# migrar, recrear coleccion) se serializan con CHROMA_WRITE_LOCK
+_client_lock = threading.Lock()
+_clients: Dict[str, any] = {}
+CHROMA_WRITE_LOCK = threading.RLock()
+
+
+def get_chroma_client(chroma_db_path: str):
+    """
+    Obtener el cliente de ChromaDB del proceso para un directorio
+    
+    Args:
+        chroma_db_path: Directorio de persistencia
+        
+    Returns:
+        chromadb.PersistentClient compartido
+    """
+    key = normalize_path_key(chroma_db_path)
+    with _client_lock:
+        client = _clients.get(key)
+        if client is None:
+            import chromadb
+            
+            client = chromadb.PersistentClient(
+                path=str(chroma_db_path),
+                settings=chromadb.Settings(anonymized_telemetry=False, allow_reset=True)
+            )
+            _clients[key] = client
+            CHROMA_CLIENTS_CREATED.inc()
+            logger.info(f"Cliente de ChromaDB creado: {chroma_db_path}")
+        return client
+
+
+def get_chroma_client_stats() -> Dict[str, any]:
+    """Clientes de ChromaDB abiertos (debe ser 1 por directorio)"""
+    with _client_lock:
+        return {'clients': len(_clients), 'paths': sorted(_clients)}
+
 
 class VectorManager:
     """
@@ -74,6 +185,18 @@ class VectorManager:
         self._vectorstore = None
         self._document_loader = None
         
+        # Colecciones por ruta (ALFRED_CHROMA_LAYOUT=per_path): {path_id: Chroma}
+        self.per_path_collections = CHROMA_LAYOUT == 'per_path'
+        self._path_stores: Dict[int, VectorStore] = {}
+        
+        # Backend de vectores (ALFRED_VECTOR_BACKEND)
+        self.backend = VECTOR_BACKEND
+        self.local_index_path = Path(self.chroma_db_path).parent / 'vector_index'
+        self.collection_dtypes = parse_collection_dtypes(LOCAL_COLLECTION_DTYPES)
+        
+        # Indice BM25 (lazy, ALFRED_KEYWORD_INDEX)
+        self._keyword_index = None
+        
         # Configuracion de ChromaDB
         self.use_optimized_storage = use_optimized_storage
         self._chroma_settings = None
@@ -116,7 +239,7 @@ class VectorManager:
         return self._chroma_settings
     
     @property
-    def embeddings(self) -> OllamaEmbeddings:
+    def embeddings(self) -> PooledOllamaEmbeddings:
         """Lazy loading de embeddings con seleccion automatica"""
         if self._embeddings is None:
             logger.info("Inicializando embeddings optimizados...")
@@ -135,6 +258,14 @@ class VectorManager:
         """Obtener chunking manager"""
         return self._chunking_manager
     
+    @property
+    def keyword_index(self):
+        """Indice BM25 de los chunks (None si ALFRED_KEYWORD_INDEX=false)"""
+        if self._keyword_index is None and KEYWORD_INDEX_ENABLED:
+            from keyword_index import KeywordIndex
+            self._keyword_index = KeywordIndex(str(Path(self.chroma_db_path).parent / 'keyword_index.db'))
+        return self._keyword_index
+    
     @property
     def document_loader(self) -> DocumentLoader:
         """Lazy loading de document loader"""
@@ -142,7 +273,7 @@ class VectorManager:
             self._document_loader = DocumentLoader()
         return self._document_loader
     
-    def initialize_vectorstore(self, force_reload: bool = False) -> Chroma:
+    def initialize_vectorstore(self, force_reload: bool = False) -> VectorStore:
         """
         Inicializar o cargar vectorstore existente con configuracion optimizada
         
@@ -150,7 +281,7 @@ class VectorManager:
             force_reload: Forzar recarga completa
             
         Returns:
-            Instancia de Chroma vectorstore
+            Instancia del vectorstore (Chroma o LocalVectorStore segun ALFRED_VECTOR_BACKEND)
         """
         try:
             if self._vectorstore is not None and not force_reload:
@@ -173,21 +304,13 @@ class VectorManager:
                 print("[DEBUG] Creando nuevo vectorstore")
             
             # Siempre crear/cargar el vectorstore (excepto si force_reload y no hay docs)
-            print(f"[DEBUG] Creando Chroma con persist_directory={self.chroma_db_path}")
-            kwargs = {
-                'persist_directory': self.chroma_db_path,
-                'embedding_function': self.embeddings,
-                'collection_name': 'langchain'  # Usar el nombre correcto de la coleccion
-                # NO pasamos client_settings - puede causar conflicto con persist_directory
-            }
-            
-            print(f"[DEBUG] Chroma kwargs: {list(kwargs.keys())}")
+            print(f"[DEBUG] Creando vectorstore ({self.backend}) en {self.chroma_db_path}")
             
             try:
-                self._vectorstore = Chroma(**kwargs)
-                print(f"[DEBUG] Chroma creado exitosamente: {type(self._vectorstore)}")
+                self._vectorstore = self._open_store(DEFAULT_COLLECTION)
+                print(f"[DEBUG] Vectorstore creado exitosamente: {type(self._vectorstore)}")
             except Exception as e:
-                print(f"[DEBUG ERROR] Error creando Chroma: {e}")
+                print(f"[DEBUG ERROR] Error creando vectorstore: {e}")
                 import traceback
                 traceback.print_exc()
                 raise
@@ -210,6 +333,9 @@ class VectorManager:
                 traceback.print_exc()
                 raise
             
+            if self.per_path_collections:
+                self._load_path_stores()
+            
             print(f"[DEBUG] Retornando vectorstore: {self._vectorstore}")
             return self._vectorstore
             
@@ -220,6 +346,66 @@ class VectorManager:
             traceback.print_exc()
             return None
     
+    def _open_store(self, collection_name: str) -> VectorStore:
+        """
+        Abrir (o crear) una coleccion en el backend configurado
+        
+        Args:
+            collection_name: Nombre de la coleccion
+            
+        Returns:
+            Chroma sobre el cliente compartido o LocalVectorStore
+        """
+        if self.backend == 'local':
+            from vector_index import LocalVectorStore
+            
+            return LocalVectorStore(
+                directory=str(self.local_index_path / collection_name),
+                embedding_function=self.embeddings,
+                collection_name=collection_name,
+                index_type=LOCAL_INDEX_TYPE,
+                dtype=self.collection_dtype(collection_name),
+                rescore_factor=LOCAL_RESCORE_FACTOR
+            )
+        
+        return Chroma(
+            client=get_chroma_client(self.chroma_db_path),
+            embedding_function=self.embeddings,
+            collection_name=collection_name
+        )
+    
+    def collection_dtype(self, collection_name: str) -> str:
+        """Almacenamiento de vectores de una coleccion local (ALFRED_VECTOR_COLLECTION_DTYPES o ALFRED_VECTOR_DTYPE)"""
+        return self.collection_dtypes.get(collection_name, LOCAL_INDEX_DTYPE)
+    
+    def _list_store_names(self) -> List[str]:
+        """Nombres de las colecciones existentes en el backend configurado"""
+        if self.backend == 'local':
+            if not self.local_index_path.exists():
+                return []
+            return [child.name for child in self.local_index_path.iterdir() if child.is_dir()]
+        
+        # chromadb < 0.6 devuelve objetos Collection, >= 0.6 solo nombres
+        return [getattr(collection, 'name', collection) for collection in get_chroma_client(self.chroma_db_path).list_collections()]
+    
+    def _drop_store(self, collection_name: str) -> int:
+        """
+        Eliminar una coleccion completa del backend configurado
+        
+        Returns:
+            Numero de chunks que tenia
+        """
+        if self.backend == 'local':
+            store = self._open_store(collection_name)
+            count = store.count()
+            store.drop()
+            return count
+        
+        client = get_chroma_client(self.chroma_db_path)
+        count = client.get_collection(collection_name).count()
+        client.delete_collection(collection_name)
+        return count
+    
     def split_documents(self, docs: List[Document]) -> List[Document]:
         """
         Dividir documentos en chunks usando chunking adaptativo
@@ -281,29 +467,17 @@ class VectorManager:
         
         # Dividir en chunks
         splits = self.split_documents(docs)
+        self.tag_chunks(splits, docs_path, self._lookup_path_id(docs_path))
         
         # Indexar en ChromaDB
         logger.info("Creando/actualizando vectorstore con nuevos documentos...")
         
-        if self._vectorstore is None:
-            # Crear nuevo vectorstore
-            self._vectorstore = await asyncio.get_event_loop().run_in_executor(
-                self._executor,
-                lambda: Chroma.from_documents(
-                    documents=splits,
-                    embedding=self.embeddings,
-                    persist_directory=self.chroma_db_path,
-                    collection_name='langchain'  # AGREGADO: Usar nombre consistente
-                )
-            )
-            logger.info("Vectorstore creado exitosamente")
-        else:
-            # Agregar a vectorstore existente
-            await asyncio.get_event_loop().run_in_executor(
-                self._executor,
-                lambda: self._vectorstore.add_documents(splits)
-            )
-            logger.info("Documentos agregados al vectorstore existente")
+        # add_documents crea el vectorstore si no existe y reparte por coleccion
+        await asyncio.get_event_loop().run_in_executor(
+            self._executor,
+            lambda: self.add_documents(splits)
+        )
+        logger.info("Documentos agregados al vectorstore")
         
         # Actualizar metadata en SQLite
         logger.info("Actualizando metadata en base de datos...")
@@ -354,6 +528,70 @@ class VectorManager:
             counts[file_path] = counts.get(file_path, 0) + 1
         return counts
     
+    @staticmethod
+    def tag_chunks(chunks: List[Document], root_path, path_id: Optional[int] = None) -> List[Document]:
+        """
+        Agregar metadata de ruta a los chunks antes de indexarlos
+        
+        'dir_prefix' es la ruta raiz normalizada y 'path_id' el id de la ruta
+        configurada (document_paths). Permiten borrar una carpeta con un
+        filtro 'where' de Chroma en lugar de recorrer toda la coleccion.
+        
+        Args:
+            chunks: Chunks a etiquetar (se modifican in-place)
+            root_path: Directorio raiz del que provienen
+            path_id: Id de la ruta en document_paths (None = desconocido)
+            
+        Returns:
+            Los mismos chunks
+        """
+        dir_prefix = normalize_path_key(root_path)
+        for chunk in chunks:
+            chunk.metadata['dir_prefix'] = dir_prefix
+            if path_id is not None:
+                chunk.metadata['path_id'] = int(path_id)
+        return chunks
+    
+    @staticmethod
+    def _lookup_path_id(root_path) -> Optional[int]:
+        """Id de la ruta configurada que coincide con root_path (o None)"""
+        key = normalize_path_key(root_path)
+        for path_data in get_document_paths(enabled_only=False):
+            if normalize_path_key(path_data['path']) == key:
+                return path_data['id']
+        return None
+    
+    def add_documents(self, chunks: List[Document]) -> List[str]:
+        """
+        Agregar chunks al vectorstore compartido (SINCRONO, serializado)
+        
+        Args:
+            chunks: Chunks ya etiquetados con tag_chunks
+            
+        Returns:
+            Ids asignados en ChromaDB
+        """
+        vectorstore = self._vectorstore if self._vectorstore is not None else self.initialize_vectorstore()
+        if vectorstore is None:
+            raise RuntimeError("No se pudo inicializar vectorstore")
+        
+        with CHROMA_WRITE_LOCK:
+            if not self.per_path_collections:
+                ids = vectorstore.add_documents(chunks)
+            else:
+                groups: Dict[Optional[int], List[Document]] = {}
+                for chunk in chunks:
+                    groups.setdefault(chunk.metadata.get('path_id'), []).append(chunk)
+                
+                ids = []
+                for path_id, group in groups.items():
+                    store = vectorstore if path_id is None else self.get_path_store(path_id)
+                    ids.extend(store.add_documents(group))
+            
+            if self.keyword_index is not None:
+                self.keyword_index.add_documents(chunks)
+            return ids
+    
     async def delete_documents(self, file_paths: List[str]) -> int:
         """
         Eliminar documentos del vectorstore y metadata
@@ -364,80 +602,372 @@ class VectorManager:
         Returns:
             Numero de documentos eliminados
         """
-        if not self._vectorstore:
+        if self._vectorstore is None:
             logger.warning("Vectorstore no inicializado")
             return 0
         
         deleted = 0
+        stores = [self._vectorstore] + list(self._path_stores.values())
         
         for file_path in file_paths:
             try:
-                # Eliminar de ChromaDB (buscar por metadata.source)
-                # Nota: ChromaDB no tiene API directa para delete by metadata
-                # Alternativa: marcar como eliminado en SQLite
+                # Eliminar chunks por metadata.source y marcar en SQLite
+                with CHROMA_WRITE_LOCK:
+                    chunks = sum(self._delete_where(store._collection, {'source': file_path}) for store in stores)
+                    if self.keyword_index is not None:
+                        self.keyword_index.delete_source(file_path)
                 update_document_status(file_path, "deleted")
                 deleted += 1
-                logger.info(f"Documento marcado como eliminado: {file_path}")
+                logger.info(f"Documento eliminado: {file_path} ({chunks} chunks)")
             
             except Exception as e:
                 logger.error(f"Error eliminando {file_path}: {e}")
         
         return deleted
     
-    def delete_documents_by_path_sync(self, directory_path: str) -> int:
+    def delete_documents_by_path_sync(self, directory_path: str, path_id: Optional[int] = None) -> int:
         """
         Eliminar todos los documentos de un directorio especifico (SINCRONO)
         
+        Filtra por metadata ('path_id' si se conoce, si no 'dir_prefix') en
+        lotes, sin leer la coleccion completa.
+        
         Args:
             directory_path: Ruta del directorio cuyos documentos se deben eliminar
+            path_id: Id de la ruta en document_paths (preferido: no cambia si la ruta se edita)
             
         Returns:
             Numero de chunks eliminados
         """
-        if not self._vectorstore:
+        if self._vectorstore is None:
             logger.warning("Vectorstore no inicializado, inicializando...")
             self.initialize_vectorstore()
         
-        if not self._vectorstore:
+        if self._vectorstore is None:
             logger.error("No se pudo inicializar vectorstore")
             return 0
         
         try:
-            # Normalizar ruta para comparacion
-            directory_path = str(Path(directory_path).resolve())
-            logger.info(f"Eliminando documentos de: {directory_path}")
+            # Los chunks anteriores a la metadata de rutas se migran una sola vez
+            self.migrate_path_metadata()
             
-            # Obtener todos los documentos de ChromaDB
-            collection = self._vectorstore._collection
-            all_data = collection.get(include=['metadatas'])
+            dir_prefix = normalize_path_key(directory_path)
+            logger.info(f"Eliminando documentos de: {dir_prefix} (path_id={path_id})")
             
-            if not all_data or not all_data.get('ids'):
-                logger.warning("No hay documentos en ChromaDB")
-                return 0
+            with CHROMA_WRITE_LOCK:
+                collection = self._vectorstore._collection
+                deleted = 0
+                if path_id is not None:
+                    # Coleccion propia de la ruta (per_path): se elimina completa
+                    deleted += self.drop_path_collection(path_id)
+                    deleted += self._delete_where(collection, {'path_id': int(path_id)})
+                deleted += self._delete_where(collection, {'dir_prefix': dir_prefix})
+                if self.keyword_index is not None:
+                    self.keyword_index.delete_path(path_id, dir_prefix)
             
-            # Filtrar IDs de documentos que pertenecen al directorio
-            ids_to_delete = []
-            for i, metadata in enumerate(all_data.get('metadatas', [])):
-                source = metadata.get('source', '')
-                if source:
-                    source_path = str(Path(source).resolve())
-                    # Verificar si el archivo esta dentro del directorio
-                    if source_path.startswith(directory_path):
-                        ids_to_delete.append(all_data['ids'][i])
-            
-            if ids_to_delete:
-                logger.info(f"Eliminando {len(ids_to_delete)} chunks de ChromaDB")
-                collection.delete(ids=ids_to_delete)
-                logger.info(f"Eliminados exitosamente {len(ids_to_delete)} chunks")
-                return len(ids_to_delete)
+            if deleted:
+                logger.info(f"Eliminados exitosamente {deleted} chunks")
             else:
-                logger.info(f"No se encontraron documentos de {directory_path} en ChromaDB")
-                return 0
+                logger.info(f"No se encontraron documentos de {dir_prefix} en ChromaDB")
+            return deleted
         
         except Exception as e:
             logger.error(f"Error eliminando documentos de {directory_path}: {e}", exc_info=True)
             return 0
     
+    @staticmethod
+    def _delete_where(collection, where: Dict[str, any], batch_size: int = CHROMA_BATCH_SIZE) -> int:
+        """
+        Eliminar por filtro 'where' en lotes (solo ids, sin documentos ni embeddings)
+        
+        Returns:
+            Numero de chunks eliminados
+        """
+        deleted = 0
+        while True:
+            batch = collection.get(where=where, limit=batch_size, include=[])
+            ids = batch.get('ids') or []
+            if not ids:
+                return deleted
+            collection.delete(ids=ids)
+            deleted += len(ids)
+    
+    def migrate_path_metadata(self, batch_size: int = CHROMA_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Migracion unica: agregar 'dir_prefix'/'path_id' y 'file_extension' a
+        chunks indexados antes de que existiera esa metadata
+        
+        Asigna cada chunk a la ruta configurada mas especifica que contiene su
+        'source'. Los chunks que no pertenecen a ninguna ruta reciben como
+        'dir_prefix' su propio directorio. Se registra en user_settings para
+        no repetirse.
+        
+        Returns:
+            Dict con scanned, updated (vacio si ya estaba migrado)
+        """
+        if get_user_setting(PATH_METADATA_SETTING, default=0, setting_type='int') >= PATH_METADATA_VERSION:
+            return {}
+        if self._vectorstore is None:
+            return {}
+        
+        with CHROMA_WRITE_LOCK:
+            # Otro hilo pudo completar la migracion mientras se esperaba el lock
+            if get_user_setting(PATH_METADATA_SETTING, default=0, setting_type='int') >= PATH_METADATA_VERSION:
+                return {}
+            
+            roots = sorted(
+                ((normalize_path_key(p['path']), p['id']) for p in get_document_paths(enabled_only=False)),
+                key=lambda root: len(root[0]),
+                reverse=True
+            )
+            
+            scanned = 0
+            updated = 0
+            collections = [self._vectorstore._collection]
+            collections.extend(store._collection for store in list(self._path_stores.values()))
+            for collection in collections:
+                offset = 0
+                while True:
+                    batch = collection.get(include=['metadatas'], limit=batch_size, offset=offset)
+                    ids = batch.get('ids') or []
+                    if not ids:
+                        break
+                    offset += len(ids)
+                    scanned += len(ids)
+                    
+                    update_ids = []
+                    update_metadatas = []
+                    for chunk_id, metadata in zip(ids, batch.get('metadatas') or []):
+                        metadata = dict(metadata or {})
+                        if not metadata.get('source') or ('dir_prefix' in metadata and 'file_extension' in metadata):
+                            continue
+                        if 'dir_prefix' not in metadata:
+                            source = normalize_path_key(metadata['source'])
+                            root = next((r for r in roots if source == r[0] or source.startswith(r[0].rstrip('/') + '/')), None)
+                            if root:
+                                metadata['dir_prefix'], metadata['path_id'] = root
+                            else:
+                                metadata['dir_prefix'] = source.rsplit('/', 1)[0] or '/'
+                        metadata.setdefault('file_extension', Path(metadata['source']).suffix.lower())
+                        update_ids.append(chunk_id)
+                        update_metadatas.append(metadata)
+                    
+                    if update_ids:
+                        collection.update(ids=update_ids, metadatas=update_metadatas)
+                        updated += len(update_ids)
+            
+            set_user_setting(PATH_METADATA_SETTING, PATH_METADATA_VERSION, 'int')
+        logger.info(f"Migracion de metadata de rutas: {updated}/{scanned} chunks actualizados")
+        return {'scanned': scanned, 'updated': updated}
+    
+    def sync_keyword_index(self, batch_size: int = CHROMA_BATCH_SIZE) -> int:
+        """
+        Migracion unica: indexar en BM25 (e identificadores) los chunks que ya estaban en el vectorstore
+        
+        Se registra en user_settings para no repetirse; despues el indice se
+        mantiene en add_documents y en los borrados. Con el indice desactivado
+        se borra la marca, para resincronizar si se vuelve a activar.
+        
+        Returns:
+            Numero de chunks indexados (0 si ya estaba sincronizado)
+        """
+        if self.keyword_index is None:
+            if get_user_setting(KEYWORD_INDEX_SETTING, default=0, setting_type='int'):
+                set_user_setting(KEYWORD_INDEX_SETTING, 0, 'int')
+            return 0
+        if self._vectorstore is None:
+            return 0
+        if get_user_setting(KEYWORD_INDEX_SETTING, default=0, setting_type='int') >= KEYWORD_INDEX_VERSION:
+            return 0
+        
+        with CHROMA_WRITE_LOCK:
+            if get_user_setting(KEYWORD_INDEX_SETTING, default=0, setting_type='int') >= KEYWORD_INDEX_VERSION:
+                return 0
+            
+            self.keyword_index.clear()
+            indexed = 0
+            stores = [self._vectorstore] + list(self._path_stores.values())
+            for store in stores:
+                collection = store._collection
+                offset = 0
+                while True:
+                    batch = collection.get(include=['documents', 'metadatas'], limit=batch_size, offset=offset)
+                    ids = batch.get('ids') or []
+                    if not ids:
+                        break
+                    offset += len(ids)
+                    indexed += self.keyword_index.add_documents(
+                        Document(page_content=text or '', metadata=dict(metadata or {}))
+                        for text, metadata in zip(batch.get('documents') or [], batch.get('metadatas') or [])
+                    )
+            
+            set_user_setting(KEYWORD_INDEX_SETTING, KEYWORD_INDEX_VERSION, 'int')
+        logger.info(f"Indice BM25 sincronizado: {indexed} chunks")
+        return indexed
+    
+    def clear_collection(self) -> int:
+        """
+        Vaciar el indice eliminando y recreando la coleccion (tiempo constante)
+        
+        Se reemplaza la coleccion dentro del mismo objeto Chroma, asi que quien
+        tenga una referencia al vectorstore (retriever) sigue siendo valido.
+        
+        Returns:
+            Numero de chunks que tenia la coleccion
+        """
+        vectorstore = self._vectorstore if self._vectorstore is not None else self.initialize_vectorstore()
+        if vectorstore is None:
+            raise RuntimeError("No se pudo inicializar vectorstore")
+        
+        with CHROMA_WRITE_LOCK:
+            collection = vectorstore._collection
+            name, metadata = collection.name, collection.metadata
+            
+            if self.backend == 'local':
+                count = vectorstore.clear()
+            else:
+                count = collection.count()
+                vectorstore._client.delete_collection(name)
+                vectorstore._collection = vectorstore._client.get_or_create_collection(
+                    name=name,
+                    embedding_function=None,
+                    metadata=metadata
+                )
+            
+            # Colecciones por ruta (aunque el modo actual sea 'single')
+            for path_id in self._existing_path_collections():
+                count += self.drop_path_collection(path_id)
+            
+            if self.keyword_index is not None:
+                self.keyword_index.clear()
+        
+        # Coleccion nueva: los chunks que se indexen ya llevan metadata de rutas
+        # y se agregan tambien al indice BM25
+        set_user_setting(PATH_METADATA_SETTING, PATH_METADATA_VERSION, 'int')
+        if self.keyword_index is not None:
+            set_user_setting(KEYWORD_INDEX_SETTING, KEYWORD_INDEX_VERSION, 'int')
+        logger.info(f"Coleccion '{name}' recreada ({count} chunks eliminados)")
+        return count
+    
+    # ====================================
+    # Colecciones por ruta (per_path)
+    # ====================================
+    
+    @staticmethod
+    def path_collection_name(path_id: int) -> str:
+        """Nombre de la coleccion de una ruta de document_paths"""
+        return f"{PATH_COLLECTION_PREFIX}{int(path_id)}"
+    
+    def _existing_path_collections(self) -> List[int]:
+        """Ids de ruta que tienen coleccion propia en ChromaDB"""
+        path_ids = []
+        for name in self._list_store_names():
+            suffix = name[len(PATH_COLLECTION_PREFIX):]
+            if name.startswith(PATH_COLLECTION_PREFIX) and suffix.isdigit():
+                path_ids.append(int(suffix))
+        return path_ids
+    
+    def _load_path_stores(self):
+        """Abrir las colecciones por ruta existentes (al inicializar el vectorstore)"""
+        for path_id in self._existing_path_collections():
+            self.get_path_store(path_id)
+        logger.info(f"Colecciones por ruta cargadas: {len(self._path_stores)}")
+    
+    def get_path_store(self, path_id: int) -> VectorStore:
+        """
+        Vectorstore de la coleccion de una ruta (se crea si no existe)
+        
+        Args:
+            path_id: Id de la ruta en document_paths
+            
+        Returns:
+            Vectorstore de la ruta en el backend configurado
+        """
+        path_id = int(path_id)
+        store = self._path_stores.get(path_id)
+        if store is None:
+            store = self._open_store(self.path_collection_name(path_id))
+            self._path_stores[path_id] = store
+        return store
+    
+    def drop_path_collection(self, path_id: int) -> int:
+        """
+        Eliminar la coleccion de una ruta (tiempo constante)
+        
+        Args:
+            path_id: Id de la ruta en document_paths
+            
+        Returns:
+            Numero de chunks que tenia (0 si no existia)
+        """
+        path_id = int(path_id)
+        with CHROMA_WRITE_LOCK:
+            self._path_stores.pop(path_id, None)
+            if path_id not in self._existing_path_collections():
+                return 0
+            
+            name = self.path_collection_name(path_id)
+            count = self._drop_store(name)
+        
+        logger.info(f"Coleccion '{name}' eliminada ({count} chunks)")
+        return count
+    
+    def get_search_stores(self, path_ids: Optional[Set[int]] = None) -> List[VectorStore]:
+        """
+        Vectorstores a consultar: 'langchain' y, en modo per_path, las
+        colecciones de las rutas habilitadas
+        
+        Args:
+            path_ids: Limitar a estas rutas (busqueda con alcance; None = todas)
+        
+        Returns:
+            Lista de vectorstores (vacia si no hay vectorstore)
+        """
+        stores = [self._vectorstore] if self._vectorstore is not None else []
+        if not self.per_path_collections or not self._path_stores:
+            return stores
+        
+        enabled = {path_data['id'] for path_data in get_document_paths(enabled_only=True)}
+        if path_ids is not None:
+            enabled &= set(path_ids)
+        stores.extend(store for path_id, store in list(self._path_stores.items()) if path_id in enabled)
+        return stores
+    
+    def get_disabled_path_ids(self) -> Set[int]:
+        """
+        Rutas deshabilitadas (sus chunks no se consultan)
+        
+        La busqueda semantica las omite al no abrir sus colecciones
+        (get_search_stores); el indice BM25 las excluye con este conjunto.
+        """
+        return {path_data['id'] for path_data in get_document_paths(enabled_only=False) if not path_data['enabled']}
+    
+    def count_chunks(self) -> int:
+        """Total de chunks en 'langchain' y en las colecciones por ruta abiertas"""
+        stores = [self._vectorstore] if self._vectorstore is not None else []
+        stores.extend(list(self._path_stores.values()))
+        return sum(store._collection.count() for store in stores)
+    
+    def get_storage_stats(self) -> Dict[str, any]:
+        """
+        Memoria y disco de las colecciones abiertas
+        
+        Returns:
+            Dict con backend y, para el backend local, detalle por coleccion
+            (dtype, indice, chunks, memory_bytes, disk_bytes)
+        """
+        if self.backend != 'local':
+            return {'backend': self.backend, 'collections': []}
+        stores = [self._vectorstore] if self._vectorstore is not None else []
+        stores.extend(list(self._path_stores.values()))
+        collections = [store.storage_stats() for store in stores]
+        return {
+            'backend': self.backend,
+            'collections': collections,
+            'memory_bytes': sum(c['memory_bytes'] for c in collections),
+            'disk_bytes': sum(c['disk_bytes'] for c in collections)
+        }
+    
     async def reindex_all(self, docs_path: Path) -> Dict[str, any]:
         """
         Reindexar todos los documentos desde cero
@@ -450,14 +980,9 @@ class VectorManager:
         """
         logger.warning("Iniciando reindexacion completa (esto puede tomar tiempo)...")
         
-        # Limpiar vectorstore
-        chroma_path = Path(self.chroma_db_path)
-        if chroma_path.exists():
-            import shutil
-            shutil.rmtree(chroma_path)
-            logger.info("Vectorstore anterior eliminado")
-        
-        self._vectorstore = None
+        # Limpiar vectorstore (el cliente compartido sigue abierto: no borrar el directorio)
+        self.clear_collection()
+        logger.info("Vectorstore anterior eliminado")
         
         # Reindexar
         stats = await self.index_documents_incremental(docs_path, force_reindex=True)
@@ -475,11 +1000,9 @@ class VectorManager:
         stats = get_document_stats()
         
         # Agregar info de vectorstore
-        if self._vectorstore:
+        if self._vectorstore is not None:
             try:
-                collection = self._vectorstore._collection
-                vector_count = collection.count()
-                stats['vector_count'] = vector_count
+                stats['vector_count'] = self.count_chunks()
             except:
                 stats['vector_count'] = 0
         else:
@@ -487,7 +1010,7 @@ class VectorManager:
         
         return stats
     
-    def get_vectorstore(self) -> Optional[Chroma]:
+    def get_vectorstore(self) -> Optional[VectorStore]:
         """Obtener instancia del vectorstore"""
         return self._vectorstore
     
@@ -495,4 +1018,27 @@ class VectorManager:
         """Cerrar recursos"""
         if self._executor:
             self._executor.shutdown(wait=True)
+        if self._keyword_index is not None:
+            self._keyword_index.close()
+            self._keyword_index = None
         logger.info("Vector manager cerrado")
+
+
+def get_vector_manager(embedding_model: Optional[str] = None) -> VectorManager:
+    """
+    Obtener instancia singleton de VectorManager
+    
+    alfred_core y todos los endpoints comparten este vectorstore (un solo
+    cliente de ChromaDB y un solo lock de escritura)
+    
+    Args:
+        embedding_model: Modelo de embeddings (solo se usa al crear la instancia)
+        
+    Returns:
+        Instancia de VectorManager
+    """
+    if not hasattr(get_vector_manager, '_instance'):
+        with _client_lock:
+            if not hasattr(get_vector_manager, '_instance'):
+                get_vector_manager._instance = VectorManager(embedding_model=embedding_model)
+    return get_vector_manager._instance
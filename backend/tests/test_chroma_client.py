@@ -0,0 +1,82 @@
+"""
+Test Chroma Client - Un solo PersistentClient de ChromaDB por proceso
+Recorre las rutas que abren ChromaDB (singleton, estadisticas, vaciado y
+reindexacion) con chromadb.PersistentClient instrumentado y comprueba que
+solo se construye un cliente para el directorio.
+"""
+
+import os
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_ROOT / "benchmarks"))
+
+from common import setup_environment
+
+
+@pytest.fixture(scope="module")
+def env(tmp_path_factory):
+    """Datos, BD y ChromaDB en un directorio temporal + Ollama falso"""
+    os.environ["ALFRED_VECTOR_BACKEND"] = "chroma"
+    environment = setup_environment(workdir=str(tmp_path_factory.mktemp("chroma_client")), keep=True)
+    yield environment
+    environment.close()
+
+
+@pytest.fixture(scope="module")
+def constructions(env):
+    """Contar las construcciones de chromadb.PersistentClient"""
+    import chromadb
+
+    calls = []
+    original = chromadb.PersistentClient
+
+    def counting_client(*args, **kwargs):
+        calls.append(kwargs.get("path", args[0] if args else None))
+        return original(*args, **kwargs)
+
+    chromadb.PersistentClient = counting_client
+    yield calls
+    chromadb.PersistentClient = original
+
+
+def test_single_client_per_directory(env, constructions):
+    from db_manager import init_db
+    from synthetic_data import generate_corpus
+    from vector_manager import get_vector_manager, get_chroma_client, get_chroma_client_stats
+    from utils.paths import get_chroma_path
+
+    init_db()
+    manager = get_vector_manager()
+    assert manager is get_vector_manager()
+    assert manager.initialize_vectorstore() is not None
+
+    # Estadisticas (/stats, /health) y vaciado de la coleccion
+    manager.get_stats()
+    manager.count_chunks()
+    manager.clear_collection()
+
+    # Reindexacion completa (vacia la coleccion e indexa de nuevo)
+    corpus = env.workdir / "corpus"
+    generate_corpus(corpus, num_documents=3, paragraphs=2)
+    stats = asyncio.run(manager.reindex_all(corpus))
+    assert manager.count_chunks() > 0, stats
+
+    # Misma carpeta escrita de distintas formas
+    chroma_path = Path(get_chroma_path())
+    spellings = [
+        str(chroma_path),
+        str(chroma_path) + os.sep,
+        str(chroma_path / ".." / chroma_path.name),
+        os.path.relpath(chroma_path),
+        chroma_path,
+    ]
+    clients = {id(get_chroma_client(spelling)) for spelling in spellings}
+
+    assert len(clients) == 1
+    assert len(constructions) == 1, constructions
+    assert get_chroma_client_stats()["clients"] == 1
@@ -212,10 +212,14 @@ def run_auto_repair():
         release_repair_lock()
 
 
-def get_repair_status():
+def get_repair_status(check_chromadb: bool = True):
     """
     Obtiene el estado actual de las dependencias criticas
     
+    Args:
+        check_chromadb: Importar chromadb para verificarlo (~0.7s). En el arranque
+            se omite: chromadb nunca reporta 'needs_fix' y se carga despues en segundo plano
+    
     Returns:
         dict: Estado de cada componente
     """
@@ -235,14 +239,17 @@ def get_repair_status():
         else:
             status['jsonschema'] = 'error'
     
-    try:
-        import chromadb
-        status['chromadb'] = 'ok'
-    except:
-        status['chromadb'] = 'error'
+    if check_chromadb:
+        try:
+            import chromadb
+            status['chromadb'] = 'ok'
+        except:
+            status['chromadb'] = 'error'
+    else:
+        status['chromadb'] = 'skipped'
     
     # Estado general
-    if status['jsonschema'] == 'ok' and status['chromadb'] == 'ok':
+    if status['jsonschema'] == 'ok' and status['chromadb'] in ('ok', 'skipped'):
         status['overall'] = 'ok'
     elif status['jsonschema'] == 'needs_fix' or status['chromadb'] == 'needs_fix':
         status['overall'] = 'needs_repair'
@@ -0,0 +1,254 @@
+"""
+Fake Ollama - Servidor local que imita la API REST de Ollama
+Respuestas deterministas para pruebas y benchmarks sin GPU ni modelos reales
+
+Uso:
+    python utils/fake_ollama.py --port 11435
+    ALFRED_OLLAMA_URL=http://127.0.0.1:11435 python core/alfred_backend.py
+"""
+
+import json
+import time
+import math
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+
+DEFAULT_MODELS = ['gemma2:9b', 'nomic-embed-text:v1.5']
+
+
+def hash_embedding(text: str, dimension: int = 768) -> List[float]:
+    """
+    Embedding determinista basado en hashes de tokens
+    Textos con palabras en comun producen vectores cercanos
+
+    Args:
+        text: Texto a vectorizar
+        dimension: Dimension del vector
+
+    Returns:
+        Vector normalizado (norma 1)
+    """
+    vector = [0.0] * dimension
+    for token in text.lower().split():
+        digest = hashlib.md5(token.encode('utf-8')).digest()
+        index = int.from_bytes(digest[:4], 'little') % dimension
+        sign = 1.0 if digest[4] % 2 == 0 else -1.0
+        vector[index] += sign
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+class FakeOllamaState:
+    """Estado compartido del servidor falso (modelos instalados y cargados)"""
+
+    def __init__(self, models: Optional[List[str]] = None, generate_latency: float = 0.05,
+                 embed_latency: float = 0.0, dimension: int = 768, pull_steps: int = 5):
+        self.generate_latency = generate_latency
+        self.embed_latency = embed_latency
+        self.dimension = dimension
+        self.pull_steps = pull_steps
+        self.installed: Dict[str, Dict[str, Any]] = {}
+        self.loaded: Dict[str, float] = {}
+        self.requests: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        for name in models or DEFAULT_MODELS:
+            self.install(name)
+
+    def install(self, name: str):
+        """Registrar modelo como instalado"""
+        digest = hashlib.sha256(name.encode('utf-8')).hexdigest()
+        family = name.split(':')[0].split('/')[-1].rstrip('0123456789.')
+        self.installed[name] = {
+            'name': name,
+            'model': name,
+            'modified_at': datetime.now(timezone.utc).isoformat(),
+            'size': 1_000_000 + int(digest[:6], 16),
+            'digest': digest,
+            'details': {
+                'format': 'gguf',
+                'family': family,
+                'families': [family],
+                'parameter_size': '1B',
+                'quantization_level': 'Q4_0'
+            }
+        }
+
+    def count(self, path: str):
+        """Contar peticiones por ruta"""
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+
+class FakeOllamaHandler(BaseHTTPRequestHandler):
+    """Handler HTTP con las rutas de Ollama usadas por Alfred"""
+
+    protocol_version = 'HTTP/1.1'
+    state: FakeOllamaState = None
+
+    def log_message(self, format, *args):
+        """Silenciar log de acceso"""
+        return
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, events: List[Tuple[Dict[str, Any], float]]):
+        """Enviar NDJSON con chunked encoding (como hace Ollama)"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for event, delay in events:
+            if delay:
+                time.sleep(delay)
+            data = (json.dumps(event) + '\n').encode('utf-8')
+            self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        state = self.state
+        state.count(self.path)
+        if self.path == '/api/version':
+            self._send_json({'version': '0.0.0-fake'})
+        elif self.path == '/api/tags':
+            self._send_json({'models': list(state.installed.values())})
+        elif self.path == '/api/ps':
+            now = time.time()
+            models = [
+                {'name': name, 'model': name, 'expires_at': datetime.fromtimestamp(expires, timezone.utc).isoformat()}
+                for name, expires in state.loaded.items() if expires > now
+            ]
+            self._send_json({'models': models})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_DELETE(self):
+        state = self.state
+        state.count(self.path)
+        payload = self._read_json()
+        name = payload.get('model') or payload.get('name')
+        if self.path == '/api/delete' and name in state.installed:
+            del state.installed[name]
+            state.loaded.pop(name, None)
+            self._send_json({})
+        else:
+            self._send_json({'error': f"model '{name}' not found"}, 404)
+
+    def do_POST(self):
+        state = self.state
+        state.count(self.path)
+        payload = self._read_json()
+        name = payload.get('model') or payload.get('name')
+
+        if self.path == '/api/generate':
+            if name not in state.installed:
+                self._send_json({'error': f"model '{name}' not found"}, 404)
+                return
+            keep_alive = payload.get('keep_alive', 300)
+            if keep_alive in (0, '0', '0s', '0m'):
+                state.loaded.pop(name, None)
+                self._send_json({'model': name, 'response': '', 'done': True, 'done_reason': 'unload'})
+                return
+            state.loaded[name] = time.time() + (keep_alive if isinstance(keep_alive, (int, float)) else 300)
+            prompt = payload.get('prompt', '')
+            if not prompt:
+                self._send_json({'model': name, 'response': '', 'done': True, 'done_reason': 'load'})
+                return
+            time.sleep(state.generate_latency)
+            digest = hashlib.md5(prompt.encode('utf-8')).hexdigest()[:8]
+            answer = f"Respuesta simulada {digest}"
+            self._send_json({
+                'model': name,
+                'response': answer,
+                'done': True,
+                'eval_count': len(answer.split()),
+                'eval_duration': int(state.generate_latency * 1e9),
+                'total_duration': int(state.generate_latency * 1e9)
+            })
+
+        elif self.path in ('/api/embed', '/api/embeddings'):
+            inputs = payload.get('input', payload.get('prompt', ''))
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            if state.embed_latency:
+                time.sleep(state.embed_latency)
+            vectors = [hash_embedding(text, state.dimension) for text in inputs]
+            if self.path == '/api/embeddings':
+                self._send_json({'embedding': vectors[0] if vectors else []})
+            else:
+                self._send_json({'model': name, 'embeddings': vectors})
+
+        elif self.path == '/api/pull':
+            digest = 'sha256:' + hashlib.sha256(name.encode('utf-8')).hexdigest()
+            total = 1_000_000
+            events = [({'status': 'pulling manifest'}, 0)]
+            for step in range(1, state.pull_steps + 1):
+                events.append(({
+                    'status': f"pulling {digest[7:19]}",
+                    'digest': digest,
+                    'total': total,
+                    'completed': total * step // state.pull_steps
+                }, 0.05))
+            events.append(({'status': 'verifying sha256 digest'}, 0))
+            events.append(({'status': 'writing manifest'}, 0))
+            events.append(({'status': 'success'}, 0))
+            self._send_stream(events)
+            state.install(name)
+
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+
+def start_fake_ollama(host: str = '127.0.0.1', port: int = 0,
+                      state: Optional[FakeOllamaState] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Arrancar servidor falso en un hilo daemon
+
+    Args:
+        host: Host de escucha
+        port: Puerto (0 = puerto libre aleatorio)
+        state: Estado inicial opcional
+
+    Returns:
+        Tupla (servidor, url_base). Detener con server.shutdown()
+    """
+    handler = type('BoundFakeOllamaHandler', (FakeOllamaHandler,), {'state': state or FakeOllamaState()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='fake-ollama', daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Servidor Ollama falso para pruebas')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--latency', type=float, default=0.05, help='Latencia de generate en segundos')
+    args = parser.parse_args()
+
+    server, url = start_fake_ollama(args.host, args.port, FakeOllamaState(generate_latency=args.latency))
+    print(f"Fake Ollama escuchando en {url}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
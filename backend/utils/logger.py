@@ -1,25 +1,126 @@
+import atexit
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import threading
+from typing import Dict, Optional
+from logging.handlers import TimedRotatingFileHandler, QueueHandler, QueueListener
 from utils.paths import get_log_path
 
-def get_logger(name):
-    # En modo desarrollo, todos los logs van a general.logs
-    # En producción, cada módulo tiene su propio archivo
-    is_dev_mode = os.getenv('ALFRED_DEV_MODE', '').lower() == '1'
-    
-    if is_dev_mode:
-        log_filename = "general.logs"
-    else:
-        log_filename = f"{name}.log"
-    
-    log_path = get_log_path() / log_filename
-    handler = TimedRotatingFileHandler(log_path, when="midnight", backupCount=7, encoding="utf-8")
-    formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] [%(name)s]: %(message)s")
-    handler.setFormatter(formatter)
+# La escritura a disco ocurre en un hilo (QueueListener); los modulos solo
+# encolan el registro. Un handler de archivo por archivo de log, compartido
+# por todos los loggers que escriben en el (ej: general.logs en modo desarrollo)
+_lock = threading.Lock()
+_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+_file_handlers: Dict[str, logging.Handler] = {}
+_listener: Optional[QueueListener] = None
+_formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] [%(name)s]: %(message)s")
 
+
+class _FileRouter(logging.Handler):
+    """Handler del QueueListener: envia cada registro a su archivo de log"""
+
+    def emit(self, record):
+        handler = _file_handlers.get(getattr(record, 'alfred_log_file', None))
+        if handler is not None:
+            handler.handle(record)
+
+
+class _FileQueueHandler(QueueHandler):
+    """QueueHandler que marca el registro con el archivo de destino"""
+
+    def __init__(self, log_queue, log_filename: str):
+        super().__init__(log_queue)
+        self.log_filename = log_filename
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        record.alfred_log_file = self.log_filename
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Deja pasar 1 de cada N registros INFO/DEBUG por linea de codigo
+
+    WARNING y superiores siempre pasan. La primera ocurrencia de cada linea
+    tambien, asi que los mensajes poco frecuentes (configuracion) no se pierden.
+    """
+
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts: Dict[tuple, int] = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.every == 1:
+            return True
+        key = (record.pathname, record.lineno)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        return count % self.every == 0
+
+
+def _ensure_listener():
+    global _listener
+    if _listener is None:
+        _listener = QueueListener(_queue, _FileRouter(), respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Vaciar la cola y detener el hilo de escritura"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        for handler in _file_handlers.values():
+            handler.flush()
+
+
+def get_logger(name, sample_every: Optional[int] = None):
+    """
+    Obtener logger configurado (idempotente: llamadas repetidas no duplican handlers)
+
+    Args:
+        name: Nombre del logger (y del archivo de log en produccion)
+        sample_every: Registrar solo 1 de cada N mensajes INFO/DEBUG por linea
+            (para logs por consulta muy frecuentes). ALFRED_LOG_SAMPLE_EVERY
+            sobrescribe el valor; 1 desactiva el muestreo
+    """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    logger.addHandler(handler)
-    logger.propagate = False
+
+    with _lock:
+        if getattr(logger, '_alfred_configured', False):
+            return logger
+
+        # En modo desarrollo, todos los logs van a general.logs
+        # En producción, cada módulo tiene su propio archivo
+        is_dev_mode = os.getenv('ALFRED_DEV_MODE', '').lower() == '1'
+
+        if is_dev_mode:
+            log_filename = "general.logs"
+        else:
+            log_filename = f"{name}.log"
+
+        if log_filename not in _file_handlers:
+            log_path = get_log_path() / log_filename
+            handler = TimedRotatingFileHandler(log_path, when="midnight", backupCount=7, encoding="utf-8")
+            handler.setFormatter(_formatter)
+            _file_handlers[log_filename] = handler
+
+        logger.setLevel(logging.INFO)
+        logger.addHandler(_FileQueueHandler(_queue, log_filename))
+        logger.propagate = False
+
+        if sample_every is not None:
+            every = int(os.getenv('ALFRED_LOG_SAMPLE_EVERY', str(sample_every)))
+            if every > 1:
+                logger.addFilter(SamplingFilter(every))
+
+        logger._alfred_configured = True
+        _ensure_listener()
+
     return logger
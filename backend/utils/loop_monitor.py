@@ -0,0 +1,225 @@
+"""
+Loop Monitor - Retraso del event loop y detector de llamadas bloqueantes
+Un latido async mide cuanto tarda el loop en despertar; un hilo vigilante
+captura la pila del hilo del loop (sys._current_frames) cuando el latido se
+retrasa, y agrega los peores bloqueos por ubicacion en el codigo
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from utils.logger import get_logger
+from utils.metrics import counter, histogram
+from utils.tracing import LatencyHistogram
+
+logger = get_logger("loop_monitor")
+
+BACKEND_ROOT = str(Path(__file__).resolve().parent.parent)
+
+LOOP_LAG = histogram('alfred_event_loop_lag_seconds', 'Retraso del event loop medido por el latido')
+LOOP_STALLS = counter('alfred_event_loop_stalls_total', 'Bloqueos del event loop por encima del umbral')
+
+
+def _location(stack: traceback.StackSummary) -> str:
+    """Frame mas profundo del codigo del backend (o el mas profundo en general)"""
+    for frame in reversed(stack):
+        if frame.filename.startswith(BACKEND_ROOT) and not frame.filename.endswith('loop_monitor.py'):
+            relative = os.path.relpath(frame.filename, BACKEND_ROOT)
+            return f"{relative}:{frame.lineno} in {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{frame.filename}:{frame.lineno} in {frame.name}"
+    return "desconocido"
+
+
+class LoopMonitor:
+    """
+    Monitor de retraso del event loop
+    """
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        threshold: Optional[float] = None,
+        max_offenders: int = 100,
+        stack_depth: int = 25
+    ):
+        """
+        Inicializar monitor
+
+        Args:
+            interval: Periodo del latido en segundos (ALFRED_LOOP_MONITOR_INTERVAL)
+            threshold: Retraso a partir del cual se considera bloqueo (ALFRED_LOOP_LAG_THRESHOLD)
+            max_offenders: Ubicaciones distintas a conservar
+            stack_depth: Frames guardados por pila
+        """
+        self.interval = interval or float(os.getenv('ALFRED_LOOP_MONITOR_INTERVAL', '0.05'))
+        self.threshold = threshold or float(os.getenv('ALFRED_LOOP_LAG_THRESHOLD', '0.1'))
+        self.max_offenders = max_offenders
+        self.stack_depth = stack_depth
+
+        self.lag = LatencyHistogram()
+        self.stalls = 0
+        self.uncaptured_stalls = 0
+        self.started_at: Optional[float] = None
+        self._offenders: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        self._last_beat = time.perf_counter()
+        self._pending: Optional[tuple] = None  # (latido, pila) capturada por el vigilante
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Iniciar latido y vigilante (llamar desde el event loop)"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        self._stop_event.clear()
+        self.started_at = time.time()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="alfred-loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Monitor de event loop activo (latido={self.interval * 1000:.0f}ms, umbral={self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        """Detener latido y vigilante"""
+        self._stop_event.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            beat = time.perf_counter()
+            self._last_beat = beat
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - beat - self.interval)
+            self.lag.observe(lag)
+            LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                pending = self._pending
+                stack = pending[1] if pending and pending[0] == beat else None
+                self._record_stall(lag, stack)
+
+    def _watch(self):
+        """Hilo vigilante: capturar la pila mientras el loop sigue bloqueado"""
+        capture_after = self.interval + self.threshold / 2
+        while not self._stop_event.wait(self.threshold / 4):
+            beat = self._last_beat
+            if time.perf_counter() - beat < capture_after:
+                continue
+            pending = self._pending
+            if pending and pending[0] == beat:
+                continue  # Ya capturado para este bloqueo
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is not None:
+                self._pending = (beat, traceback.extract_stack(frame)[-self.stack_depth:])
+
+    def _record_stall(self, lag: float, stack: Optional[traceback.StackSummary]):
+        """Agregar un bloqueo a las estadisticas por ubicacion"""
+        self.stalls += 1
+        LOOP_STALLS.inc()
+
+        if stack is None:
+            # Bloqueo demasiado corto para que el vigilante tomara la pila
+            self.uncaptured_stalls += 1
+            location = "sin pila (bloqueo corto)"
+            formatted = []
+        else:
+            location = _location(stack)
+            formatted = [line.rstrip() for line in traceback.format_list(stack)]
+
+        with self._lock:
+            offender = self._offenders.get(location)
+            if offender is None:
+                if len(self._offenders) >= self.max_offenders:
+                    smallest = min(self._offenders, key=lambda key: self._offenders[key]['total_seconds'])
+                    del self._offenders[smallest]
+                offender = {'location': location, 'count': 0, 'total_seconds': 0.0, 'max_seconds': 0.0}
+                self._offenders[location] = offender
+            offender['count'] += 1
+            offender['total_seconds'] += lag
+            offender['max_seconds'] = max(offender['max_seconds'], lag)
+            offender['last_seen'] = datetime.now().isoformat()
+            if formatted:
+                offender['stack'] = formatted
+
+        logger.warning(f"Event loop bloqueado {lag * 1000:.0f}ms en {location}")
+        if formatted:
+            logger.debug("Pila del bloqueo:\n" + "\n".join(formatted))
+
+    def get_offenders(self, limit: int = 10, include_stacks: bool = True) -> List[Dict[str, Any]]:
+        """
+        Peores ubicaciones por tiempo total bloqueado
+
+        Args:
+            limit: Numero maximo de ubicaciones
+            include_stacks: Incluir la ultima pila capturada de cada ubicacion
+        """
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda o: o['total_seconds'], reverse=True)[:limit]
+            result = []
+            for offender in offenders:
+                entry = {
+                    'location': offender['location'],
+                    'count': offender['count'],
+                    'total_ms': round(offender['total_seconds'] * 1000, 1),
+                    'max_ms': round(offender['max_seconds'] * 1000, 1),
+                    'last_seen': offender.get('last_seen')
+                }
+                if include_stacks and offender.get('stack'):
+                    entry['stack'] = offender['stack']
+                result.append(entry)
+            return result
+
+    def get_stats(self, limit: int = 10, include_stacks: bool = True) -> Dict[str, Any]:
+        """Resumen del retraso del loop y peores bloqueos"""
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'threshold_ms': self.threshold * 1000,
+            'uptime_seconds': round(time.time() - self.started_at, 1) if self.started_at else 0.0,
+            'lag': self.lag.snapshot(),
+            'stalls': self.stalls,
+            'uncaptured_stalls': self.uncaptured_stalls,
+            'offenders': self.get_offenders(limit, include_stacks)
+        }
+
+    def reset(self):
+        """Reiniciar estadisticas (el monitor sigue activo)"""
+        with self._lock:
+            self._offenders.clear()
+        self.lag = LatencyHistogram()
+        self.stalls = 0
+        self.uncaptured_stalls = 0
+
+
+def get_loop_monitor() -> LoopMonitor:
+    """
+    Obtener instancia singleton de LoopMonitor
+
+    Returns:
+        Monitor compartido del event loop
+    """
+    if not hasattr(get_loop_monitor, '_instance'):
+        get_loop_monitor._instance = LoopMonitor()
+    return get_loop_monitor._instance
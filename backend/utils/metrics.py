@@ -0,0 +1,243 @@
+"""
+Metrics - Registro de metricas en formato de exposicion Prometheus
+Contadores e histogramas en memoria (sin dependencias externas) mas
+colectores que leen el estado de otros componentes solo al hacer scrape
+"""
+
+import time
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from utils.logger import get_logger
+from utils.tracing import LatencyHistogram, LATENCY_BUCKETS
+
+logger = get_logger("metrics")
+
+# Una familia de metricas producida por un colector:
+# (nombre, tipo, ayuda, [(labels, valor), ...])
+MetricFamily = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    """Escapar valor de label segun el formato de texto de Prometheus"""
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def histogram_lines(name: str, labels: Dict[str, str], histogram: LatencyHistogram) -> List[str]:
+    """
+    Serializar un LatencyHistogram como series _bucket/_sum/_count
+
+    Args:
+        name: Nombre de la metrica (sin sufijo)
+        labels: Labels de la serie
+        histogram: Histograma a exportar
+    """
+    with histogram._lock:
+        counts = list(histogram.counts)
+        total = histogram.count
+        total_sum = histogram.sum
+
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{_format_labels({**labels, "le": _format_bound(bound)})} {cumulative}')
+    lines.append(f'{name}_bucket{_format_labels({**labels, "le": "+Inf"})} {total}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(total_sum)}')
+    lines.append(f'{name}_count{_format_labels(labels)} {total}')
+    return lines
+
+
+class Counter:
+    """Contador monotono con labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        """Incrementar el contador"""
+        key = tuple(str(labels.get(label, '')) for label in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f'{self.name}{_format_labels(dict(zip(self.labelnames, key)))} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Histograma de duraciones (segundos) con labels"""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, ...], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels):
+        """Registrar una observacion"""
+        key = tuple(str(labels.get(label, '')) for label in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, LatencyHistogram(self.buckets))
+        series.observe(seconds)
+
+    def collect(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            lines.extend(histogram_lines(self.name, dict(zip(self.labelnames, key)), series))
+        return lines
+
+
+_metrics: Dict[str, object] = {}
+_collectors: List[Callable[[], Iterable[MetricFamily]]] = []
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+    """Obtener (o crear) un contador registrado"""
+    with _registry_lock:
+        if name not in _metrics:
+            _metrics[name] = Counter(name, help_text, labelnames)
+        return _metrics[name]
+
+
+def histogram(name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+              buckets: tuple = LATENCY_BUCKETS) -> Histogram:
+    """Obtener (o crear) un histograma registrado"""
+    with _registry_lock:
+        if name not in _metrics:
+            _metrics[name] = Histogram(name, help_text, labelnames, buckets)
+        return _metrics[name]
+
+
+def register_collector(collector: Callable[[], Iterable[MetricFamily]]):
+    """
+    Registrar un colector evaluado en cada scrape
+
+    El colector devuelve familias (nombre, tipo, ayuda, muestras) y se usa
+    para valores que ya mantiene otro componente (caches, cola del LLM,
+    tamano de la coleccion), evitando trabajo en la ruta caliente.
+    """
+    with _registry_lock:
+        if collector not in _collectors:
+            _collectors.append(collector)
+
+
+def render() -> str:
+    """
+    Generar la exposicion en formato de texto Prometheus (version 0.0.4)
+
+    Returns:
+        Texto con todas las metricas registradas y colectadas
+    """
+    with _registry_lock:
+        metrics = list(_metrics.values())
+        collectors = list(_collectors)
+
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.collect())
+
+    for collector in collectors:
+        try:
+            families = list(collector())
+        except Exception as e:
+            logger.warning(f"Colector de metricas fallo ({getattr(collector, '__name__', collector)}): {e}")
+            continue
+        for name, metric_type, help_text, samples in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for labels, value in samples:
+                if metric_type == 'histogram':
+                    lines.extend(histogram_lines(name, labels, value))
+                else:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+# ====================================
+# Middleware HTTP
+# ====================================
+
+HTTP_REQUEST_DURATION = histogram(
+    'alfred_http_request_duration_seconds',
+    'Duracion de peticiones HTTP por ruta',
+    ('method', 'route')
+)
+HTTP_REQUESTS_TOTAL = counter(
+    'alfred_http_requests_total',
+    'Peticiones HTTP atendidas por ruta y codigo',
+    ('method', 'route', 'status')
+)
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide latencia por ruta
+
+    Usa la plantilla de la ruta (ej: /conversations/{conversation_id}) como
+    label para mantener la cardinalidad acotada. La duracion incluye el
+    envio completo del cuerpo, por lo que en streams SSE refleja la vida
+    de la conexion.
+    """
+
+    def __init__(self, app, exclude_paths: Optional[Tuple[str, ...]] = ('/metrics',)):
+        self.app = app
+        self.exclude_paths = exclude_paths or ()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope.get('path') in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get('route')
+            route_path = getattr(route, 'path', None) or 'unmatched'
+            method = scope.get('method', '')
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=method, route=route_path)
+            HTTP_REQUESTS_TOTAL.inc(method=method, route=route_path, status=str(status))
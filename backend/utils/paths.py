@@ -12,11 +12,16 @@ def is_development_mode():
     - ALFRED_DEV_MODE=1 esta establecido explicitamente
     - O si ../chroma_db existe en raiz del proyecto (fallback automatico para scripts locales)
     
+    ALFRED_DEV_MODE=0 explicito desactiva el fallback (benchmarks y pruebas
+    que redirigen las rutas con ALFRED_*_PATH en un checkout de desarrollo).
+    
     Retorna False (produccion) por defecto.
     """
-    dev_mode = os.getenv("ALFRED_DEV_MODE", "0").lower()
+    dev_mode = os.getenv("ALFRED_DEV_MODE", "").lower()
     if dev_mode == "1" or dev_mode == "true":
         return True
+    if dev_mode == "0" or dev_mode == "false":
+        return False
     
     # Fallback: detectar por archivo local en raiz del proyecto
     project_root = Path(__file__).parent.parent.parent
@@ -118,3 +123,14 @@ def get_chroma_path():
     path.mkdir(parents=True, exist_ok=True)
     return str(path)
 
+
+def normalize_path_key(path) -> str:
+    """
+    Forma normalizada de una ruta para compararla o filtrar por ella
+    (metadata 'dir_prefix' de los chunks en ChromaDB).
+
+    Absoluta, sin '..', separadores '/' y minusculas en Windows. No toca el
+    sistema de archivos (no resuelve symlinks), asi que es barata por chunk.
+    """
+    normalized = os.path.normcase(os.path.abspath(os.path.expanduser(str(path))))
+    return normalized.replace('\\', '/').rstrip('/') or '/'
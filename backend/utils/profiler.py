@@ -0,0 +1,335 @@
+"""
+Profiler - Perfilado bajo demanda del backend en ejecucion
+Muestreo de pilas (collapsed stacks) o cProfile durante N segundos o durante
+la siguiente consulta, y diffs de tracemalloc para buscar crecimiento de memoria
+"""
+
+import io
+import os
+import sys
+import hmac
+import time
+import pstats
+import asyncio
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterator
+
+from utils.logger import get_logger
+
+logger = get_logger("profiler")
+
+LOOPBACK_HOSTS = ('127.0.0.1', '::1', 'localhost', 'testclient')
+MAX_PROFILE_SECONDS = 120.0
+
+
+class ProfilerBusyError(Exception):
+    """Ya hay una sesion de perfilado en curso"""
+
+
+def check_access(client_host: Optional[str], token: Optional[str]):
+    """
+    Verificar que el perfilado este permitido para esta peticion
+
+    Requiere ALFRED_PROFILING_ENABLED=true (o ALFRED_DEV_MODE=1), cliente local
+    y, si ALFRED_PROFILING_TOKEN esta definido, el mismo token en la peticion.
+
+    Raises:
+        PermissionError: Acceso denegado (mensaje apto para el cliente)
+    """
+    enabled = (
+        os.getenv('ALFRED_PROFILING_ENABLED', 'false').lower() == 'true'
+        or os.getenv('ALFRED_DEV_MODE', '0').lower() == '1'
+    )
+    if not enabled:
+        raise PermissionError("Perfilado deshabilitado (ALFRED_PROFILING_ENABLED=true para habilitarlo)")
+    if client_host not in LOOPBACK_HOSTS:
+        raise PermissionError("El perfilado solo se permite desde localhost")
+    expected = os.getenv('ALFRED_PROFILING_TOKEN')
+    if expected and not hmac.compare_digest(expected, token or ''):
+        raise PermissionError("Token de diagnostico invalido")
+
+
+# ====================================
+# Perfiladores
+# ====================================
+
+class SamplingProfiler:
+    """
+    Perfilador por muestreo: un hilo lee la pila del hilo objetivo cada
+    'interval' segundos y cuenta pilas colapsadas (formato flamegraph)
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval: float = 0.005, all_threads: bool = False):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples: Dict[str, int] = {}
+        self.total_samples = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._own_id: Optional[int] = None
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        return ';'.join(reversed(names))
+
+    def _run(self):
+        self._own_id = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            if self.all_threads:
+                targets = [f for tid, f in frames.items() if tid != self._own_id]
+            else:
+                targets = [frames[self.thread_id]] if self.thread_id in frames else []
+            for frame in targets:
+                stack = self._collapse(frame)
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+                self.total_samples += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="alfred-sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def report(self, limit: Optional[int] = None) -> str:
+        """Pilas colapsadas 'frame;frame;frame cuenta' (compatibles con flamegraph.pl/speedscope)"""
+        items = sorted(self.samples.items(), key=lambda item: item[1], reverse=True)
+        if limit:
+            items = items[:limit]
+        header = f"# muestras={self.total_samples} intervalo={self.interval * 1000:.1f}ms\n"
+        return header + '\n'.join(f"{stack} {count}" for stack, count in items) + '\n'
+
+
+class CProfileProfiler:
+    """
+    cProfile sobre el hilo que llama a start() (el hilo del event loop)
+
+    Incluye todo lo que ejecuta el loop durante la ventana, no solo una
+    peticion; el trabajo en hilos del executor no aparece.
+    """
+
+    def __init__(self, sort: str = 'cumulative'):
+        self.sort = sort
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def report(self, limit: Optional[int] = 50) -> str:
+        """Salida de pstats ordenada por 'sort'"""
+        stream = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=stream)
+        stats.strip_dirs().sort_stats(self.sort).print_stats(limit or 50)
+        return stream.getvalue()
+
+
+def create_profiler(mode: str, interval: float = 0.005, sort: str = 'cumulative', all_threads: bool = False):
+    """
+    Crear perfilador
+
+    Args:
+        mode: 'sampling' o 'cprofile'
+        interval: Periodo de muestreo (solo sampling)
+        sort: Orden de pstats (solo cprofile)
+        all_threads: Muestrear todos los hilos (solo sampling)
+
+    Raises:
+        ValueError: Modo desconocido
+    """
+    if mode == 'sampling':
+        return SamplingProfiler(interval=interval, all_threads=all_threads)
+    if mode == 'cprofile':
+        return CProfileProfiler(sort=sort)
+    raise ValueError(f"Modo de perfilado desconocido: {mode} (sampling | cprofile)")
+
+
+class ProfilerManager:
+    """
+    Coordina una sesion de perfilado a la vez
+    """
+
+    def __init__(self):
+        self._busy = False
+        self._armed = None          # perfilador esperando la siguiente consulta
+        self._armed_future: Optional[asyncio.Future] = None
+
+    @property
+    def busy(self) -> bool:
+        return self._busy
+
+    async def profile_for(self, profiler, seconds: float):
+        """
+        Perfilar durante 'seconds' segundos (el loop sigue atendiendo peticiones)
+
+        Raises:
+            ProfilerBusyError: Ya hay una sesion activa
+        """
+        if self._busy:
+            raise ProfilerBusyError("Ya hay una sesion de perfilado en curso")
+        self._busy = True
+        try:
+            profiler.start()
+            try:
+                await asyncio.sleep(min(seconds, MAX_PROFILE_SECONDS))
+            finally:
+                profiler.stop()
+        finally:
+            self._busy = False
+        return profiler
+
+    async def profile_next_query(self, profiler, timeout: float):
+        """
+        Perfilar la siguiente consulta que pase por query_hook()
+
+        Raises:
+            ProfilerBusyError: Ya hay una sesion activa
+            asyncio.TimeoutError: No llego ninguna consulta a tiempo
+        """
+        if self._busy:
+            raise ProfilerBusyError("Ya hay una sesion de perfilado en curso")
+        self._busy = True
+        self._armed = profiler
+        self._armed_future = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._armed_future), timeout=min(timeout, MAX_PROFILE_SECONDS * 5))
+            return profiler
+        finally:
+            if self._armed is profiler:
+                self._armed = None
+            self._armed_future = None
+            self._busy = False
+
+    @contextmanager
+    def query_hook(self) -> Iterator[None]:
+        """
+        Envolver una consulta; si hay un perfilador armado la perfila
+
+        Sin sesion armada solo cuesta una comprobacion de atributo.
+        """
+        profiler = self._armed
+        if profiler is None:
+            yield
+            return
+
+        self._armed = None
+        future = self._armed_future
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            if future is not None and not future.done():
+                future.set_result(True)
+
+
+# ====================================
+# Memoria (tracemalloc)
+# ====================================
+
+class MemoryTracker:
+    """
+    Diffs de tracemalloc contra una instantanea base
+    """
+
+    _IGNORE = (
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>"),
+    )
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self._baseline_time: Optional[float] = None
+        self._started_here = False
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 10) -> Dict[str, Any]:
+        """Activar tracemalloc (si no lo estaba) y tomar la instantanea base"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._started_here = True
+        self._baseline = tracemalloc.take_snapshot().filter_traces(self._IGNORE)
+        self._baseline_time = time.time()
+        current, peak = tracemalloc.get_traced_memory()
+        logger.info(f"tracemalloc activo, instantanea base tomada ({current / 1024 / 1024:.1f} MB trazados)")
+        return {'tracing': True, 'traced_mb': round(current / 1024 / 1024, 2), 'peak_mb': round(peak / 1024 / 1024, 2)}
+
+    def diff(self, limit: int = 25, group_by: str = 'lineno') -> Dict[str, Any]:
+        """
+        Comparar memoria actual con la instantanea base
+
+        Args:
+            limit: Numero de entradas
+            group_by: 'lineno', 'filename' o 'traceback'
+
+        Raises:
+            RuntimeError: No hay instantanea base
+        """
+        if self._baseline is None or not tracemalloc.is_tracing():
+            raise RuntimeError("No hay instantanea base: iniciar con POST /diagnostics/memory/snapshot")
+
+        snapshot = tracemalloc.take_snapshot().filter_traces(self._IGNORE)
+        stats = snapshot.compare_to(self._baseline, group_by)
+        current, peak = tracemalloc.get_traced_memory()
+
+        entries: List[Dict[str, Any]] = []
+        for stat in stats[:limit]:
+            entry = {
+                'location': str(stat.traceback[0]) if stat.traceback else 'desconocido',
+                'size_diff_kb': round(stat.size_diff / 1024, 1),
+                'size_kb': round(stat.size / 1024, 1),
+                'count_diff': stat.count_diff,
+                'count': stat.count
+            }
+            if group_by == 'traceback':
+                entry['traceback'] = [str(frame) for frame in stat.traceback]
+            entries.append(entry)
+
+        return {
+            'baseline_age_seconds': round(time.time() - self._baseline_time, 1),
+            'traced_mb': round(current / 1024 / 1024, 2),
+            'peak_mb': round(peak / 1024 / 1024, 2),
+            'total_diff_kb': round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            'top': entries
+        }
+
+    def stop(self):
+        """Descartar instantanea y detener tracemalloc si lo activo este modulo"""
+        self._baseline = None
+        self._baseline_time = None
+        if self._started_here and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self._started_here = False
+
+
+def get_profiler_manager() -> ProfilerManager:
+    """Obtener instancia singleton de ProfilerManager"""
+    if not hasattr(get_profiler_manager, '_instance'):
+        get_profiler_manager._instance = ProfilerManager()
+    return get_profiler_manager._instance
+
+
+def get_memory_tracker() -> MemoryTracker:
+    """Obtener instancia singleton de MemoryTracker"""
+    if not hasattr(get_memory_tracker, '_instance'):
+        get_memory_tracker._instance = MemoryTracker()
+    return get_memory_tracker._instance
@@ -0,0 +1,160 @@
+"""
+Startup - Linea de tiempo del arranque del backend
+Registra hitos (imports, app creada, puerto abierto, core listo) relativos
+al inicio del proceso para diagnosticar arranques lentos, y el estado de
+las etapas de inicializacion (db, embeddings, vectorstore, retriever, llm)
+"""
+
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Optional, Iterator
+
+from utils.logger import get_logger
+
+logger = get_logger("startup")
+
+
+def _process_start() -> float:
+    """Epoch de inicio del proceso (psutil si esta disponible, si no: ahora)"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).create_time()
+    except Exception:
+        return time.time()
+
+
+PROCESS_START = _process_start()
+_marks: List[Tuple[str, float]] = []
+
+
+def mark(milestone: str) -> float:
+    """
+    Registrar un hito del arranque
+
+    Args:
+        milestone: Nombre del hito (ej: 'imports', 'port_open', 'core_ready')
+
+    Returns:
+        Segundos desde el inicio del proceso
+    """
+    elapsed = time.time() - PROCESS_START
+    _marks.append((milestone, elapsed))
+    return elapsed
+
+
+def get_timeline() -> Dict[str, float]:
+    """Hitos registrados en segundos desde el inicio del proceso"""
+    return {milestone: round(elapsed, 3) for milestone, elapsed in _marks}
+
+
+# ====================================
+# Etapas de inicializacion (readiness)
+# ====================================
+
+STAGES = ('db', 'embeddings', 'vectorstore', 'retriever', 'llm_warm')
+FINAL_STATUSES = ('done', 'failed', 'skipped')
+
+
+class ReadinessTracker:
+    """
+    Estado observable de las etapas de inicializacion del core
+
+    Cada cambio se publica a los suscriptores (colas asyncio) para el
+    endpoint SSE /health/ready. Debe usarse desde el hilo del event loop.
+    """
+
+    def __init__(self):
+        self._subscribers: List[asyncio.Queue] = []
+        self.reset()
+
+    def reset(self):
+        """Volver todas las etapas a 'pending' (inicio del lifespan)"""
+        self._stages: Dict[str, Dict[str, Any]] = {
+            name: {'name': name, 'status': 'pending', 'seconds': None, 'error': None}
+            for name in STAGES
+        }
+        self.ready = False
+        self.error: Optional[str] = None
+
+    @property
+    def done(self) -> bool:
+        """Todas las etapas terminaron (o la inicializacion fallo)"""
+        return self.error is not None or all(s['status'] in FINAL_STATUSES for s in self._stages.values())
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Estado actual: ready, done, error y lista ordenada de etapas"""
+        return {
+            'ready': self.ready,
+            'done': self.done,
+            'error': self.error,
+            'stages': [dict(self._stages[name]) for name in STAGES]
+        }
+
+    def _update(self, name: str, **fields):
+        self._stages[name].update(fields)
+        self._publish('stage')
+
+    def _publish(self, event_type: str):
+        event = {'type': 'done' if self.done else event_type, **self.snapshot()}
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                pass
+
+    @contextmanager
+    def stage(self, name: str, required: bool = True) -> Iterator[None]:
+        """
+        Ejecutar una etapa registrando estado y duracion
+
+        Args:
+            name: Etapa (ver STAGES)
+            required: Si False, un error marca la etapa como 'failed' y no se propaga
+        """
+        self._update(name, status='running', error=None)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self._update(name, status='failed', seconds=round(time.perf_counter() - start, 3), error=str(e))
+            if required:
+                raise
+            logger.warning(f"Etapa de arranque '{name}' fallo (no critica): {e}")
+        else:
+            self._update(name, status='done', seconds=round(time.perf_counter() - start, 3))
+            mark(f"stage_{name}")
+
+    def skip(self, name: str, reason: str = ''):
+        """Marcar una etapa como omitida"""
+        self._update(name, status='skipped', error=reason or None)
+
+    def set_ready(self):
+        """El core acepta consultas (las etapas restantes son de calentamiento)"""
+        self.ready = True
+        self._publish('ready')
+
+    def fail(self, error: str):
+        """La inicializacion fallo: cierra los streams de readiness"""
+        self.error = error
+        self._publish('error')
+
+    def subscribe(self) -> asyncio.Queue:
+        """Registrar un suscriptor; recibe primero el estado actual"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        queue.put_nowait({'type': 'done' if self.done else 'snapshot', **self.snapshot()})
+        self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        """Eliminar un suscriptor"""
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+
+def get_readiness() -> ReadinessTracker:
+    """Obtener instancia singleton de ReadinessTracker"""
+    if not hasattr(get_readiness, '_instance'):
+        get_readiness._instance = ReadinessTracker()
+    return get_readiness._instance
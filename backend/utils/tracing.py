@@ -0,0 +1,191 @@
+"""
+Tracing - Spans de latencia por etapa para el pipeline de consultas
+Registra la duracion de cada etapa en la traza activa (contextvars) y
+agrega histogramas en memoria por etapa para diagnostico y metricas
+"""
+
+import time
+import bisect
+import asyncio
+import functools
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Iterator
+
+# Limites superiores de los buckets en segundos (estilo Prometheus)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """Histograma acumulativo de latencias con buckets fijos"""
+
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # ultimo bucket = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Registrar una observacion en segundos"""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        """Estimar un cuantil (limite superior del bucket que lo contiene)"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        """Resumen del histograma en milisegundos"""
+        return {
+            'count': self.count,
+            'avg_ms': round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 2),
+            'p95_ms': round(self.quantile(0.95) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2)
+        }
+
+
+class QueryTrace:
+    """Traza de una consulta: duracion acumulada por etapa"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float):
+        """Acumular duracion de una etapa (una etapa puede repetirse)"""
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def timings(self) -> Dict[str, float]:
+        """
+        Desglose en milisegundos
+
+        Los spans anidados (ej: llm_expansion dentro de query_expansion) se
+        reportan por separado, por lo que las etapas no suman exactamente 'total'.
+        """
+        result = {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+        result['total'] = round((time.perf_counter() - self.start) * 1000, 2)
+        return result
+
+
+_current_trace: ContextVar[Optional[QueryTrace]] = ContextVar('alfred_query_trace', default=None)
+_stage_histograms: Dict[str, LatencyHistogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def record_stage(stage: str, seconds: float):
+    """Registrar duracion de una etapa en su histograma global"""
+    histogram = _stage_histograms.get(stage)
+    if histogram is None:
+        with _histograms_lock:
+            histogram = _stage_histograms.setdefault(stage, LatencyHistogram())
+    histogram.observe(seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Medir una etapa del pipeline
+
+    Funciona en codigo sync y async (usar con 'with', no 'async with').
+    Si hay una traza activa la duracion se agrega a ella; siempre se
+    registra en el histograma de la etapa.
+
+    Args:
+        stage: Nombre de la etapa (ej: 'history_search', 'vector_search')
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(stage, elapsed)
+        record_stage(stage, elapsed)
+
+
+def traced(stage: str):
+    """
+    Decorador que mide una funcion sync o async como una etapa
+
+    Args:
+        stage: Nombre de la etapa
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(stage):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def start_trace() -> Iterator[QueryTrace]:
+    """
+    Iniciar una traza para la consulta actual
+
+    Si ya hay una traza activa se reutiliza (consultas anidadas).
+
+    Yields:
+        QueryTrace activa
+    """
+    existing = _current_trace.get()
+    if existing is not None:
+        yield existing
+        return
+
+    trace = QueryTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        record_stage('query_total', time.perf_counter() - trace.start)
+
+
+def get_current_trace() -> Optional[QueryTrace]:
+    """Obtener la traza activa (o None)"""
+    return _current_trace.get()
+
+
+def get_stage_histograms() -> Dict[str, LatencyHistogram]:
+    """Obtener histogramas por etapa (referencias vivas)"""
+    with _histograms_lock:
+        return dict(_stage_histograms)
+
+
+def get_stage_stats() -> Dict[str, Dict[str, float]]:
+    """Resumen de latencias por etapa"""
+    return {stage: histogram.snapshot() for stage, histogram in sorted(get_stage_histograms().items())}
+
+
+def reset_stage_histograms():
+    """Vaciar histogramas (util en benchmarks)"""
+    with _histograms_lock:
+        _stage_histograms.clear()